@@ -0,0 +1,349 @@
+"""
+In-memory bar store for the long-running daemon.
+
+Each (symbol, timeframe) gets a fixed-capacity `BarRing`: one NumPy array
+per column, allocated once. Every bar is written twice, at slot i and at
+slot i + capacity, so the latest `capacity` bars are always one contiguous
+slice. Appending is O(1), and a window over the latest bars is a set of
+views rather than a copy. Prices can be stored as float32 to halve the
+memory of a large universe.
+
+`BarStore` keeps the rings of a whole universe. Stream minute bars go into
+the minute ring, and the intraday timeframes are updated in place by
+re-aggregating only the bucket the minute falls in; the daily bar is
+re-aggregated from the day's session minutes. `market_data` returns
+`BarWindow`s that carry the indicator columns, computed by the kernel into
+buffers owned by each ring. Strategies read the columns as arrays, and a
+pandas frame is built only when `to_frame` is called.
+"""
+import numpy as np
+import pandas as pd
+from datetime import datetime, timezone
+from zoneinfo import ZoneInfo
+
+from .indicator_kernel import compute_indicators, indicator_buffers
+from .market_analysis import (
+    INTRADAY_MINUTES,
+    SESSION_OPEN_MINUTE,
+    SESSION_CLOSE_MINUTE,
+    MINUTES_PER_SESSION,
+    BARS_PER_TIMEFRAME,
+    ADX_PERIOD,
+    REGIME_LOOKBACK,
+    session_minutes,
+    resample_bars
+)
+from utils.timing import span
+
+BAR_COLUMNS = ('open', 'high', 'low', 'close', 'volume', 'trade_count', 'vwap')
+
+NS_PER_MINUTE = 60_000_000_000
+
+_EXCHANGE_ZONE = ZoneInfo('America/New_York')
+
+def _utc_offset_minutes(timestamp_ns):
+    """Exchange UTC offset in minutes at a UTC instant"""
+    moment = datetime.fromtimestamp(timestamp_ns / 1e9, timezone.utc).astimezone(_EXCHANGE_ZONE)
+    return int(moment.utcoffset().total_seconds()) // 60
+
+def _exchange_day(timestamp_ns):
+    """Exchange calendar day (days since the epoch) of a daily bar label
+
+    Labels are midnight in exchange time or in UTC (the evening before in
+    New York); either way the nearest midnight is the day's.
+    """
+    wall_minute = timestamp_ns // NS_PER_MINUTE + _utc_offset_minutes(timestamp_ns)
+    return (wall_minute + 720) // 1440
+
+def _aggregate(window, members):
+    """One bar over a slice of a window's minutes, as `resample_bars` builds it"""
+    volume = window['volume'][members].astype(np.float64)
+    total_volume = volume.sum()
+    dollar_volume = (window['vwap'][members].astype(np.float64) * volume).sum()
+    return {
+        'open': window['open'][members][0],
+        'high': window['high'][members].max(),
+        'low': window['low'][members].min(),
+        'close': window['close'][members][-1],
+        'volume': total_volume,
+        'trade_count': window['trade_count'][members].sum(),
+        'vwap': dollar_volume / total_volume if total_volume > 0 else np.nan
+    }
+
+class BarWindow:
+    """Read-only view of the latest bars of a ring
+
+    Columns are NumPy arrays (views into the ring, no copy) looked up by
+    name like a DataFrame's. The views stay valid until the ring is
+    appended to again, so a window belongs to the cycle that asked for it.
+    """
+
+    __slots__ = ('timestamps', '_columns', '_index')
+
+    def __init__(self, timestamps, columns):
+        self.timestamps = timestamps
+        self._columns = columns
+        self._index = None
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def __getitem__(self, column):
+        return self._columns[column]
+
+    def __contains__(self, column):
+        return column in self._columns
+
+    @property
+    def columns(self):
+        return tuple(self._columns)
+
+    @property
+    def last_timestamp(self):
+        return pd.Timestamp(int(self.timestamps[-1]), tz='UTC')
+
+    @property
+    def index(self):
+        """UTC DatetimeIndex of the bars, built on first use"""
+        if self._index is None:
+            self._index = pd.DatetimeIndex(self.timestamps.astype('M8[ns]'), name='timestamp').tz_localize('UTC')
+        return self._index
+
+    def assign(self, **columns):
+        """A window with extra (or replaced) columns, sharing the existing ones"""
+        return BarWindow(self.timestamps, {**self._columns, **columns})
+
+    def to_frame(self):
+        """The window as a pandas frame (copies the data)"""
+        return pd.DataFrame({name: np.array(values) for name, values in self._columns.items()}, index=self.index)
+
+class BarRing:
+    """Fixed-capacity columnar bar buffer
+
+    `timestamps` are UTC nanoseconds (int64). Price and volume columns use
+    `dtype`. Bars must arrive in time order; a bar with the latest
+    timestamp replaces it (a revision) and an older one is rejected.
+    """
+
+    def __init__(self, capacity, dtype=np.float64, columns=BAR_COLUMNS):
+        if capacity < 1:
+            raise ValueError("Ring capacity must be at least one bar")
+        self.capacity = capacity
+        self.dtype = np.dtype(dtype)
+        self._timestamps = np.zeros(2 * capacity, dtype=np.int64)
+        self._columns = {name: np.zeros(2 * capacity, dtype=self.dtype) for name in columns}
+        self._next = 0
+        self._count = 0
+        self._indicators = None
+
+    def __len__(self):
+        return self._count
+
+    @property
+    def nbytes(self):
+        arrays = [self._timestamps, *self._columns.values(), *(self._indicators or {}).values()]
+        return sum(array.nbytes for array in arrays)
+
+    @property
+    def last_timestamp(self):
+        """UTC nanoseconds of the latest bar, or None while empty"""
+        if not self._count:
+            return None
+        return int(self._timestamps[self._next - 1 + self.capacity])
+
+    def clear(self):
+        self._next = 0
+        self._count = 0
+
+    def _write(self, slot, timestamp, bar):
+        mirror = slot + self.capacity
+        self._timestamps[slot] = self._timestamps[mirror] = timestamp
+        for name, values in self._columns.items():
+            values[slot] = values[mirror] = bar.get(name, np.nan)
+
+    def append(self, timestamp, bar):
+        """Add a bar given as {column: value}; returns False if it is older than the latest"""
+        last = self.last_timestamp
+        if last is not None and timestamp < last:
+            return False
+        if last is not None and timestamp == last:
+            self._write((self._next - 1) % self.capacity, timestamp, bar)
+            return True
+        self._write(self._next, timestamp, bar)
+        self._next = (self._next + 1) % self.capacity
+        self._count = min(self._count + 1, self.capacity)
+        return True
+
+    def load(self, frame):
+        """Replace the contents with the last `capacity` bars of a frame"""
+        frame = frame.iloc[-self.capacity:]
+        n = len(frame)
+        index = frame.index if frame.index.tz is not None else frame.index.tz_localize('UTC')
+        timestamps = index.tz_convert('UTC').asi8
+        for target in (slice(0, n), slice(self.capacity, self.capacity + n)):
+            self._timestamps[target] = timestamps
+            for name, values in self._columns.items():
+                values[target] = frame[name].to_numpy() if name in frame.columns else np.nan
+        self._next = n % self.capacity
+        self._count = n
+
+    def _span(self, n):
+        end = self._next + self.capacity
+        return slice(end - n, end)
+
+    def view(self, column, n=None):
+        """The latest `n` values of one column (all of them by default), without copying"""
+        n = self._count if n is None else min(n, self._count)
+        return self._columns[column][self._span(n)]
+
+    def window(self, n=None):
+        """`BarWindow` over the latest `n` bars (all of them by default)"""
+        n = self._count if n is None else min(n, self._count)
+        bars = self._span(n)
+        return BarWindow(self._timestamps[bars], {name: values[bars] for name, values in self._columns.items()})
+
+    def indicator_window(self, n=None):
+        """`window` plus the standard indicator, ADX and volatility columns
+
+        The indicators are computed over the window into float64 buffers
+        that the ring allocates once and reuses on every call.
+        """
+        window = self.window(n)
+        if not len(window):
+            return window
+        if self._indicators is None:
+            self._indicators = indicator_buffers(self.capacity, adx=True, volatility=True)
+        n = len(window)
+        out = {name: buffer[:n] for name, buffer in self._indicators.items()}
+        values = compute_indicators(
+            window['high'], window['low'], window['close'], window['volume'], out=out,
+            adx_period=ADX_PERIOD, volatility_period=REGIME_LOOKBACK
+        )
+        return window.assign(**values)
+
+class BarStore:
+    """Rings for every (symbol, timeframe) the daemon trades on
+
+    Daily (or other natively fetched) timeframes hold `bars` bars loaded
+    from the REST backfill. The minute ring holds regular-session minutes
+    only, enough for `bars` one-minute bars, the longest intraday bucket
+    and, with '1d', a whole session. Intraday timeframes are updated from
+    it in place as minutes arrive, and so is the day's '1d' bar when an
+    intraday timeframe is traded too (so its minutes are backfilled).
+    """
+
+    def __init__(self, symbols, timeframes, bars=BARS_PER_TIMEFRAME, dtype=np.float64):
+        self.symbols = list(symbols)
+        self.timeframes = list(timeframes)
+        self.bars = bars
+        self.dtype = np.dtype(dtype)
+        self.intraday = [tf for tf in self.timeframes if tf in INTRADAY_MINUTES]
+        self.daily = bool(self.intraday) and '1d' in self.timeframes
+        minute_capacity = max([bars] + [INTRADAY_MINUTES[tf] for tf in self.intraday]
+                              + [MINUTES_PER_SESSION] * self.daily)
+        self.rings = {}
+        for symbol in self.symbols:
+            if self.intraday:
+                self.rings[(symbol, 'minute')] = BarRing(minute_capacity, self.dtype)
+            for tf in self.timeframes:
+                if tf != '1m':
+                    self.rings[(symbol, tf)] = BarRing(bars, self.dtype)
+
+    @property
+    def nbytes(self):
+        return sum(ring.nbytes for ring in self.rings.values())
+
+    def _ring(self, symbol, tf):
+        return self.rings[(symbol, 'minute' if tf == '1m' else tf)]
+
+    def last_timestamp(self, symbol, tf='minute'):
+        ring = self.rings.get((symbol, tf))
+        return None if ring is None else ring.last_timestamp
+
+    def closes(self, symbol, tf='1d'):
+        """View of a symbol's stored closes for a timeframe, or None"""
+        ring = self.rings.get((symbol, 'minute' if tf == '1m' else tf))
+        return None if ring is None else ring.view('close')
+
+    def load(self, frames):
+        """Reload every ring from `fetch_market_frames` output
+
+        The last '1d' bar is then rebuilt from the backfilled minutes of its
+        day, as later stream minutes rebuild it.
+        """
+        for symbol in self.symbols:
+            if self.intraday:
+                minutes = frames.get((symbol, 'minute'))
+                if minutes is not None:
+                    session, wall_minutes = session_minutes(minutes)
+                    self.rings[(symbol, 'minute')].load(session)
+                    for tf in self.intraday:
+                        if tf != '1m':
+                            self.rings[(symbol, tf)].load(
+                                resample_bars(session, INTRADAY_MINUTES[tf], wall_minutes)
+                            )
+            for tf in self.timeframes:
+                if tf not in INTRADAY_MINUTES and (symbol, tf) in frames:
+                    self.rings[(symbol, tf)].load(frames[(symbol, tf)])
+            last = self.last_timestamp(symbol)
+            if self.daily and last is not None:
+                offset = _utc_offset_minutes(last)
+                self._update_day(symbol, last // NS_PER_MINUTE + offset, offset)
+
+    def append_minute(self, symbol, timestamp, bar):
+        """Add a closed (or revised) minute bar and update the intraday and daily bars
+
+        `timestamp` is in UTC nanoseconds and `bar` maps columns to values.
+        Minutes outside the regular session are ignored. Returns False if
+        the bar was not stored.
+        """
+        offset = _utc_offset_minutes(timestamp)
+        wall_minute = timestamp // NS_PER_MINUTE + offset
+        minute_of_day = wall_minute % 1440
+        if not SESSION_OPEN_MINUTE <= minute_of_day < SESSION_CLOSE_MINUTE:
+            return False
+        minutes = self.rings[(symbol, 'minute')]
+        if not minutes.append(timestamp, bar):
+            return False
+        for tf in self.intraday:
+            if tf != '1m':
+                self._update_bucket(symbol, tf, wall_minute, offset)
+        if self.daily:
+            self._update_day(symbol, wall_minute, offset)
+        return True
+
+    def _update_bucket(self, symbol, tf, wall_minute, offset):
+        """Re-aggregate the intraday bar the latest minute falls in, as `resample_bars` would"""
+        size = INTRADAY_MINUTES[tf]
+        minutes = self.rings[(symbol, 'minute')]
+        bucket = (wall_minute - SESSION_OPEN_MINUTE) // size
+        recent = minutes.window(size)
+        walls = recent.timestamps // NS_PER_MINUTE + offset
+        members = slice(int(np.searchsorted((walls - SESSION_OPEN_MINUTE) // size, bucket)), None)
+        label = ((bucket * size + SESSION_OPEN_MINUTE) - offset) * NS_PER_MINUTE
+        self.rings[(symbol, tf)].append(label, _aggregate(recent, members))
+
+    def _update_day(self, symbol, wall_minute, offset):
+        """Re-aggregate the session of the latest minute's day, as `daily_bars` would
+
+        A backfilled bar for the same day keeps its label and is revised, so
+        REST bars labelled at midnight UTC are not doubled up.
+        """
+        day = wall_minute // 1440
+        recent = self.rings[(symbol, 'minute')].window(MINUTES_PER_SESSION)
+        walls = recent.timestamps // NS_PER_MINUTE + offset
+        members = slice(int(np.searchsorted(walls // 1440, day)), None)
+        daily = self.rings[(symbol, '1d')]
+        label = (day * 1440 - offset) * NS_PER_MINUTE
+        last = daily.last_timestamp
+        if last is not None and last != label and _exchange_day(last) == day:
+            label = last
+        daily.append(label, _aggregate(recent, members))
+
+    def market_data(self, symbol):
+        """{timeframe: BarWindow with indicators} for one symbol, like `get_market_data`"""
+        data = {}
+        for tf in self.timeframes:
+            with span('indicators', symbol):
+                data[tf] = self._ring(symbol, tf).indicator_window(self.bars)
+        return data
@@ -0,0 +1,318 @@
+"""
+Fused NumPy kernel for the standard indicator set.
+
+`compute_indicators` takes raw float64 OHLCV arrays, either one series of
+shape (bars,) or a universe of shape (symbols, bars), and writes every
+indicator into preallocated buffers. Intermediates such as the true range
+and the close deltas are computed once and shared between indicators.
+Rolling windows use block-wise cumulative sums and EWMs a block-wise closed
+form, so no step loops over bars in Python.
+
+Rows of a universe are right-aligned: shorter histories are padded at the
+front (see `pack_bars`) and their warm-up is masked row by row, so each row
+matches what the pandas `calculate_*` functions give for that symbol alone.
+"""
+import numpy as np
+
+INDICATOR_COLUMNS = ('rsi', 'macd', 'macd_signal', 'bb_upper', 'bb_middle', 'bb_lower', 'vwap', 'atr')
+ADX_COLUMNS = ('adx', 'plus_di', 'minus_di')
+VOLATILITY_COLUMNS = ('volatility',)
+REGIME_COLUMNS = ('avg_volatility', 'is_trending', 'is_volatile', 'is_ranging', 'trend_direction')
+
+# Cumulative sums restart every block so rounding error is bounded by the
+# block rather than the series length; rolling windows can't be longer
+ROLLING_BLOCK = 1024
+
+# Longest block for the EWM closed form
+EWM_BLOCK = 256
+
+def indicator_buffers(shape, adx=False, volatility=False):
+    """Uninitialized output buffers for `compute_indicators`"""
+    columns = INDICATOR_COLUMNS + (ADX_COLUMNS if adx else ()) + (VOLATILITY_COLUMNS if volatility else ())
+    return {name: np.empty(shape) for name in columns}
+
+def pack_bars(frames):
+    """Stack OHLCV frames into right-aligned (symbols, bars) arrays
+
+    Returns (high, low, close, volume, lengths). Shorter frames are padded
+    at the front with their first bar's prices and zero volume, which keeps
+    the padding from leaking into EWMs and cumulative sums.
+    """
+    lengths = np.array([len(frame) for frame in frames], dtype=np.intp)
+    n = int(lengths.max()) if len(lengths) else 0
+    packed = {name: np.empty((len(frames), n)) for name in ('high', 'low', 'close', 'volume')}
+    for row, (frame, length) in enumerate(zip(frames, lengths)):
+        pad = n - length
+        for name, values in packed.items():
+            column = frame[name].to_numpy(dtype=np.float64)
+            values[row, pad:] = column
+            if name == 'volume':
+                values[row, :pad] = 0.0
+            else:
+                values[row, :pad] = column[0] if length else np.nan
+    return packed['high'], packed['low'], packed['close'], packed['volume'], lengths
+
+def _as_rows(values):
+    """Contiguous float64 (rows, bars) view of a 1-D or 2-D array"""
+    values = np.ascontiguousarray(values, dtype=np.float64)
+    return values.reshape(1, -1) if values.ndim == 1 else values
+
+def _rolling_sum(values, window, out, work):
+    """Trailing `window` sums along the last axis, NaN before the first full window"""
+    if window > ROLLING_BLOCK:
+        raise ValueError(f"Rolling window {window} exceeds {ROLLING_BLOCK} bars")
+    n = values.shape[1]
+    if window > n:
+        out[:] = np.nan
+        return out
+
+    for start in range(0, n, ROLLING_BLOCK):
+        np.cumsum(values[:, start:start + ROLLING_BLOCK], axis=1, out=work[:, start:start + ROLLING_BLOCK])
+    out[:, window - 1] = work[:, window - 1]
+    np.subtract(work[:, window:], work[:, :-window], out=out[:, window:])
+    # Windows reaching back into the previous block need that block's total
+    for start in range(ROLLING_BLOCK, n, ROLLING_BLOCK):
+        out[:, start:start + window] += work[:, start - 1:start]
+    out[:, :window - 1] = np.nan
+    return out
+
+def _ewm(values, span, out):
+    """`ewm(span=span, adjust=False).mean()` along the last axis
+
+    Within a block starting after y[s-1], y[s+j] is d^(j+1) times
+    (y[s-1] + alpha * sum of x[s+k] / d^(k+1) for k <= j), one cumulative
+    sum per block. Blocks are short enough that d^-j stays far from overflow.
+    """
+    alpha = 2.0 / (span + 1)
+    decay = 1.0 - alpha
+    n = values.shape[1]
+    if n == 0:
+        return out
+    if decay == 0:
+        out[:] = values
+        return out
+
+    block = int(min(EWM_BLOCK, max(1, 100 / -np.log10(decay))))
+    powers = decay ** np.arange(1, block + 1)
+    carry = values[:, 0].copy()
+    for start in range(0, n, block):
+        end = min(start + block, n)
+        scale = powers[:end - start]
+        chunk = out[:, start:end]
+        np.divide(values[:, start:end], scale, out=chunk)
+        np.cumsum(chunk, axis=1, out=chunk)
+        chunk *= alpha
+        chunk += carry[:, None]
+        chunk *= scale
+        carry = chunk[:, -1].copy()
+    return out
+
+def compute_indicators(high, low, close, volume, out=None, lengths=None,
+                       rsi_period=14, bb_period=20, bb_std=2, atr_period=14,
+                       fast=12, slow=26, signal=9, adx_period=None, volatility_period=None):
+    """RSI, MACD, Bollinger Bands, VWAP and ATR in one pass over raw arrays
+
+    Inputs are 1-D (bars,) or 2-D (symbols, bars) arrays of finite prices;
+    `lengths` gives each row's real bar count when rows are front-padded.
+    Results go into `out` (see `indicator_buffers`), which is allocated
+    when not given and returned. With `adx_period` the ADX columns are
+    filled too, reusing the ATR's true range, and with `volatility_period`
+    the rolling standard deviation of close-to-close returns, reusing the
+    RSI's close deltas.
+    """
+    shape = np.shape(close)
+    high, low, close, volume = _as_rows(high), _as_rows(low), _as_rows(close), _as_rows(volume)
+    if out is None:
+        out = indicator_buffers(shape, adx=adx_period is not None, volatility=volatility_period is not None)
+    result = {name: buffer.reshape(close.shape) for name, buffer in out.items()}
+    for name, buffer in result.items():
+        if not np.shares_memory(buffer, out[name]):
+            raise ValueError(f"Output buffer '{name}' must be contiguous with shape {shape}")
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        work = np.empty_like(close)
+        scratch = np.empty_like(close)
+        spare = np.empty_like(close)
+
+        # True range, shared by ATR and ADX
+        prev_close = np.empty_like(close)
+        prev_close[:, :1] = np.nan
+        prev_close[:, 1:] = close[:, :-1]
+        tr = np.subtract(high, low)
+        for price in (high, low):
+            np.subtract(price, prev_close, out=scratch)
+            np.abs(scratch, out=scratch)
+            np.fmax(tr, scratch, out=tr)
+
+        # ATR
+        atr = _rolling_sum(tr, atr_period, result['atr'], work)
+        atr /= atr_period
+
+        # RSI from the close deltas (a missing delta counts as no move)
+        delta = np.subtract(close, prev_close, out=prev_close)
+        np.fmax(delta, 0, out=scratch)
+        rsi = _rolling_sum(scratch, rsi_period, result['rsi'], work)
+        np.negative(delta, out=scratch)
+        np.fmax(scratch, 0, out=scratch)
+        loss = _rolling_sum(scratch, rsi_period, spare, work)
+        rsi /= loss
+        rsi += 1
+        np.divide(100, rsi, out=rsi)
+        np.subtract(100, rsi, out=rsi)
+
+        if volatility_period is not None:
+            _fill_volatility(close, delta, volatility_period, result['volatility'], work, scratch, spare)
+
+        # MACD
+        macd = _ewm(close, fast, result['macd'])
+        macd -= _ewm(close, slow, scratch)
+        _ewm(macd, signal, result['macd_signal'])
+
+        # Bollinger Bands, on closes shifted by each row's last close so the
+        # sum of squares doesn't cancel catastrophically
+        shift = close[:, -1:]
+        np.subtract(close, shift, out=scratch)
+        middle = _rolling_sum(scratch, bb_period, result['bb_middle'], work)
+        np.square(scratch, out=scratch)
+        width = _rolling_sum(scratch, bb_period, result['bb_upper'], work)
+        np.square(middle, out=scratch)
+        scratch /= bb_period
+        width -= scratch
+        width /= bb_period - 1
+        np.maximum(width, 0, out=width)
+        np.sqrt(width, out=width)
+        width *= bb_std
+        middle /= bb_period
+        middle += shift
+        np.subtract(middle, width, out=result['bb_lower'])
+        width += middle
+
+        # VWAP
+        np.add(high, low, out=scratch)
+        scratch += close
+        scratch /= 3
+        scratch *= volume
+        vwap = np.cumsum(scratch, axis=1, out=result['vwap'])
+        vwap /= np.cumsum(volume, axis=1, out=scratch)
+
+        if adx_period is not None:
+            _fill_adx(high, low, tr, adx_period, result, work, scratch, spare, prev_close)
+
+    if lengths is not None:
+        _mask_warmup(result, lengths, rsi_period, bb_period, atr_period, adx_period, volatility_period)
+    return out
+
+def _fill_adx(high, low, tr, period, result, work, scratch, spare, tr_sum):
+    """ADX and the directional indicators, as in `calculate_adx`"""
+    _rolling_sum(tr, period, tr_sum, work)
+
+    up_move = np.empty_like(high)
+    up_move[:, :1] = np.nan
+    np.subtract(high[:, 1:], high[:, :-1], out=up_move[:, 1:])
+    down_move = spare
+    down_move[:, :1] = np.nan
+    np.subtract(low[:, :-1], low[:, 1:], out=down_move[:, 1:])
+
+    for name, move, other in (('plus_di', up_move, down_move), ('minus_di', down_move, up_move)):
+        directional = np.where((move > other) & (move > 0), move, 0.0)
+        di = _rolling_sum(directional, period, result[name], work)
+        di *= 100
+        di /= tr_sum
+
+    dx = np.subtract(result['plus_di'], result['minus_di'], out=scratch)
+    np.abs(dx, out=dx)
+    dx *= 100
+    dx /= np.add(result['plus_di'], result['minus_di'], out=spare)
+
+    # A window touching an undefined DX is undefined, as with pandas
+    missing = np.isnan(dx)
+    dx[missing] = 0.0
+    adx = _rolling_sum(dx, period, result['adx'], work)
+    adx /= period
+    adx[_rolling_sum(missing.astype(np.float64), period, spare, work) > 0] = np.nan
+
+def _fill_volatility(close, delta, period, out, work, scratch, spare):
+    """`close.pct_change().rolling(period).std()` from the close deltas"""
+    returns = np.subtract(close, delta, out=scratch)
+    np.divide(delta, returns, out=returns)
+    returns[:, :1] = 0.0
+    total = _rolling_sum(returns, period, spare, work)
+    np.square(returns, out=returns)
+    variance = _rolling_sum(returns, period, out, work)
+    np.square(total, out=total)
+    total /= period
+    variance -= total
+    variance /= period - 1
+    np.maximum(variance, 0, out=variance)
+    np.sqrt(variance, out=variance)
+    # The first return needs a previous close
+    variance[:, :period] = np.nan
+
+def _mask_warmup(result, lengths, rsi_period, bb_period, atr_period, adx_period, volatility_period=None):
+    """Blank each row's padding plus the bars each indicator needs to warm up"""
+    n = next(iter(result.values())).shape[1]
+    pads = n - np.asarray(lengths, dtype=np.intp)
+    warmups = {
+        'rsi': rsi_period,
+        'macd': 1,
+        'macd_signal': 1,
+        'bb_upper': bb_period,
+        'bb_middle': bb_period,
+        'bb_lower': bb_period,
+        'vwap': 1,
+        'atr': atr_period
+    }
+    if adx_period is not None:
+        warmups.update({'adx': 2 * adx_period - 1, 'plus_di': adx_period, 'minus_di': adx_period})
+    if volatility_period is not None:
+        warmups['volatility'] = volatility_period + 1
+
+    columns = np.arange(n)
+    masks = {}
+    for name, warmup in warmups.items():
+        if warmup not in masks:
+            masks[warmup] = columns < (pads + warmup - 1)[:, None]
+        result[name][masks[warmup]] = np.nan
+
+def rolling_mean(values, window):
+    """Trailing `window` means along the last axis of a 1-D or 2-D array
+
+    NaN before the first full window and wherever a window touches an
+    undefined value, like pandas `rolling(window).mean()`.
+    """
+    shape = np.shape(values)
+    values = _as_rows(values)
+    work = np.empty_like(values)
+    missing = np.isnan(values)
+    average = _rolling_sum(np.where(missing, 0.0, values), window, np.empty_like(values), work)
+    average /= window
+    average[_rolling_sum(missing.astype(np.float64), window, np.empty_like(values), work) > 0] = np.nan
+    return average.reshape(shape)
+
+def compute_regimes(adx, plus_di, minus_di, volatility, average_period=100, adx_threshold=25):
+    """Per-bar market regime from the ADX and volatility columns
+
+    Inputs are 1-D or 2-D (symbols, bars) arrays as returned by
+    `compute_indicators`, NaN where undefined. A bar is trending when its
+    ADX is above `adx_threshold`, volatile when its volatility is above its
+    trailing `average_period` mean and ranging when neither; the trend
+    direction is 1 when +DI is above -DI and -1 otherwise. Undefined inputs
+    compare as False, as in `detect_market_regime`.
+    """
+    shape = np.shape(volatility)
+    adx, plus_di, minus_di = _as_rows(adx), _as_rows(plus_di), _as_rows(minus_di)
+    volatility = _as_rows(volatility)
+
+    average = rolling_mean(volatility, average_period)
+
+    with np.errstate(invalid='ignore'):
+        trending = adx > adx_threshold
+        volatile = volatility > average
+        direction = np.where(plus_di > minus_di, 1, -1).astype(np.int8)
+    return {
+        'avg_volatility': average.reshape(shape),
+        'is_trending': trending.reshape(shape),
+        'is_volatile': volatile.reshape(shape),
+        'is_ranging': (~trending & ~volatile).reshape(shape),
+        'trend_direction': direction.reshape(shape)
+    }
@@ -1,60 +1,160 @@
+import math
+import threading
 import pandas as pd
 import numpy as np
+from collections import OrderedDict
 from datetime import datetime, timedelta
 import pytz
-from alpaca_trade_api.rest import TimeFrame
+from concurrent.futures import ThreadPoolExecutor
+from alpaca_trade_api.rest import TimeFrame, TimeFrameUnit
 from .technical_indicators import (
-    calculate_atr, calculate_rsi, calculate_macd,
-    calculate_bollinger_bands, calculate_vwap,
-    calculate_adx, calculate_volume_profile,
+    calculate_volume_profile,
     calculate_support_resistance
 )
+from .indicator_kernel import (
+    compute_indicators, compute_regimes, pack_bars,
+    INDICATOR_COLUMNS, ADX_COLUMNS, VOLATILITY_COLUMNS
+)
+from utils.bar_cache import split_bars_by_symbol
+from utils.market_calendar import is_market_open
+from utils.timing import span
 import logging
 
-def detect_market_regime(data, lookback=20):
+EXCHANGE_TZ = 'America/New_York'
+SESSION_OPEN_MINUTE = 9 * 60 + 30
+SESSION_CLOSE_MINUTE = 16 * 60
+MINUTES_PER_SESSION = 390
+BARS_PER_TIMEFRAME = 200
+
+# Upper bound on concurrent get_bars requests
+MAX_FETCH_WORKERS = 8
+
+# Symbols per multi-symbol get_bars request (keeps the URL a sane length)
+MAX_SYMBOLS_PER_REQUEST = 100
+
+# Regime detection: ADX period and trend threshold, the volatility window
+# and the bars its average runs over
+ADX_PERIOD = 14
+TREND_ADX_THRESHOLD = 25
+REGIME_LOOKBACK = 20
+VOLATILITY_AVERAGE_BARS = 100
+
+# Regime series kept in memory, least recently used evicted first
+REGIME_CACHE_SIZE = 1024
+
+_regime_cache = OrderedDict()
+_regime_lock = threading.Lock()
+
+# Intraday timeframes built locally from minute bars, in minutes per bar
+INTRADAY_MINUTES = {
+    '1m': 1,
+    '5m': 5,
+    '15m': 15,
+    '1h': 60
+}
+
+def _default_regime():
+    return {
+        'volatility': 0.0,
+        'adx': 0.0,
+        'is_trending': False,
+        'is_volatile': False,
+        'is_ranging': True,
+        'trend_direction': 0
+    }
+
+def _regime_key(data, lookback):
+    """Cache key from the bars themselves, so equal copies of a frame share an entry"""
+    prices = np.concatenate([_column(data, name) for name in ('high', 'low', 'close')])
+    return (lookback, len(data), data.index[0], data.index[-1], hash(prices.tobytes()))
+
+def _column(data, name):
+    """A column of a DataFrame or `BarWindow` as a float64 array"""
+    return np.asarray(data[name], dtype=np.float64)
+
+def _regime_inputs(data, lookback):
+    """ADX, +DI, -DI and volatility arrays, taken from the frame's columns when it has them"""
+    inputs = {}
+    if all(name in data.columns for name in ADX_COLUMNS):
+        inputs.update({name: _column(data, name) for name in ADX_COLUMNS})
+    if lookback == REGIME_LOOKBACK and 'volatility' in data.columns:
+        inputs['volatility'] = _column(data, 'volatility')
+    if len(inputs) < len(ADX_COLUMNS) + 1:
+        values = compute_indicators(
+            _column(data, 'high'),
+            _column(data, 'low'),
+            _column(data, 'close'),
+            _column(data, 'volume'),
+            adx_period=ADX_PERIOD,
+            volatility_period=lookback
+        )
+        for name in ADX_COLUMNS + VOLATILITY_COLUMNS:
+            inputs.setdefault(name, values[name])
+    return inputs
+
+def _cached_regime(key):
+    with _regime_lock:
+        cached = _regime_cache.get(key)
+        if cached is not None:
+            _regime_cache.move_to_end(key)
+        return cached
+
+def regime_series(data, lookback=REGIME_LOOKBACK, cache=True, key=None):
+    """Market regime of every bar of a frame in one vectorized pass
+    
+    Returns a frame on `data`'s index with volatility, adx, avg_volatility,
+    is_trending, is_volatile, is_ranging and trend_direction; its last row
+    is what `detect_market_regime` reports. The ADX and volatility columns
+    that `add_indicators` puts on a frame are reused rather than
+    recomputed. Results are cached by the bars' contents, so callers must
+    not modify the returned frame.
+    """
+    if cache and len(data):
+        key = key or _regime_key(data, lookback)
+        cached = _cached_regime(key)
+        if cached is not None:
+            return cached
+    
+    inputs = _regime_inputs(data, lookback)
+    regimes = compute_regimes(
+        inputs['adx'], inputs['plus_di'], inputs['minus_di'], inputs['volatility'],
+        average_period=VOLATILITY_AVERAGE_BARS, adx_threshold=TREND_ADX_THRESHOLD
+    )
+    series = pd.DataFrame(
+        {'volatility': inputs['volatility'], 'adx': inputs['adx'], **regimes},
+        index=data.index
+    )
+    
+    if cache and len(data):
+        with _regime_lock:
+            _regime_cache[key] = series
+            if len(_regime_cache) > REGIME_CACHE_SIZE:
+                _regime_cache.popitem(last=False)
+    return series
+
+def clear_regime_cache():
+    with _regime_lock:
+        _regime_cache.clear()
+
+def _latest_regime(series):
+    """`detect_market_regime`'s dict for the last bar of a regime series"""
+    return {
+        'volatility': float(series['volatility'].iat[-1]),
+        'adx': float(series['adx'].iat[-1]),
+        'is_trending': bool(series['is_trending'].iat[-1]),
+        'is_volatile': bool(series['is_volatile'].iat[-1]),
+        'is_ranging': bool(series['is_ranging'].iat[-1]),
+        'trend_direction': int(series['trend_direction'].iat[-1])
+    }
+
+def detect_market_regime(data, lookback=REGIME_LOOKBACK, cache=True):
     """Detect current market regime (trending, ranging, volatile)"""
     try:
-        # Calculate volatility
-        returns = data['close'].pct_change()
-        volatility = returns.rolling(lookback).std()
-        
-        # Calculate ADX for trend strength
-        adx, plus_di, minus_di = calculate_adx(data['high'], data['low'], data['close'])
-        
-        # Calculate price range
-        price_range = (data['high'] - data['low']).rolling(lookback).mean()
-        
-        # Get the latest values
-        latest_adx = float(adx.iloc[-1])
-        latest_volatility = float(volatility.iloc[-1])
-        avg_volatility = float(volatility.rolling(100).mean().iloc[-1])
-        latest_plus_di = float(plus_di.iloc[-1])
-        latest_minus_di = float(minus_di.iloc[-1])
-        
-        # Determine regime using scalar values
-        is_trending = bool(latest_adx > 25)
-        is_volatile = bool(latest_volatility > avg_volatility)
-        is_ranging = bool(not is_trending and not is_volatile)
-        
-        return {
-            'volatility': latest_volatility,
-            'adx': latest_adx,
-            'is_trending': is_trending,
-            'is_volatile': is_volatile,
-            'is_ranging': is_ranging,
-            'trend_direction': 1 if latest_plus_di > latest_minus_di else -1
-        }
+        return _latest_regime(regime_series(data, lookback, cache))
     except Exception as e:
         logging.error(f"Error in detect_market_regime: {str(e)}")
         # Return default values in case of error
-        return {
-            'volatility': 0.0,
-            'adx': 0.0,
-            'is_trending': False,
-            'is_volatile': False,
-            'is_ranging': True,
-            'trend_direction': 0
-        }
+        return _default_regime()
 
 def analyze_order_flow(data):
     """Analyze order flow and market microstructure"""
@@ -89,19 +189,21 @@ def analyze_order_flow(data):
         'avg_spread': avg_spread.iloc[-1]
     }
 
-def analyze_market_microstructure(data):
+def analyze_market_microstructure(data, spread_volume=False):
     """Analyze market microstructure"""
     # Calculate bid-ask spread proxy
     spread = (data['high'] - data['low']) / data['close']
     
     # Calculate volume profile
     volume_profile = calculate_volume_profile(
-        data['high'], data['low'], data['close'], data['volume']
+        data['high'], data['low'], data['close'], data['volume'],
+        spread_volume=spread_volume
     )
     
     # Calculate support and resistance levels
     levels = calculate_support_resistance(
-        data['high'], data['low'], data['close'], data['volume']
+        data['high'], data['low'], data['close'], data['volume'],
+        spread_volume=spread_volume
     )
     
     return {
@@ -111,55 +213,346 @@ def analyze_market_microstructure(data):
         'support_resistance': levels
     }
 
-def is_market_open():
-    """Check if the market is currently open"""
-    nyc = pytz.timezone("America/New_York")
-    now = datetime.now(nyc)
+def session_minutes(bars):
+    """Restrict minute bars to the regular session
     
-    # Check if it's a weekday
-    if now.weekday() >= 5:  # 5 = Saturday, 6 = Sunday
-        return False
+    Returns the filtered bars (UTC index) and each bar's exchange wall-clock
+    time in minutes since the epoch, which `resample_bars` bins on.
+    """
+    index = bars.index if bars.index.tz is not None else bars.index.tz_localize('UTC')
+    wall_minutes = index.tz_convert(EXCHANGE_TZ).tz_localize(None).asi8 // 60_000_000_000
+    minute_of_day = wall_minutes % 1440
+    in_session = (minute_of_day >= SESSION_OPEN_MINUTE) & (minute_of_day < SESSION_CLOSE_MINUTE)
+    return bars[in_session], wall_minutes[in_session]
+
+def resample_bars(bars, minutes, wall_minutes=None):
+    """Resample minute bars into OHLCV bars aligned to the session open
     
-    # Check market hours (9:30 AM - 3:55 PM EST)
-    if now.hour < 9 or (now.hour == 9 and now.minute < 30) or now.hour >= 16:
-        return False
+    Bins start at 09:30 exchange time, so e.g. hourly bars run 09:30-10:30
+    and the last one of the day is the 15:30-16:00 half hour. Pass the
+    output of `session_minutes` as (`bars`, `wall_minutes`) to skip the
+    session filter when resampling the same minutes several times.
+    """
+    if wall_minutes is None:
+        bars, wall_minutes = session_minutes(bars)
+    if bars.index.tz is None:
+        bars = bars.tz_localize('UTC')
+    if minutes == 1 or bars.empty:
+        return bars.tz_convert('UTC')
     
-    return True
+    # Bin on exchange wall-clock minutes so DST changes don't shift the grid
+    bins = (wall_minutes - SESSION_OPEN_MINUTE) // minutes
+    return _aggregate_bins(bars, bins, bins * minutes + SESSION_OPEN_MINUTE)
 
-def get_market_data(api, symbol, timeframes):
-    """Get market data for multiple timeframes"""
-    data = {}
+def daily_bars(bars, wall_minutes=None):
+    """Aggregate intraday bars into one regular-session bar per day
+    
+    Bars are labelled at midnight exchange time, like Alpaca's daily bars.
+    Takes the same arguments as `resample_bars`.
+    """
+    if wall_minutes is None:
+        bars, wall_minutes = session_minutes(bars)
+    if bars.index.tz is None:
+        bars = bars.tz_localize('UTC')
+    if bars.empty:
+        return bars.tz_convert('UTC')
+    days = wall_minutes // 1440
+    return _aggregate_bins(bars, days, days * 1440)
+
+def _aggregate_bins(bars, bins, label_minutes):
+    """OHLCV bar per run of equal `bins`, labelled at the bins' exchange wall-clock minutes"""
+    starts = np.flatnonzero(np.r_[True, bins[1:] != bins[:-1]])
+    ends = np.r_[starts[1:], len(bins)] - 1
+    
+    volume = np.add.reduceat(bars['volume'].to_numpy(dtype=float), starts)
+    resampled = {
+        'open': bars['open'].to_numpy()[starts],
+        'high': np.maximum.reduceat(bars['high'].to_numpy(dtype=float), starts),
+        'low': np.minimum.reduceat(bars['low'].to_numpy(dtype=float), starts),
+        'close': bars['close'].to_numpy()[ends],
+        'volume': volume
+    }
+    if 'trade_count' in bars.columns:
+        resampled['trade_count'] = np.add.reduceat(bars['trade_count'].to_numpy(dtype=float), starts)
+    if 'vwap' in bars.columns:
+        # Volume-weight the per-minute VWAPs so the coarser bar stays exact
+        dollar_volume = np.add.reduceat(bars['vwap'].to_numpy(dtype=float) * bars['volume'].to_numpy(dtype=float), starts)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            resampled['vwap'] = np.where(volume > 0, dollar_volume / volume, np.nan)
+    
+    labels = label_minutes[starts] * 60_000_000_000
+    index = pd.DatetimeIndex(labels).tz_localize(EXCHANGE_TZ).tz_convert('UTC')
+    index.name = bars.index.name
+    return pd.DataFrame(resampled, index=index)
+
+def bar_close_times(index, timeframe):
+    """UTC nanoseconds at which each bar of a timeframe has closed
+    
+    Intraday bars close `INTRADAY_MINUTES[timeframe]` after their label, or
+    at the session close for the day's last, shorter bar; daily bars close
+    at the session close of their day. Naive labels are taken as UTC.
+    """
+    if index.tz is None:
+        index = index.tz_localize('UTC')
+    utc_minutes = index.asi8 // 60_000_000_000
+    wall_minutes = index.tz_convert(EXCHANGE_TZ).tz_localize(None).asi8 // 60_000_000_000
+    if timeframe in INTRADAY_MINUTES:
+        close = wall_minutes + INTRADAY_MINUTES[timeframe]
+        session_close = wall_minutes // 1440 * 1440 + SESSION_CLOSE_MINUTE
+        close = np.where(wall_minutes < session_close, np.minimum(close, session_close), close)
+    elif timeframe == '1d':
+        # Daily labels are midnight in exchange time or in UTC (the evening
+        # before in New York); either way the nearest midnight is the day's
+        close = (wall_minutes + 720) // 1440 * 1440 + SESSION_CLOSE_MINUTE
+    else:
+        raise ValueError(f"Unknown timeframe {timeframe!r}")
+    # Within a session the UTC offset of the label holds at the close too
+    return (close - wall_minutes + utc_minutes) * 60_000_000_000
+
+def _minute_lookback_start(intraday, bars):
+    """Earliest minute bar needed to build `bars` bars of every intraday timeframe"""
+    bars_per_session = min(
+        math.ceil(MINUTES_PER_SESSION / INTRADAY_MINUTES[tf]) for tf in intraday
+    )
+    sessions = math.ceil(bars / bars_per_session) + 1
+    # Pad weekends and holidays when converting sessions to calendar days
+    days = math.ceil(sessions * 7 / 5) + 4
+    return datetime.now(pytz.utc) - timedelta(days=days)
+
+def _native_lookback_start(timeframe, bars):
+    """Earliest bar needed to get `bars` native bars of a timeframe"""
+    if timeframe.unit == TimeFrameUnit.Day:
+        days = math.ceil(bars * timeframe.amount * 7 / 5) + 10
+    elif timeframe.unit == TimeFrameUnit.Hour:
+        days = math.ceil(bars * timeframe.amount / 6.5 * 7 / 5) + 4
+    else:
+        days = math.ceil(bars * timeframe.amount / MINUTES_PER_SESSION * 7 / 5) + 4
+    return datetime.now(pytz.utc) - timedelta(days=days)
+
+def add_indicators(df):
+    """Add the standard indicator columns to a bar frame
+    
+    Besides the strategies' indicators this adds the ADX columns and the
+    returns volatility that regime detection reads.
+    """
+    with span('indicators'):
+        values = compute_indicators(
+            df['high'].to_numpy(dtype=np.float64),
+            df['low'].to_numpy(dtype=np.float64),
+            df['close'].to_numpy(dtype=np.float64),
+            df['volume'].to_numpy(dtype=np.float64),
+            adx_period=ADX_PERIOD,
+            volatility_period=REGIME_LOOKBACK
+        )
+    for name in INDICATOR_COLUMNS + ADX_COLUMNS + VOLATILITY_COLUMNS:
+        df[name] = values[name]
+    return df
+
+def add_indicators_bulk(frames):
+    """Add the standard indicator columns to many symbols' frames at once
+    
+    All symbols go through the indicator kernel as one (symbols x bars)
+    array, then the columns are attached to a stacked long frame and the
+    symbols sliced back out. Returns {symbol: frame with indicators};
+    results match `add_indicators` frame by frame.
+    """
+    symbols = [symbol for symbol, df in frames.items() if len(df)]
+    if not symbols:
+        return frames
+    
+    high, low, close, volume, lengths = pack_bars([frames[symbol] for symbol in symbols])
+    with span('indicators_bulk'):
+        values = compute_indicators(
+            high, low, close, volume, lengths=lengths,
+            adx_period=ADX_PERIOD, volatility_period=REGIME_LOOKBACK
+        )
+    # Row-major boolean indexing yields each symbol's real bars in order,
+    # which is exactly the row order of the stacked frame
+    real = np.arange(close.shape[1]) >= (close.shape[1] - lengths)[:, None]
+    
+    # Add every column in one step and slice the symbols back out, which is
+    # far cheaper than inserting columns frame by frame
+    stacked = pd.concat([frames[symbol] for symbol in symbols], keys=symbols, names=['symbol', 'timestamp'])
+    stacked = stacked.assign(**{name: values[name][real] for name in values})
+    result = dict(frames)
+    offset = 0
+    for symbol in symbols:
+        end = offset + len(frames[symbol])
+        result[symbol] = stacked.iloc[offset:end].droplevel('symbol')
+        offset = end
+    return result
+
+def detect_market_regimes(frames, lookback=REGIME_LOOKBACK, cache=True):
+    """`detect_market_regime` for many symbols' frames
+    
+    Symbols not in the regime cache whose frames lack the ADX and
+    volatility columns get them from one bulk kernel pass; each symbol's
+    regime is then read off its `regime_series`.
+    """
+    symbols = [symbol for symbol, df in frames.items() if len(df)]
+    regimes = {symbol: _default_regime() for symbol in frames}
+    if not symbols:
+        return regimes
+    
+    try:
+        keys = {symbol: _regime_key(frames[symbol], lookback) for symbol in symbols} if cache else {}
+        series = {}
+        for symbol, key in keys.items():
+            cached = _cached_regime(key)
+            if cached is not None:
+                series[symbol] = cached
+        
+        needed = ADX_COLUMNS + VOLATILITY_COLUMNS
+        missing = {
+            symbol: frames[symbol] for symbol in symbols
+            if symbol not in series and lookback == REGIME_LOOKBACK
+            and not all(name in frames[symbol].columns for name in needed)
+        }
+        with_inputs = dict(frames)
+        if missing:
+            with_inputs.update(add_indicators_bulk(missing))
+        for symbol in symbols:
+            if symbol not in series:
+                series[symbol] = regime_series(with_inputs[symbol], lookback, cache, keys.get(symbol))
+            regimes[symbol] = _latest_regime(series[symbol])
+    except Exception as e:
+        logging.error(f"Error in detect_market_regimes: {str(e)}")
+    
+    return regimes
+
+def _fetch_bars(api, symbols, timeframe, kwargs, cache=None):
+    """Fetch one (possibly multi-symbol) bar request as {symbol: frame}"""
+    if cache is not None:
+        return cache.get_bars_multi(api, symbols, timeframe, **kwargs)
+    request_symbols = symbols[0] if len(symbols) == 1 else list(symbols)
+    with span('get_bars', symbols[0] if len(symbols) == 1 else None):
+        bars = api.get_bars(request_symbols, timeframe, **kwargs).df
+    return split_bars_by_symbol(bars, symbols)
+
+def fetch_bars_concurrently(api, requests, max_workers=MAX_FETCH_WORKERS, cache=None):
+    """Run several get_bars requests in parallel
+    
+    `requests` maps an arbitrary key to `(symbols, timeframe, kwargs)`;
+    several symbols go out as one multi-symbol request. Returns
+    {key: {symbol: frame}}. At most `max_workers` requests are in flight at
+    once. With a `BarCache` only bars newer than the cached ones are requested.
+    """
+    if not requests:
+        return {}
+    
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(requests))) as pool:
+        futures = {
+            key: pool.submit(_fetch_bars, api, symbols, timeframe, kwargs, cache)
+            for key, (symbols, timeframe, kwargs) in requests.items()
+        }
+        return {key: future.result() for key, future in futures.items()}
+
+def _bar_requests(symbols, timeframes, bars):
+    """Build the get_bars requests needed for a batch of symbols"""
+    requests = {}
+    
+    intraday = [tf for tf in timeframes if tf in INTRADAY_MINUTES]
+    if intraday:
+        # One request for the finest granularity covers every intraday timeframe
+        start_time = _minute_lookback_start(intraday, bars)
+        requests['minute'] = (symbols, TimeFrame.Minute, {
+            'adjustment': 'raw',
+            'start': start_time.strftime('%Y-%m-%dT%H:%M:%SZ')
+        })
     
     for tf, timeframe in timeframes.items():
-        if tf in ['1m', '5m', '15m']:
-            # Convert string timeframe to TimeFrame object with multiplier
-            minutes = int(tf[:-1])
-            # Get more data for proper indicator calculation (at least 100 bars)
-            start_time = datetime.now() - timedelta(minutes=minutes * 200)  # Increased from 100 to 200
-            # Format the date in RFC3339 format
-            start_time_str = start_time.strftime('%Y-%m-%dT%H:%M:%SZ')
-            data[tf] = api.get_bars(
-                symbol, 
-                TimeFrame.Minute,
-                limit=200,  # Increased from 100 to 200
-                adjustment='raw',
-                start=start_time_str
-            ).df
+        if tf in INTRADAY_MINUTES:
+            continue
+        start_time = _native_lookback_start(timeframe, bars)
+        requests[tf] = (symbols, timeframe, {
+            'adjustment': 'raw',
+            'start': start_time.strftime('%Y-%m-%dT%H:%M:%SZ')
+        })
+    
+    return requests
+
+def assemble_market_data(frames, symbol, timeframes, bars=BARS_PER_TIMEFRAME, indicators=True):
+    """Turn the raw frames for one symbol into the per-timeframe data dict
+    
+    `frames` is keyed like `fetch_market_frames`: `(symbol, 'minute')` holds
+    the minute bars intraday timeframes are built from, `(symbol, tf)` the
+    natively fetched frames.
+    """
+    data = {}
+    
+    intraday = [tf for tf in timeframes if tf in INTRADAY_MINUTES]
+    if intraday:
+        # Only the trailing minutes that can end up in the last `bars` bars
+        needed = (bars + 1) * max(INTRADAY_MINUTES[tf] for tf in intraday)
+        session, wall_minutes = session_minutes(frames[(symbol, 'minute')])
+        session, wall_minutes = session.iloc[-needed:], wall_minutes[-needed:]
+    
+    for tf in timeframes:
+        if tf in INTRADAY_MINUTES:
+            data[tf] = resample_bars(session, INTRADAY_MINUTES[tf], wall_minutes).iloc[-bars:].copy()
         else:
-            # For hourly and daily data, get more bars
-            data[tf] = api.get_bars(
-                symbol, timeframe, limit=200,  # Increased from 100 to 200
-                adjustment='raw'
-            ).df
+            data[tf] = frames[(symbol, tf)].iloc[-bars:].copy()
         
         # Calculate indicators for each timeframe
-        data[tf]['rsi'] = calculate_rsi(data[tf]['close'])
-        data[tf]['macd'], data[tf]['macd_signal'], _ = calculate_macd(data[tf]['close'])
-        data[tf]['bb_upper'], data[tf]['bb_middle'], data[tf]['bb_lower'] = calculate_bollinger_bands(data[tf]['close'])
-        data[tf]['vwap'] = calculate_vwap(data[tf]['high'], data[tf]['low'], data[tf]['close'], data[tf]['volume'])
-        data[tf]['atr'] = calculate_atr(data[tf]['high'], data[tf]['low'], data[tf]['close'])
+        if indicators:
+            add_indicators(data[tf])
+    
+    return data
+
+def fetch_market_frames(api, symbols, timeframes, bars=BARS_PER_TIMEFRAME,
+                        max_workers=MAX_FETCH_WORKERS, cache=None,
+                        batch_size=MAX_SYMBOLS_PER_REQUEST):
+    """Fetch the raw bar frames behind `get_market_data` for several symbols
+    
+    Symbols are batched into multi-symbol requests of up to `batch_size`.
+    """
+    symbols = list(symbols)
+    requests = {}
+    for i in range(0, len(symbols), batch_size):
+        batch = tuple(symbols[i:i + batch_size])
+        for kind, request in _bar_requests(batch, timeframes, bars).items():
+            requests[(batch, kind)] = request
+    
+    frames = {}
+    for (batch, kind), by_symbol in fetch_bars_concurrently(api, requests, max_workers, cache).items():
+        for symbol, frame in by_symbol.items():
+            frames[(symbol, kind)] = frame
+    return frames
+
+def get_market_data_for_symbols(api, symbols, timeframes, bars=BARS_PER_TIMEFRAME,
+                                max_workers=MAX_FETCH_WORKERS, cache=None):
+    """Get market data for several symbols
+    
+    Bars come from batched multi-symbol requests run concurrently, and
+    indicators are computed in bulk per timeframe across all symbols.
+    """
+    frames = fetch_market_frames(api, symbols, timeframes, bars, max_workers, cache)
+    
+    data = {
+        symbol: assemble_market_data(frames, symbol, timeframes, bars, indicators=False)
+        for symbol in symbols
+    }
+    for tf in timeframes:
+        with_indicators = add_indicators_bulk({symbol: data[symbol][tf] for symbol in symbols})
+        for symbol in symbols:
+            data[symbol][tf] = with_indicators[symbol]
         
         # Log the number of bars we have
-        logging.info(f"Got {len(data[tf])} bars for {tf} timeframe")
+        if len(symbols) == 1:
+            logging.info(f"Got {len(data[symbols[0]][tf])} bars for {tf} timeframe")
+        else:
+            counts = [len(data[symbol][tf]) for symbol in symbols]
+            logging.info(f"Got {min(counts)}-{max(counts)} bars for {tf} timeframe across {len(symbols)} symbols")
+    
+    return data
+
+def get_market_data(api, symbol, timeframes, bars=BARS_PER_TIMEFRAME,
+                    max_workers=MAX_FETCH_WORKERS, cache=None):
+    """Get market data for multiple timeframes
     
-    return data 
\ No newline at end of file
+    Intraday timeframes ('1m', '5m', '15m', '1h') are built locally from a
+    single minute-bar request; anything else (e.g. '1d') is fetched natively.
+    All requests run concurrently, so latency is set by the slowest one.
+    Pass a `BarCache` to only download bars that are not on disk yet.
+    """
+    return get_market_data_for_symbols(api, [symbol], timeframes, bars, max_workers, cache)[symbol]
\ No newline at end of file
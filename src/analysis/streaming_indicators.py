@@ -0,0 +1,445 @@
+"""
+Streaming counterparts of the indicators in technical_indicators.
+
+Each indicator takes one bar per `update` call and does constant work per
+bar, independent of how much history has been seen. Results match the batch
+`calculate_*` functions to floating-point tolerance, including their warm-up
+NaNs. State round-trips through plain dicts so it can be checkpointed to disk
+and a restarted process can resume exactly where it stopped.
+
+This is a standalone component: nothing in the bot feeds it. The daemon's
+`BarStore` recomputes its indicators with the fused kernel over a window of
+the latest bars instead, so (for example) its VWAP covers that window rather
+than every bar since the first.
+"""
+import os
+import json
+import math
+from collections import deque
+
+# Running sums are recomputed exactly this often to stop rounding drift
+RESYNC_INTERVAL = 1000
+
+def _divide(numerator, denominator):
+    """Divide with pandas/numpy semantics (x/0 -> inf, 0/0 -> nan)"""
+    if denominator == 0:
+        if numerator == 0 or math.isnan(numerator):
+            return math.nan
+        return math.copysign(math.inf, numerator)
+    return numerator / denominator
+
+class _RollingSum:
+    """Fixed-window running sum that, like pandas, is NaN until the window is full"""
+
+    def __init__(self, period, values=()):
+        self.period = period
+        self.values = deque(values, maxlen=period)
+        self._resync()
+
+    def _resync(self):
+        finite = [v for v in self.values if not math.isnan(v)]
+        self.total = math.fsum(finite)
+        self.nans = len(self.values) - len(finite)
+        self.pushes = 0
+
+    def push(self, value):
+        if len(self.values) == self.period:
+            old = self.values[0]
+            if math.isnan(old):
+                self.nans -= 1
+            else:
+                self.total -= old
+        self.values.append(value)
+        if math.isnan(value):
+            self.nans += 1
+        else:
+            self.total += value
+        self.pushes += 1
+        if self.pushes >= RESYNC_INTERVAL:
+            self._resync()
+
+    @property
+    def sum(self):
+        if len(self.values) < self.period or self.nans:
+            return math.nan
+        return self.total
+
+    @property
+    def mean(self):
+        return self.sum / self.period
+
+    def get_state(self):
+        return {'period': self.period, 'values': list(self.values)}
+
+    @classmethod
+    def from_state(cls, state):
+        return cls(state['period'], state['values'])
+
+class _EWMA:
+    """Exponential moving average matching `ewm(span=..., adjust=False)`"""
+
+    def __init__(self, span, value=None):
+        self.span = span
+        self.alpha = 2 / (span + 1)
+        self.value = value
+
+    def update(self, x):
+        if self.value is None:
+            self.value = x
+        else:
+            self.value = (1 - self.alpha) * self.value + self.alpha * x
+        return self.value
+
+    def get_state(self):
+        return {'span': self.span, 'value': self.value}
+
+    @classmethod
+    def from_state(cls, state):
+        return cls(state['span'], state['value'])
+
+def _true_range(high, low, prev_close):
+    """True range; the first bar (no previous close) uses high - low like the batch version"""
+    if prev_close is None:
+        return high - low
+    return max(high - low, abs(high - prev_close), abs(low - prev_close))
+
+class StreamingRSI:
+    """Streaming `calculate_rsi`"""
+
+    def __init__(self, period=14):
+        self.period = period
+        self.prev_close = None
+        self.gains = _RollingSum(period)
+        self.losses = _RollingSum(period)
+        self.value = math.nan
+
+    def update(self, close):
+        # The batch version turns the first (NaN) delta into a zero gain/loss
+        delta = 0.0 if self.prev_close is None else close - self.prev_close
+        self.prev_close = close
+        self.gains.push(delta if delta > 0 else 0.0)
+        self.losses.push(-delta if delta < 0 else 0.0)
+        rs = _divide(self.gains.mean, self.losses.mean)
+        self.value = 100 - _divide(100, 1 + rs)
+        return self.value
+
+    def get_state(self):
+        return {
+            'period': self.period,
+            'prev_close': self.prev_close,
+            'gains': self.gains.get_state(),
+            'losses': self.losses.get_state(),
+            'value': self.value
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        indicator = cls(state['period'])
+        indicator.prev_close = state['prev_close']
+        indicator.gains = _RollingSum.from_state(state['gains'])
+        indicator.losses = _RollingSum.from_state(state['losses'])
+        indicator.value = state['value']
+        return indicator
+
+class StreamingMACD:
+    """Streaming `calculate_macd`; `update` returns (macd, signal, histogram)"""
+
+    def __init__(self, fast=12, slow=26, signal=9):
+        self.fast = _EWMA(fast)
+        self.slow = _EWMA(slow)
+        self.signal = _EWMA(signal)
+        self.value = (math.nan, math.nan, math.nan)
+
+    def update(self, close):
+        macd = self.fast.update(close) - self.slow.update(close)
+        signal_line = self.signal.update(macd)
+        self.value = (macd, signal_line, macd - signal_line)
+        return self.value
+
+    def get_state(self):
+        return {
+            'fast': self.fast.get_state(),
+            'slow': self.slow.get_state(),
+            'signal': self.signal.get_state(),
+            'value': list(self.value)
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        indicator = cls()
+        indicator.fast = _EWMA.from_state(state['fast'])
+        indicator.slow = _EWMA.from_state(state['slow'])
+        indicator.signal = _EWMA.from_state(state['signal'])
+        indicator.value = tuple(state['value'])
+        return indicator
+
+class StreamingBollingerBands:
+    """Streaming `calculate_bollinger_bands`; `update` returns (upper, middle, lower)
+
+    Sums are kept relative to an anchor near the current price so the
+    variance does not lose precision to cancellation on flat stretches.
+    """
+
+    def __init__(self, period=20, std_dev=2):
+        self.period = period
+        self.std_dev = std_dev
+        self.anchor = None
+        self.sums = _RollingSum(period)
+        self.squares = _RollingSum(period)
+        self.pushes = 0
+        self.value = (math.nan, math.nan, math.nan)
+
+    def _reanchor(self, anchor):
+        closes = [v + self.anchor for v in self.sums.values]
+        self.anchor = anchor
+        self.sums = _RollingSum(self.period, [c - anchor for c in closes])
+        self.squares = _RollingSum(self.period, [(c - anchor) ** 2 for c in closes])
+        self.pushes = 0
+
+    def update(self, close):
+        if self.anchor is None:
+            self.anchor = close
+        self.pushes += 1
+        if self.pushes >= RESYNC_INTERVAL:
+            self._reanchor(close)
+        shifted = close - self.anchor
+        self.sums.push(shifted)
+        self.squares.push(shifted * shifted)
+        total = self.sums.sum
+        n = self.period
+        middle = self.anchor + total / n
+        # Sample (ddof=1) variance like pandas' rolling std
+        variance = max((self.squares.sum - total * total / n) / (n - 1), 0.0)
+        std = math.sqrt(variance) if not math.isnan(variance) else math.nan
+        self.value = (middle + std * self.std_dev, middle, middle - std * self.std_dev)
+        return self.value
+
+    def get_state(self):
+        return {
+            'period': self.period,
+            'std_dev': self.std_dev,
+            'anchor': self.anchor,
+            'sums': self.sums.get_state(),
+            'squares': self.squares.get_state(),
+            'pushes': self.pushes,
+            'value': list(self.value)
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        indicator = cls(state['period'], state['std_dev'])
+        indicator.anchor = state['anchor']
+        indicator.sums = _RollingSum.from_state(state['sums'])
+        indicator.squares = _RollingSum.from_state(state['squares'])
+        indicator.pushes = state['pushes']
+        indicator.value = tuple(state['value'])
+        return indicator
+
+class StreamingATR:
+    """Streaming `calculate_atr`"""
+
+    def __init__(self, period=14):
+        self.period = period
+        self.prev_close = None
+        self.ranges = _RollingSum(period)
+        self.value = math.nan
+
+    def update(self, high, low, close):
+        self.ranges.push(_true_range(high, low, self.prev_close))
+        self.prev_close = close
+        self.value = self.ranges.mean
+        return self.value
+
+    def get_state(self):
+        return {
+            'period': self.period,
+            'prev_close': self.prev_close,
+            'ranges': self.ranges.get_state(),
+            'value': self.value
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        indicator = cls(state['period'])
+        indicator.prev_close = state['prev_close']
+        indicator.ranges = _RollingSum.from_state(state['ranges'])
+        indicator.value = state['value']
+        return indicator
+
+class StreamingVWAP:
+    """Streaming `calculate_vwap` (cumulative since the first bar)"""
+
+    def __init__(self):
+        self.price_volume = 0.0
+        self.volume = 0.0
+        self.value = math.nan
+
+    def update(self, high, low, close, volume):
+        typical_price = (high + low + close) / 3
+        self.price_volume += typical_price * volume
+        self.volume += volume
+        self.value = _divide(self.price_volume, self.volume)
+        return self.value
+
+    def get_state(self):
+        return {'price_volume': self.price_volume, 'volume': self.volume, 'value': self.value}
+
+    @classmethod
+    def from_state(cls, state):
+        indicator = cls()
+        indicator.price_volume = state['price_volume']
+        indicator.volume = state['volume']
+        indicator.value = state['value']
+        return indicator
+
+class StreamingADX:
+    """Streaming `calculate_adx`; `update` returns (adx, plus_di, minus_di)"""
+
+    def __init__(self, period=14):
+        self.period = period
+        self.prev_high = None
+        self.prev_low = None
+        self.prev_close = None
+        self.ranges = _RollingSum(period)
+        self.plus_dm = _RollingSum(period)
+        self.minus_dm = _RollingSum(period)
+        self.dx = _RollingSum(period)
+        self.value = (math.nan, math.nan, math.nan)
+
+    def update(self, high, low, close):
+        self.ranges.push(_true_range(high, low, self.prev_close))
+
+        plus_dm = minus_dm = 0.0
+        if self.prev_high is not None:
+            up_move = high - self.prev_high
+            down_move = self.prev_low - low
+            if up_move > down_move and up_move > 0:
+                plus_dm = up_move
+            if down_move > up_move and down_move > 0:
+                minus_dm = down_move
+        self.plus_dm.push(plus_dm)
+        self.minus_dm.push(minus_dm)
+        self.prev_high, self.prev_low, self.prev_close = high, low, close
+
+        tr_smoothed = self.ranges.sum
+        plus_di = 100 * _divide(self.plus_dm.sum, tr_smoothed)
+        minus_di = 100 * _divide(self.minus_dm.sum, tr_smoothed)
+        self.dx.push(100 * _divide(abs(plus_di - minus_di), plus_di + minus_di))
+        self.value = (self.dx.mean, plus_di, minus_di)
+        return self.value
+
+    def get_state(self):
+        return {
+            'period': self.period,
+            'prev_high': self.prev_high,
+            'prev_low': self.prev_low,
+            'prev_close': self.prev_close,
+            'ranges': self.ranges.get_state(),
+            'plus_dm': self.plus_dm.get_state(),
+            'minus_dm': self.minus_dm.get_state(),
+            'dx': self.dx.get_state(),
+            'value': list(self.value)
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        indicator = cls(state['period'])
+        indicator.prev_high = state['prev_high']
+        indicator.prev_low = state['prev_low']
+        indicator.prev_close = state['prev_close']
+        indicator.ranges = _RollingSum.from_state(state['ranges'])
+        indicator.plus_dm = _RollingSum.from_state(state['plus_dm'])
+        indicator.minus_dm = _RollingSum.from_state(state['minus_dm'])
+        indicator.dx = _RollingSum.from_state(state['dx'])
+        indicator.value = tuple(state['value'])
+        return indicator
+
+class StreamingIndicators:
+    """The full indicator set for one (symbol, timeframe), updated bar by bar"""
+
+    def __init__(self):
+        self.rsi = StreamingRSI()
+        self.macd = StreamingMACD()
+        self.bollinger = StreamingBollingerBands()
+        self.atr = StreamingATR()
+        self.vwap = StreamingVWAP()
+        self.adx = StreamingADX()
+        self.timestamp = None
+
+    def update(self, high, low, close, volume, timestamp=None):
+        """Feed one closed bar and return the latest indicator values
+
+        `timestamp` is the bar time in epoch nanoseconds. Bars at or before the
+        last seen timestamp are ignored, so replaying overlapping history
+        after a restart is safe.
+        """
+        if timestamp is not None and self.timestamp is not None and timestamp <= self.timestamp:
+            return self.values()
+        # A plain int, so NumPy timestamps can be checkpointed as JSON
+        self.timestamp = None if timestamp is None else int(timestamp)
+
+        self.rsi.update(close)
+        self.macd.update(close)
+        self.bollinger.update(close)
+        self.atr.update(high, low, close)
+        self.vwap.update(high, low, close, volume)
+        self.adx.update(high, low, close)
+        return self.values()
+
+    def values(self):
+        """Latest values, keyed like the indicator columns in get_market_data"""
+        macd, macd_signal, _ = self.macd.value
+        bb_upper, bb_middle, bb_lower = self.bollinger.value
+        adx, plus_di, minus_di = self.adx.value
+        return {
+            'rsi': self.rsi.value,
+            'macd': macd,
+            'macd_signal': macd_signal,
+            'bb_upper': bb_upper,
+            'bb_middle': bb_middle,
+            'bb_lower': bb_lower,
+            'vwap': self.vwap.value,
+            'atr': self.atr.value,
+            'adx': adx,
+            'plus_di': plus_di,
+            'minus_di': minus_di
+        }
+
+    def get_state(self):
+        return {
+            'timestamp': self.timestamp,
+            'rsi': self.rsi.get_state(),
+            'macd': self.macd.get_state(),
+            'bollinger': self.bollinger.get_state(),
+            'atr': self.atr.get_state(),
+            'vwap': self.vwap.get_state(),
+            'adx': self.adx.get_state()
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        indicators = cls()
+        indicators.timestamp = state['timestamp']
+        indicators.rsi = StreamingRSI.from_state(state['rsi'])
+        indicators.macd = StreamingMACD.from_state(state['macd'])
+        indicators.bollinger = StreamingBollingerBands.from_state(state['bollinger'])
+        indicators.atr = StreamingATR.from_state(state['atr'])
+        indicators.vwap = StreamingVWAP.from_state(state['vwap'])
+        indicators.adx = StreamingADX.from_state(state['adx'])
+        return indicators
+
+    def save(self, path):
+        """Checkpoint the state to a JSON file (atomically)"""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.get_state(), f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """Restore a checkpoint written by `save`"""
+        with open(path) as f:
+            return cls.from_state(json.load(f))
@@ -78,8 +78,8 @@ def calculate_adx(high, low, close, period=14):
     
     # Smoothed Averages
     tr_smoothed = tr.rolling(period).sum()
-    plus_di = 100 * pd.Series(plus_dm).rolling(period).sum() / tr_smoothed
-    minus_di = 100 * pd.Series(minus_dm).rolling(period).sum() / tr_smoothed
+    plus_di = 100 * pd.Series(plus_dm, index=close.index).rolling(period).sum() / tr_smoothed
+    minus_di = 100 * pd.Series(minus_dm, index=close.index).rolling(period).sum() / tr_smoothed
     
     # ADX
     dx = 100 * abs(plus_di - minus_di) / (plus_di + minus_di)
@@ -87,17 +87,51 @@ def calculate_adx(high, low, close, period=14):
     
     return adx, plus_di, minus_di
 
-def calculate_volume_profile(high, low, close, volume, num_bins=50):
+def _price_histogram(high, low, close, volume, origin, bin_width, num_bins, spread_volume=False):
+    """Volume per price bin on a uniform grid starting at `origin`
+    
+    By default each bar's volume goes to the bin holding its close. With
+    `spread_volume` it is spread uniformly over the bar's high-low range,
+    done in O(bars + bins) via cumulative slope sums rather than per bar.
+    """
+    high = np.asarray(high, dtype=float)
+    low = np.asarray(low, dtype=float)
+    close = np.asarray(close, dtype=float)
+    volume = np.asarray(volume, dtype=float)
+    edges = origin + bin_width * np.arange(num_bins + 1)
+    
+    if not spread_volume:
+        return np.histogram(close, bins=edges, weights=volume)[0]
+    
+    # Bar ranges in bin coordinates; zero-range bars fall back to the close
+    x_low = np.clip((low - origin) / bin_width, 0, num_bins)
+    x_high = np.clip((high - origin) / bin_width, 0, num_bins)
+    flat = x_high - x_low <= 1e-12
+    profile = np.histogram(close[flat], bins=edges, weights=volume[flat])[0]
+    
+    ranged = ~flat
+    density = volume[ranged] / (x_high[ranged] - x_low[ranged])
+    # Cumulative volume below grid point k is sum over breakpoints p <= k of
+    # slope * (k - p): +density where a bar's range starts, -density where it ends
+    points = np.concatenate([x_low[ranged], x_high[ranged]])
+    slopes = np.concatenate([density, -density])
+    slots = np.ceil(points).astype(int)
+    slope_sum = np.cumsum(np.bincount(slots, weights=slopes, minlength=num_bins + 1))
+    moment_sum = np.cumsum(np.bincount(slots, weights=slopes * points, minlength=num_bins + 1))
+    cumulative = np.arange(num_bins + 1) * slope_sum - moment_sum
+    return profile + np.diff(cumulative)
+
+def calculate_volume_profile(high, low, close, volume, num_bins=50, spread_volume=False):
     """Calculate Volume Profile"""
     price_range = np.linspace(low.min(), high.max(), num_bins)
-    volume_profile = np.zeros(num_bins-1)
-    
-    for i in range(len(close)):
-        price = close[i]
-        vol = volume[i]
-        bin_index = np.digitize(price, price_range) - 1
-        if 0 <= bin_index < len(volume_profile):
-            volume_profile[bin_index] += vol
+    bin_width = price_range[1] - price_range[0] if num_bins > 1 else 0.0
+    if bin_width > 0:
+        volume_profile = _price_histogram(
+            high, low, close, volume, price_range[0], bin_width, num_bins - 1, spread_volume
+        )
+    else:
+        volume_profile = np.zeros(max(num_bins - 1, 1))
+        volume_profile[0] = np.asarray(volume, dtype=float).sum()
     
     poc_index = np.argmax(volume_profile)
     poc_price = price_range[poc_index]
@@ -108,27 +142,91 @@ def calculate_volume_profile(high, low, close, volume, num_bins=50):
         'poc_price': poc_price
     }
 
-def calculate_support_resistance(high, low, close, volume, num_levels=5):
-    """Calculate Support and Resistance levels"""
-    # Use price action and volume to identify levels
-    price_range = np.linspace(low.min(), high.max(), 100)
-    volume_profile = np.zeros(99)
-    
-    for i in range(len(close)):
-        price = close[i]
-        vol = volume[i]
-        bin_index = np.digitize(price, price_range) - 1
-        if 0 <= bin_index < len(volume_profile):
-            volume_profile[bin_index] += vol
-    
-    # Find local maxima in volume profile
+def _volume_peaks(volume_profile, price_levels, num_levels, distance):
+    """Prices of the highest-volume peaks in a profile"""
     from scipy.signal import find_peaks
-    peaks, _ = find_peaks(volume_profile, distance=10)
+    peaks, _ = find_peaks(volume_profile, distance=distance)
     
     # Sort peaks by volume
     peak_volumes = volume_profile[peaks]
     sorted_indices = np.argsort(peak_volumes)[::-1]
     top_peaks = peaks[sorted_indices[:num_levels]]
     
-    levels = price_range[top_peaks]
-    return sorted(levels) 
\ No newline at end of file
+    levels = price_levels[top_peaks]
+    return sorted(levels)
+
+def calculate_support_resistance(high, low, close, volume, num_levels=5, spread_volume=False):
+    """Calculate Support and Resistance levels"""
+    # Use price action and volume to identify levels
+    price_range = np.linspace(low.min(), high.max(), 100)
+    bin_width = price_range[1] - price_range[0]
+    if bin_width <= 0:
+        return []
+    volume_profile = _price_histogram(
+        high, low, close, volume, price_range[0], bin_width, 99, spread_volume
+    )
+    
+    # Find local maxima in volume profile
+    return _volume_peaks(volume_profile, price_range, num_levels, distance=10)
+
+class VolumeProfile:
+    """Incrementally updated volume profile on a fixed-width price grid
+    
+    The grid grows in either direction as new bars trade outside it, so
+    earlier volume never has to be re-binned.
+    """
+    
+    def __init__(self, bin_width, spread_volume=True):
+        self.bin_width = bin_width
+        self.spread_volume = spread_volume
+        self.origin = None
+        self.volume_profile = np.zeros(0)
+    
+    def update(self, high, low, close, volume):
+        """Add one bar (scalars) or a batch of bars (arrays) to the profile"""
+        high = np.atleast_1d(np.asarray(high, dtype=float))
+        low = np.atleast_1d(np.asarray(low, dtype=float))
+        close = np.atleast_1d(np.asarray(close, dtype=float))
+        volume = np.atleast_1d(np.asarray(volume, dtype=float))
+        if not len(high):
+            return self
+        
+        if self.origin is None:
+            self.origin = np.floor(low.min() / self.bin_width) * self.bin_width
+        
+        # Grow the grid to cover the new bars
+        below = int(np.ceil((self.origin - low.min()) / self.bin_width))
+        if below > 0:
+            self.origin -= below * self.bin_width
+            self.volume_profile = np.concatenate([np.zeros(below), self.volume_profile])
+        needed = int(np.floor((high.max() - self.origin) / self.bin_width)) + 1
+        if needed > len(self.volume_profile):
+            self.volume_profile = np.concatenate([
+                self.volume_profile, np.zeros(needed - len(self.volume_profile))
+            ])
+        
+        self.volume_profile += _price_histogram(
+            high, low, close, volume, self.origin, self.bin_width,
+            len(self.volume_profile), self.spread_volume
+        )
+        return self
+    
+    @property
+    def price_range(self):
+        """Lower edge of every bin"""
+        if self.origin is None:
+            return np.zeros(0)
+        return self.origin + self.bin_width * np.arange(len(self.volume_profile))
+    
+    @property
+    def poc_price(self):
+        """Point of control: the bin with the most volume"""
+        if not len(self.volume_profile):
+            return np.nan
+        return self.price_range[np.argmax(self.volume_profile)]
+    
+    def support_resistance(self, num_levels=5, distance=10):
+        """Highest-volume peaks of the profile, as in calculate_support_resistance"""
+        if len(self.volume_profile) < 3:
+            return []
+        return _volume_peaks(self.volume_profile, self.price_range, num_levels, distance)
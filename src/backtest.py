@@ -0,0 +1,65 @@
+import os
+import sys
+import time
+import logging
+import argparse
+import pandas as pd
+
+from backtesting.engine import backtest
+from backtesting.simulator import simulate, DEFAULT_LATENCY_MS, DEFAULT_PARTICIPATION
+from strategies.registry import strategy_names
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    handlers=[logging.StreamHandler(sys.stdout)]
+)
+
+def load_bars(path):
+    """Load an OHLCV CSV with a timestamp column"""
+    bars = pd.read_csv(path, index_col='timestamp', parse_dates=True)
+    return bars.sort_index()
+
+def main():
+    """Backtest a strategy over bars from a CSV file"""
+    parser = argparse.ArgumentParser(description="Backtest a strategy over historical bars")
+    parser.add_argument('csv', help="CSV with timestamp, open, high, low, close, volume columns")
+    parser.add_argument('--strategy', choices=strategy_names(), default='mean_reversion')
+    parser.add_argument('--equity', type=float, default=100000.0, help="Starting equity")
+    parser.add_argument('--commission', type=float, default=0.0, help="Commission per share")
+    parser.add_argument('--slippage', type=float, default=0.0, help="Slippage as a fraction of price")
+    parser.add_argument('--trades', help="Write the trade list to this CSV")
+    parser.add_argument('--simulate', action='store_true',
+                        help="Fill bracket orders through the event-driven execution simulator")
+    parser.add_argument('--latency-ms', type=float, default=DEFAULT_LATENCY_MS,
+                        help="Order latency in the simulator")
+    parser.add_argument('--participation', type=float, default=DEFAULT_PARTICIPATION,
+                        help="Largest fraction of a bar's volume a symbol's simulated orders can fill together (0 for no cap)")
+    args = parser.parse_args()
+
+    bars = load_bars(args.csv)
+    started = time.perf_counter()
+    if args.simulate:
+        result = simulate({os.path.splitext(os.path.basename(args.csv))[0]: bars}, args.strategy,
+                          initial_equity=args.equity, latency_ms=args.latency_ms,
+                          slippage_bps=args.slippage * 10000, participation=args.participation or None,
+                          commission=args.commission)
+    else:
+        result = backtest(bars, args.strategy, initial_equity=args.equity,
+                          commission=args.commission, slippage=args.slippage)
+    elapsed = time.perf_counter() - started
+
+    logging.info(f"Backtested {len(bars)} bars with {args.strategy} in {elapsed:.2f}s")
+    logging.info(f"Trades: {result['num_trades']}, win rate: {result['win_rate']:.1%}")
+    logging.info(f"PnL: ${result['total_pnl']:.2f} ({result['total_return']:.2%})")
+    if args.simulate:
+        logging.info(f"Fills: {result['num_fills']} ({result['partial_fills']} orders filled in parts), "
+                     f"open positions: {result['open_positions']}")
+    else:
+        logging.info(f"Max drawdown: {result['max_drawdown']:.2%}, exposure: {result['exposure']:.1%}")
+
+    if args.trades:
+        result['trades'].to_csv(args.trades, index=False)
+
+if __name__ == "__main__":
+    main()
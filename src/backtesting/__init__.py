@@ -0,0 +1,3 @@
+"""
+Backtesting and optimization package.
+""" 
\ No newline at end of file
@@ -0,0 +1,226 @@
+import numpy as np
+import pandas as pd
+
+from analysis.indicator_kernel import compute_indicators
+from analysis.market_analysis import INTRADAY_MINUTES, bar_close_times, daily_bars, resample_bars
+from strategies.base_strategy import SignalSeries
+from strategies.registry import get_strategy
+
+# Bars scanned per step when searching for a trade's exit; doubles each step
+EXIT_SCAN_CHUNK = 256
+
+def compute_indicator_frame(bars, params):
+    """Add the indicator columns the strategies read, using the given periods"""
+    values = compute_indicators(
+        bars['high'].to_numpy(dtype=np.float64),
+        bars['low'].to_numpy(dtype=np.float64),
+        bars['close'].to_numpy(dtype=np.float64),
+        bars['volume'].to_numpy(dtype=np.float64),
+        rsi_period=params['rsi_period'],
+        bb_period=params['bb_period'],
+        atr_period=params['atr_period'],
+        adx_period=params['adx_period']
+    )
+    return bars.assign(**values)
+
+def bar_timeframe(bars):
+    """Timeframe of a bar frame ('1m', ..., '1d'), from the usual spacing of its bars"""
+    if len(bars) < 2:
+        raise ValueError("Need at least two bars to tell their timeframe")
+    minutes = np.median(np.diff(bars.index.asi8)) / 60e9
+    if minutes >= 1440:
+        return '1d'
+    for timeframe, size in INTRADAY_MINUTES.items():
+        if minutes == size:
+            return timeframe
+    raise ValueError(f"Bars {minutes:g} minutes apart match no timeframe")
+
+def timeframe_bars(bars, timeframe, base=None):
+    """`bars` aggregated into `timeframe` the way the live data is built
+
+    Intraday timeframes are resampled on the session grid and daily bars
+    aggregated per session; `base` is the timeframe of `bars`.
+    """
+    base = base or bar_timeframe(bars)
+    if timeframe == base:
+        return bars
+    if base != '1d' and timeframe == '1d':
+        return daily_bars(bars)
+    if base != '1d' and timeframe in INTRADAY_MINUTES and INTRADAY_MINUTES[timeframe] % INTRADAY_MINUTES[base] == 0:
+        return resample_bars(bars, INTRADAY_MINUTES[timeframe])
+    raise ValueError(f"Can't build {timeframe} bars from {base} bars")
+
+def indicator_frames(bars, timeframes, params, base=None):
+    """{timeframe: indicator frame} for each timeframe a strategy reads, built from `bars`"""
+    base = base or bar_timeframe(bars)
+    return {tf: compute_indicator_frame(timeframe_bars(bars, tf, base), params) for tf in timeframes}
+
+def strategy_signals(strategy_class, bars, params, frames=None):
+    """A strategy's `SignalSeries` placed on `bars`
+
+    The rules run on the strategy's signal timeframe (see `frame_inputs`)
+    and each signal bar's values land on the bar of `bars` that closes with
+    it, or the first one after; other bars carry no signal. `frames` are
+    the `indicator_frames` when already computed.
+    """
+    base = bar_timeframe(bars)
+    if frames is None:
+        frames = indicator_frames(bars, strategy_class.timeframes(), params, base)
+    signal_tf = strategy_class.signal_timeframe()
+    series = strategy_class.frame_signals(frames, params)
+
+    n = len(bars)
+    target = np.searchsorted(bar_close_times(bars.index, base),
+                             bar_close_times(frames[signal_tf].index, signal_tf), side='left')
+    # Where several signal bars fall on one bar, the latest wins
+    keep = (target < n) & np.r_[target[1:] != target[:-1], True]
+    rows, target = np.flatnonzero(keep), target[keep]
+    placed = SignalSeries(np.zeros(n, dtype=bool), np.zeros(n, dtype=bool), np.zeros(n),
+                          np.full(n, np.nan), np.full(n, np.nan))
+    for values, out in zip(series, placed):
+        out[target] = values[rows]
+    return placed
+
+def kelly_fraction(params):
+    """The strategies' Kelly fraction for their assumed win rate and payoffs"""
+    win_rate = params['win_rate']
+    return (win_rate * params['avg_win'] - (1 - win_rate) * params['avg_loss']) / params['avg_win']
+
+def _find_exit(open_, high, low, start, direction, stop, target):
+    """First bar at or after `start` where the stop or target trades
+
+    Returns (bar, price, reason) or None if neither is hit. A bar touching
+    both levels is assumed to hit the stop first; gaps through a level fill
+    at the open.
+    """
+    n = len(high)
+    chunk = EXIT_SCAN_CHUNK
+    while start < n:
+        end = min(start + chunk, n)
+        if direction > 0:
+            stop_hit = low[start:end] <= stop
+            target_hit = high[start:end] >= target
+        else:
+            stop_hit = high[start:end] >= stop
+            target_hit = low[start:end] <= target
+        hits = stop_hit | target_hit
+        if hits.any():
+            offset = int(np.argmax(hits))
+            bar = start + offset
+            if stop_hit[offset]:
+                gapped = open_[bar] <= stop if direction > 0 else open_[bar] >= stop
+                return bar, (open_[bar] if gapped else stop), 'stop_loss'
+            gapped = open_[bar] >= target if direction > 0 else open_[bar] <= target
+            return bar, (open_[bar] if gapped else target), 'take_profit'
+        start = end
+        chunk *= 2
+    return None
+
+def simulate_trades(bars, long, short, strength, stop, target, params,
+                    initial_equity=100000.0, commission=0.0, slippage=0.0):
+    """Turn signal arrays into trades and a mark-to-market equity curve
+
+    Entries happen at the signal bar's close while flat, sized like the live
+    `calculate_position_size`. Positions are held until the stop or target
+    trades (checked from the next bar) or the data ends. `slippage` is a
+    fraction of price charged on entry and exit, `commission` is per share.
+    """
+    open_ = bars['open'].to_numpy(dtype=float)
+    high = bars['high'].to_numpy(dtype=float)
+    low = bars['low'].to_numpy(dtype=float)
+    close = bars['close'].to_numpy(dtype=float)
+    n = len(close)
+
+    kelly = kelly_fraction(params)
+    candidates = np.flatnonzero((long | short) & np.isfinite(stop) & np.isfinite(target))
+
+    position = np.zeros(n)
+    unrealized = np.zeros(n)
+    realized = np.zeros(n)
+    equity = initial_equity
+    trades = []
+    next_bar = 0
+
+    while True:
+        k = np.searchsorted(candidates, next_bar)
+        if k >= len(candidates):
+            break
+        entry_bar = int(candidates[k])
+        direction = -1.0 if short[entry_bar] else 1.0
+        entry_price = close[entry_bar] * (1 + direction * slippage)
+
+        size = min(kelly * abs(strength[entry_bar]), params['max_position_size'])
+        shares = max(1, int(equity * size / entry_price))
+
+        exit_info = _find_exit(open_, high, low, entry_bar + 1, direction, stop[entry_bar], target[entry_bar])
+        if exit_info is None:
+            exit_bar, exit_price, reason = n - 1, close[-1], 'end_of_data'
+        else:
+            exit_bar, exit_price, reason = exit_info
+        exit_price = exit_price * (1 - direction * slippage)
+
+        pnl = direction * shares * (exit_price - entry_price) - 2 * commission * shares
+        position[entry_bar:exit_bar] = direction * shares
+        unrealized[entry_bar:exit_bar] = direction * shares * (close[entry_bar:exit_bar] - entry_price)
+        realized[exit_bar] += pnl
+        equity += pnl
+
+        trades.append({
+            'entry_time': bars.index[entry_bar],
+            'exit_time': bars.index[exit_bar],
+            'side': 'long' if direction > 0 else 'short',
+            'shares': shares,
+            'entry_price': entry_price,
+            'exit_price': exit_price,
+            'stop_loss': stop[entry_bar],
+            'take_profit': target[entry_bar],
+            'pnl': pnl,
+            'return': direction * (exit_price - entry_price) / entry_price,
+            'bars_held': exit_bar - entry_bar,
+            'exit_reason': reason
+        })
+        next_bar = exit_bar + 1
+
+    equity_curve = pd.Series(initial_equity + np.cumsum(realized) + unrealized, index=bars.index)
+    return pd.DataFrame(trades), equity_curve, position
+
+def summarize(trades, equity_curve, position, initial_equity):
+    """Headline statistics for a backtest"""
+    drawdown = equity_curve / equity_curve.cummax() - 1
+    pnl = trades['pnl'].to_numpy() if len(trades) else np.zeros(0)
+    return {
+        'num_trades': len(trades),
+        'total_pnl': float(pnl.sum()),
+        'total_return': float(equity_curve.iloc[-1] / initial_equity - 1) if len(equity_curve) else 0.0,
+        'max_drawdown': float(drawdown.min()) if len(drawdown) else 0.0,
+        'exposure': float((position != 0).mean()) if len(position) else 0.0,
+        'win_rate': float((pnl > 0).mean()) if len(pnl) else 0.0,
+        'avg_trade_return': float(trades['return'].mean()) if len(trades) else 0.0,
+        'profit_factor': float(pnl[pnl > 0].sum() / -pnl[pnl < 0].sum()) if (pnl < 0).any() else float('inf')
+    }
+
+def backtest(bars, strategy='mean_reversion', params=None, initial_equity=100000.0,
+             commission=0.0, slippage=0.0):
+    """Backtest one strategy's rules over an OHLCV frame
+
+    `strategy` is a registered strategy name and `params` overrides its
+    `PARAMS` (thresholds, ATR multiples, indicator periods, Kelly inputs).
+    The signals come from the strategy's own `signal_series`, evaluated at every
+    bar of its signal timeframe with the other timeframes it reads joined
+    on (see `strategy_signals`). Returns a dict with the `trades` frame, the
+    `equity` curve and the summary statistics.
+    """
+    strategy_class = get_strategy(strategy)
+    params = {**strategy_class.PARAMS, **(params or {})}
+
+    long, short, strength, stop, target = strategy_signals(strategy_class, bars, params)
+    trades, equity_curve, position = simulate_trades(
+        bars, long, short, strength, stop, target, params,
+        initial_equity, commission, slippage
+    )
+
+    return {
+        'trades': trades,
+        'equity': equity_curve,
+        **summarize(trades, equity_curve, position, initial_equity)
+    }
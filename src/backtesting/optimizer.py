@@ -0,0 +1,170 @@
+import os
+import logging
+import itertools
+import numpy as np
+import pandas as pd
+from multiprocessing import shared_memory
+from concurrent.futures import ProcessPoolExecutor
+
+from strategies.registry import get_strategy
+from .engine import (
+    indicator_frames,
+    simulate_trades,
+    strategy_signals,
+    summarize
+)
+
+BAR_FIELDS = ('open', 'high', 'low', 'close', 'volume')
+INDICATOR_PERIODS = ('rsi_period', 'bb_period', 'atr_period', 'adx_period')
+METRICS = ('num_trades', 'total_pnl', 'total_return', 'max_drawdown',
+           'exposure', 'win_rate', 'avg_trade_return', 'profit_factor')
+
+# Default sweeps over the values that are hard-coded in the live strategies
+DEFAULT_GRIDS = {
+    'trend_following': {
+        'adx_threshold': [20, 25, 30],
+        'stop_atr_multiple': [2.0, 2.5, 3.0],
+        'target_atr_multiple': [2.0, 3.0, 4.0],
+        'atr_period': [14, 20],
+        'win_rate': [0.55, 0.6]
+    },
+    'mean_reversion': {
+        'rsi_oversold': [25, 30, 35],
+        'rsi_overbought': [65, 70, 75],
+        'stop_atr_multiple': [1.5, 2.0, 2.5],
+        'rsi_period': [14, 20],
+        'bb_period': [20, 30]
+    }
+}
+
+# Per-worker state, set up once by the pool initializer
+_worker = {}
+
+def parameter_grid(grid):
+    """Expand {name: [values]} into a list of parameter dicts"""
+    names = sorted(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*(grid[name] for name in names))]
+
+def walk_forward_splits(n_bars, n_splits=5, train_bars=None, test_bars=None):
+    """Rolling (train, test) bar ranges, each test window following its train window"""
+    if test_bars is None:
+        test_bars = n_bars // (n_splits + 3)
+    if train_bars is None:
+        train_bars = 3 * test_bars
+    splits = []
+    for i in range(n_splits):
+        train_start = i * test_bars
+        test_start = train_start + train_bars
+        test_end = test_start + test_bars
+        if test_end > n_bars:
+            break
+        splits.append(((train_start, test_start), (test_start, test_end)))
+    return splits
+
+class SharedBars:
+    """OHLCV columns and their UTC timestamps in a shared memory block, attached to by pool workers"""
+
+    def __init__(self, bars):
+        values = np.ascontiguousarray(bars[list(BAR_FIELDS)].to_numpy(dtype=np.float64))
+        index = bars.index if bars.index.tz is not None else bars.index.tz_localize('UTC')
+        self.shape = values.shape
+        self.shm = shared_memory.SharedMemory(create=True, size=max(values.nbytes + 8 * len(values), 1))
+        np.ndarray(self.shape, dtype=np.float64, buffer=self.shm.buf)[:] = values
+        np.ndarray(len(values), dtype=np.int64, buffer=self.shm.buf, offset=values.nbytes)[:] = index.asi8
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def close(self):
+        self.shm.close()
+        self.shm.unlink()
+
+def _attach(name, shape):
+    """Pool initializer: map the shared bars without copying them"""
+    shm = shared_memory.SharedMemory(name=name)
+    values = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+    timestamps = np.ndarray(shape[0], dtype=np.int64, buffer=shm.buf, offset=values.nbytes)
+    index = pd.DatetimeIndex(timestamps.view('M8[ns]'), name='timestamp').tz_localize('UTC')
+    _worker['shm'] = shm
+    _worker['bars'] = pd.DataFrame(values, columns=list(BAR_FIELDS), index=index, copy=False)
+    _worker['indicators'] = {}
+
+def _indicator_frames(strategy_class, start, end, params):
+    """Indicator frames for a bar range, reused across combos with equal periods"""
+    key = (start, end) + tuple(params[p] for p in INDICATOR_PERIODS)
+    cache = _worker['indicators']
+    if key not in cache:
+        if len(cache) >= 8:
+            cache.pop(next(iter(cache)))
+        cache[key] = indicator_frames(_worker['bars'].iloc[start:end], strategy_class.timeframes(), params)
+    return cache[key]
+
+def _evaluate(task):
+    """Backtest one parameter combo over one bar range"""
+    strategy, combo_id, params, split, segment, start, end = task
+    strategy_class = get_strategy(strategy)
+    bars = _worker['bars'].iloc[start:end]
+    frames = _indicator_frames(strategy_class, start, end, params)
+    long, short, strength, stop, target = strategy_signals(strategy_class, bars, params, frames)
+    trades, equity_curve, position = simulate_trades(bars, long, short, strength, stop, target, params)
+    stats = summarize(trades, equity_curve, position, 100000.0)
+    return combo_id, split, segment, [stats[m] for m in METRICS]
+
+def optimize(bars, strategy, grid=None, n_splits=5, train_bars=None, test_bars=None,
+             max_workers=None, metric='total_return'):
+    """Walk-forward parameter sweep across a process pool
+
+    Every combo is backtested on every train and test window. Returns
+    `(results, walk_forward)`: the full result table, and per split the
+    combo that scored best on `metric` in training with its test score.
+    """
+    defaults = get_strategy(strategy).PARAMS
+    combos = parameter_grid(grid or DEFAULT_GRIDS[strategy])
+    splits = walk_forward_splits(len(bars), n_splits, train_bars, test_bars)
+    if not splits:
+        raise ValueError("Not enough bars for the requested walk-forward splits")
+
+    tasks = []
+    for split, ranges in enumerate(splits):
+        for segment, (start, end) in zip(('train', 'test'), ranges):
+            for combo_id, combo in enumerate(combos):
+                tasks.append((strategy, combo_id, {**defaults, **combo}, split, segment, start, end))
+    # Neighbouring tasks share a bar range and indicator periods, so keep
+    # them together to hit each worker's indicator cache
+    tasks.sort(key=lambda t: (t[3], t[4]) + tuple(t[2][p] for p in INDICATOR_PERIODS))
+
+    max_workers = max_workers or os.cpu_count()
+    shared = SharedBars(bars)
+    try:
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_attach,
+                                 initargs=(shared.name, shared.shape)) as pool:
+            chunksize = max(1, len(tasks) // (max_workers * 8))
+            rows = list(pool.map(_evaluate, tasks, chunksize=chunksize))
+    finally:
+        shared.close()
+
+    logging.info(f"Evaluated {len(combos)} combos x {len(splits)} splits with {max_workers} workers")
+
+    results = pd.DataFrame(
+        [(combo_id, split, segment, *metrics) for combo_id, split, segment, metrics in rows],
+        columns=['combo', 'split', 'segment', *METRICS]
+    )
+    params = pd.DataFrame(combos)
+    params.index.name = 'combo'
+    results = results.join(params, on='combo').sort_values(['split', 'segment', 'combo'], ignore_index=True)
+
+    walk_forward = []
+    for split in range(len(splits)):
+        train = results[(results['split'] == split) & (results['segment'] == 'train')]
+        best = int(train.loc[train[metric].idxmax(), 'combo'])
+        test = results[(results['split'] == split) & (results['segment'] == 'test') & (results['combo'] == best)]
+        walk_forward.append({
+            'split': split,
+            'combo': best,
+            f'train_{metric}': float(train.loc[train['combo'] == best, metric].iloc[0]),
+            f'test_{metric}': float(test[metric].iloc[0]),
+            **combos[best]
+        })
+
+    return results, pd.DataFrame(walk_forward)
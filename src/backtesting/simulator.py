@@ -0,0 +1,501 @@
+"""
+Event-driven execution simulator.
+
+Replays minute (or tick) bars through a local matching engine that works
+orders the way the broker does: market, limit and stop orders, and the
+bracket, one-triggers-other and one-cancels-other groups built from the
+same `submit_order` requests the live strategies send. Orders reach the
+engine after a configurable latency, market and stop fills pay slippage,
+and an order takes at most a fraction of each bar's volume, so large
+orders fill partially over several bars.
+
+The simulation steps from event to event rather than bar to bar. Each
+symbol's next event (an entry signal while flat, an order arriving, a
+resting stop or limit being touched) is found with a vectorized scan of
+its bar arrays, and the events of all symbols are processed in time order
+from one heap. A year of minute bars for a universe therefore costs about
+as many Python steps as it has orders and fills, not bars.
+
+Fill rules, within a bar:
+- Market orders, and stops triggered on an earlier bar, fill at the open.
+- A stop triggers when the bar trades through it and fills at the stop
+  price, or at the open if the bar gaps through it.
+- Limits fill on touch, at the limit price or at a better open.
+- When one bar touches both legs of a bracket, the stop is assumed to
+  have traded first.
+- Bracket legs start working on the bar after the entry completes.
+- Stop-limit legs are worked as plain stops.
+"""
+import heapq
+import itertools
+import numpy as np
+import pandas as pd
+
+from strategies.registry import get_strategy
+from strategies.base_strategy import order_price
+from .engine import EXIT_SCAN_CHUNK, kelly_fraction, strategy_signals
+
+# Delay between a decision at a bar's close and the order reaching the engine
+DEFAULT_LATENCY_MS = 50
+# Adverse slippage on market and stop fills, in basis points of price
+DEFAULT_SLIPPAGE_BPS = 1.0
+# Largest fraction of a bar's volume one order can fill in that bar
+DEFAULT_PARTICIPATION = 0.1
+
+# Order types in the order they are matched within a bar: anything filling
+# at the open first, then stops before limits
+_MATCH_ORDER = {'market': 0, 'stop': 1, 'limit': 2}
+
+NS_PER_SECOND = 1_000_000_000
+NS_PER_MS = 1_000_000
+
+class SimOrder:
+    """An order in the matching engine
+
+    `side` is 1 to buy and -1 to sell. `role` is 'entry', 'stop_loss' or
+    'take_profit', and names the exit in the trade list. `legs` are the
+    orders a bracket or one-triggers-other parent activates once it is
+    filled; `oco` is the sibling that is reduced by this order's fills and
+    cancelled when nothing is left.
+    """
+
+    __slots__ = ('id', 'client_order_id', 'symbol', 'side', 'qty', 'type', 'limit_price', 'stop_price',
+                 'role', 'active_bar', 'filled_qty', 'fill_value', 'fills', 'status', 'triggered',
+                 'legs', 'oco')
+
+    def __init__(self, id, symbol, side, qty, type='market', limit_price=None, stop_price=None,
+                 role=None, client_order_id=None):
+        self.id = id
+        self.client_order_id = client_order_id
+        self.symbol = symbol
+        self.side = side
+        self.qty = float(qty)
+        self.type = type
+        self.limit_price = None if limit_price is None else float(limit_price)
+        self.stop_price = None if stop_price is None else float(stop_price)
+        self.role = role
+        self.active_bar = None
+        self.filled_qty = 0.0
+        self.fill_value = 0.0
+        self.fills = 0
+        self.status = 'new'
+        self.triggered = False
+        self.legs = ()
+        self.oco = None
+
+    @property
+    def remaining(self):
+        return self.qty - self.filled_qty
+
+    @property
+    def filled_avg_price(self):
+        return self.fill_value / self.filled_qty if self.filled_qty else None
+
+    @property
+    def fills_at_open(self):
+        return self.type == 'market' or self.triggered
+
+class _Book:
+    """One symbol's bars, working orders, position and entry signals"""
+
+    def __init__(self, symbol, bars, signals=None, params=None):
+        self.symbol = symbol
+        index = bars.index if bars.index.tz is not None else bars.index.tz_localize('UTC')
+        self.timestamps = index.tz_convert('UTC').asi8
+        self.open = bars['open'].to_numpy(dtype=np.float64)
+        self.high = bars['high'].to_numpy(dtype=np.float64)
+        self.low = bars['low'].to_numpy(dtype=np.float64)
+        self.close = bars['close'].to_numpy(dtype=np.float64)
+        self.volume = bars['volume'].to_numpy(dtype=np.float64)
+        self.orders = []
+        self.position = 0.0
+        self.cost = 0.0
+        self.trade = None
+        self.scheduled = None
+        self.params = params
+        # Only the entry bars of the signals are kept
+        self.entries = np.zeros(0, dtype=np.intp)
+        if signals is not None:
+            long, short, strength, stop, target = signals
+            self.entries = np.flatnonzero((long | short) & np.isfinite(stop) & np.isfinite(target))
+            self.entry_side = np.where(short[self.entries], -1, 1)
+            self.entry_strength = np.asarray(strength)[self.entries]
+            self.entry_stop = np.asarray(stop)[self.entries]
+            self.entry_target = np.asarray(target)[self.entries]
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def first_touch(self, order, start):
+        """First bar at or after `start` whose range reaches a resting order's price, or None"""
+        if order.type == 'stop':
+            level, below = order.stop_price, order.side < 0
+        else:
+            level, below = order.limit_price, order.side > 0
+        prices = self.low if below else self.high
+        n = len(prices)
+        chunk = EXIT_SCAN_CHUNK
+        while start < n:
+            end = min(start + chunk, n)
+            hits = prices[start:end] <= level if below else prices[start:end] >= level
+            if hits.any():
+                return start + int(np.argmax(hits))
+            start = end
+            chunk *= 2
+        return None
+
+    def next_event(self, start):
+        """First bar at or after `start` where an order may fill or an entry may be placed"""
+        candidates = []
+        for order in self.orders:
+            first = max(start, order.active_bar)
+            if order.fills_at_open:
+                if first < len(self):
+                    candidates.append(first)
+            else:
+                touch = self.first_touch(order, first)
+                if touch is not None:
+                    candidates.append(touch)
+        if not self.orders and self.position == 0 and self.params is not None:
+            k = np.searchsorted(self.entries, start)
+            if k < len(self.entries):
+                candidates.append(int(self.entries[k]))
+        return min(candidates) if candidates else None
+
+class ExecutionSimulator:
+    """Local matching engine over the bars of a universe
+
+    Symbols are added with their bars and, optionally, the `SignalSeries`
+    of a strategy: while flat, each entry signal places the strategy's
+    bracket order, sized like the live strategies from the simulated equity.
+    Orders can also be submitted directly with `submit`. `run` processes
+    every event in time order; results are read from `fills`, `trades` and
+    `summary`.
+
+    `latency_ms` delays orders from the decision (a bar's close, or the
+    tick itself when `bar_seconds` is 0) to the engine. `slippage_bps`
+    applies to market and stop fills. `participation` caps a symbol's
+    fills per bar, across all its orders, as a fraction of the bar's
+    volume (None for no cap).
+    `commission` is per share.
+    """
+
+    def __init__(self, initial_equity=100000.0, latency_ms=DEFAULT_LATENCY_MS, slippage_bps=DEFAULT_SLIPPAGE_BPS,
+                 participation=DEFAULT_PARTICIPATION, commission=0.0, bar_seconds=60):
+        self.initial_equity = initial_equity
+        self.latency_ns = int(latency_ms * NS_PER_MS)
+        self.slippage = slippage_bps / 10000
+        self.participation = participation
+        self.commission = commission
+        self.bar_ns = int(bar_seconds * NS_PER_SECOND)
+        self.books = {}
+        self.realized = 0.0
+        self.events = 0
+        self.partial_fills = 0
+        self._fills = []
+        self._trades = []
+        self._heap = []
+        self._ids = itertools.count(1)
+        self._sequence = itertools.count()
+
+    @property
+    def equity(self):
+        """Initial equity plus realized profit and loss"""
+        return self.initial_equity + self.realized
+
+    def add_symbol(self, symbol, bars, signals=None, params=None):
+        """Add a symbol's OHLCV bars
+
+        With a `SignalSeries` and the strategy's `params` (thresholds and
+        Kelly inputs), the symbol's entry signals are traded while flat.
+        """
+        book = _Book(symbol, bars, signals, params)
+        self.books[symbol] = book
+        self._schedule(book, 0)
+        return book
+
+    def _schedule(self, book, start):
+        # Only the latest event pushed for a book is live; earlier ones are skipped
+        bar = book.next_event(start)
+        book.scheduled = next(self._sequence)
+        if bar is not None:
+            heapq.heappush(self._heap, (int(book.timestamps[bar]), book.scheduled, book.symbol, bar))
+
+    def _order(self, symbol, side, qty, type='market', limit_price=None, stop_price=None, role=None,
+               client_order_id=None):
+        return SimOrder(next(self._ids), symbol, side, qty, type, limit_price, stop_price, role, client_order_id)
+
+    def submit(self, request, bar):
+        """Send a `submit_order` request decided at the close of `bar`
+
+        Accepts what `BaseStrategy.order_request` and `place_exit_orders`
+        produce. Returns the parent `SimOrder` (for an OCO pair, the
+        take-profit order).
+        """
+        symbol = request['symbol']
+        book = self.books[symbol]
+        side = 1 if request['side'] == 'buy' else -1
+        qty = float(request['qty'])
+        order_class = request.get('order_class')
+        take_profit = request.get('take_profit')
+        stop_loss = request.get('stop_loss')
+        arrival = int(np.searchsorted(book.timestamps, book.timestamps[bar] + self.bar_ns + self.latency_ns))
+        arrival = max(arrival, bar + 1)
+
+        if order_class == 'oco':
+            target = self._order(symbol, side, qty, 'limit', limit_price=take_profit['limit_price'],
+                                 role='take_profit', client_order_id=request.get('client_order_id'))
+            stop = self._order(symbol, side, qty, 'stop', stop_price=stop_loss['stop_price'], role='stop_loss')
+            target.oco, stop.oco = stop, target
+            self._activate(book, (target, stop), arrival)
+            return target
+
+        parent = self._order(
+            symbol, side, qty, request.get('type', 'market'),
+            limit_price=request.get('limit_price'), stop_price=request.get('stop_price'),
+            role='entry', client_order_id=request.get('client_order_id')
+        )
+        legs = []
+        if take_profit:
+            legs.append(self._order(symbol, -side, qty, 'limit', limit_price=take_profit['limit_price'],
+                                    role='take_profit'))
+        if stop_loss:
+            legs.append(self._order(symbol, -side, qty, 'stop', stop_price=stop_loss['stop_price'],
+                                    role='stop_loss'))
+        if len(legs) == 2:
+            legs[0].oco, legs[1].oco = legs[1], legs[0]
+        parent.legs = tuple(legs)
+        self._activate(book, (parent,), arrival)
+        return parent
+
+    def _activate(self, book, orders, bar):
+        for order in orders:
+            order.active_bar = bar
+            order.status = 'accepted'
+            book.orders.append(order)
+        self._schedule(book, bar)
+
+    def cancel(self, order):
+        """Cancel a working order (and the legs it has not activated yet)"""
+        if order.status in ('filled', 'canceled'):
+            return
+        order.status = 'canceled'
+        book = self.books[order.symbol]
+        if order in book.orders:
+            book.orders.remove(order)
+
+    def run(self):
+        """Process every event in time order; returns self"""
+        while self._heap:
+            _, sequence, symbol, bar = heapq.heappop(self._heap)
+            book = self.books[symbol]
+            if book.scheduled != sequence:
+                continue
+            self.events += 1
+            self._match(book, bar)
+            if not book.orders and book.position == 0 and book.params is not None:
+                k = np.searchsorted(book.entries, bar)
+                if k < len(book.entries) and book.entries[k] == bar:
+                    self._enter(book, bar, k)
+            self._schedule(book, bar + 1)
+        return self
+
+    def _enter(self, book, bar, k):
+        """Place the strategy's bracket entry for signal `k`, sized from the simulated equity"""
+        params = book.params
+        price = book.close[bar]
+        size = min(kelly_fraction(params) * abs(book.entry_strength[k]), params['max_position_size'])
+        shares = max(1, int(self.equity * size / price))
+        self.submit({
+            'symbol': book.symbol,
+            'qty': shares,
+            'side': 'buy' if book.entry_side[k] > 0 else 'sell',
+            'type': 'market',
+            'time_in_force': 'gtc',
+            'order_class': 'bracket',
+            'stop_loss': {'stop_price': order_price(book.entry_stop[k])},
+            'take_profit': {'limit_price': order_price(book.entry_target[k])}
+        }, bar)
+
+    def _fill_price(self, book, order, bar):
+        """Price `order` fills at in `bar`, or None if it doesn't"""
+        open_ = book.open[bar]
+        if order.fills_at_open:
+            return open_ * (1 + order.side * self.slippage)
+        if order.type == 'stop':
+            stop = order.stop_price
+            if order.side > 0 and book.high[bar] >= stop:
+                price = max(open_, stop)
+            elif order.side < 0 and book.low[bar] <= stop:
+                price = min(open_, stop)
+            else:
+                return None
+            order.triggered = True
+            return price * (1 + order.side * self.slippage)
+        limit = order.limit_price
+        if order.side > 0 and book.low[bar] <= limit:
+            return min(open_, limit)
+        if order.side < 0 and book.high[bar] >= limit:
+            return max(open_, limit)
+        return None
+
+    def _match(self, book, bar):
+        """Fill what `bar` allows of each active order
+
+        The participation cap is shared: all of the symbol's fills in a bar
+        together take at most `participation` of its volume.
+        """
+        capacity = np.inf if self.participation is None else np.floor(self.participation * book.volume[bar])
+        active = [order for order in book.orders if order.active_bar <= bar]
+        active.sort(key=lambda order: 0 if order.fills_at_open else _MATCH_ORDER[order.type])
+        for order in active:
+            if order.status in ('filled', 'canceled'):
+                continue
+            price = self._fill_price(book, order, bar)
+            qty = min(order.remaining, capacity)
+            if price is None or qty <= 0:
+                continue
+            self._fill(book, order, bar, qty, price)
+            capacity -= qty
+
+    def _fill(self, book, order, bar, qty, price):
+        order.filled_qty += qty
+        order.fill_value += qty * price
+        order.fills += 1
+        if order.fills == 2:
+            self.partial_fills += 1
+        order.status = 'partially_filled'
+        self._fills.append((int(book.timestamps[bar]), book.symbol, order.id, order.side, qty, price, order.role))
+        self._position(book, order, bar, qty, price)
+
+        if order.oco is not None and order.oco.status not in ('filled', 'canceled'):
+            order.oco.qty -= qty
+            if order.oco.remaining <= 0:
+                self.cancel(order.oco)
+        if order.remaining <= 0:
+            order.status = 'filled'
+            book.orders.remove(order)
+            legs = [leg for leg in order.legs if leg.status == 'new']
+            for leg in legs:
+                leg.qty = order.filled_qty
+            if legs:
+                self._activate(book, legs, bar + 1)
+
+    def _position(self, book, order, bar, qty, price):
+        """Apply a fill to the position, closing the trade when it goes flat"""
+        commission = self.commission * qty
+        self.realized -= commission
+        position = book.position
+        if position == 0:
+            book.trade = {
+                'symbol': book.symbol,
+                'side': 'long' if order.side > 0 else 'short',
+                'entry_bar': bar,
+                'shares': 0.0,
+                'entry_value': 0.0,
+                'exit_qty': 0.0,
+                'exit_value': 0.0,
+                'pnl': 0.0
+            }
+        trade = book.trade
+        trade['pnl'] -= commission
+        if position * order.side >= 0:
+            book.position += order.side * qty
+            book.cost += order.side * qty * price
+            trade['shares'] += qty
+            trade['entry_value'] += qty * price
+            return
+
+        closing = min(qty, abs(position))
+        average = book.cost / position
+        pnl = closing * (price - average) * np.sign(position)
+        self.realized += pnl
+        trade['pnl'] += pnl
+        trade['exit_qty'] += closing
+        trade['exit_value'] += closing * price
+        book.position = position + order.side * closing
+        book.cost = book.position * average
+        if book.position == 0:
+            self._close_trade(book, bar, order.role)
+            if qty > closing:
+                # A fill larger than the position reverses it
+                self._position(book, order, bar, qty - closing, price)
+
+    def _close_trade(self, book, bar, reason):
+        trade = book.trade
+        entry_price = trade['entry_value'] / trade['shares']
+        exit_price = trade['exit_value'] / trade['exit_qty']
+        direction = 1 if trade['side'] == 'long' else -1
+        self._trades.append({
+            'symbol': trade['symbol'],
+            'entry_time': int(book.timestamps[trade['entry_bar']]),
+            'exit_time': int(book.timestamps[bar]),
+            'side': trade['side'],
+            'shares': trade['shares'],
+            'entry_price': entry_price,
+            'exit_price': exit_price,
+            'pnl': trade['pnl'],
+            'return': direction * (exit_price - entry_price) / entry_price,
+            'bars_held': bar - trade['entry_bar'],
+            'exit_reason': reason
+        })
+        book.trade = None
+        book.cost = 0.0
+
+    @property
+    def fills(self):
+        """Every fill: time, symbol, order id, side, qty, price and the order's role"""
+        fills = pd.DataFrame(self._fills, columns=['time', 'symbol', 'order_id', 'side', 'qty', 'price', 'role'])
+        fills['time'] = pd.to_datetime(fills['time'], utc=True)
+        fills['side'] = np.where(fills['side'] > 0, 'buy', 'sell')
+        return fills
+
+    @property
+    def trades(self):
+        """Round trips, from the first entry fill to the fill that left the position flat"""
+        columns = ['symbol', 'entry_time', 'exit_time', 'side', 'shares', 'entry_price', 'exit_price',
+                   'pnl', 'return', 'bars_held', 'exit_reason']
+        trades = pd.DataFrame(self._trades, columns=columns)
+        for column in ('entry_time', 'exit_time'):
+            trades[column] = pd.to_datetime(trades[column], utc=True)
+        return trades
+
+    def summary(self):
+        """Headline statistics; open positions are marked at their last close"""
+        pnl = np.array([trade['pnl'] for trade in self._trades])
+        unrealized = sum(
+            book.position * book.close[-1] - book.cost for book in self.books.values() if book.position and len(book)
+        )
+        return {
+            'num_trades': len(pnl),
+            'total_pnl': float(pnl.sum()) if len(pnl) else 0.0,
+            'unrealized_pnl': float(unrealized),
+            'total_return': float((self.realized + unrealized) / self.initial_equity),
+            'win_rate': float((pnl > 0).mean()) if len(pnl) else 0.0,
+            'num_fills': len(self._fills),
+            'partial_fills': self.partial_fills,
+            'open_positions': sum(1 for book in self.books.values() if book.position),
+            'events': self.events
+        }
+
+def simulate(bars_by_symbol, strategy='mean_reversion', params=None, initial_equity=100000.0,
+             latency_ms=DEFAULT_LATENCY_MS, slippage_bps=DEFAULT_SLIPPAGE_BPS,
+             participation=DEFAULT_PARTICIPATION, commission=0.0, bar_seconds=60):
+    """Trade a strategy over a universe through the execution simulator
+
+    `bars_by_symbol` maps symbols to OHLCV frames. Each symbol's signals
+    come from the strategy's `signal_series`, as in `backtest`, but entries
+    go out as bracket orders and are filled by the matching engine. Returns
+    a dict with the `fills` and `trades` frames and the summary statistics.
+    """
+    strategy_class = get_strategy(strategy)
+    params = {**strategy_class.PARAMS, **(params or {})}
+    simulator = ExecutionSimulator(initial_equity, latency_ms, slippage_bps, participation, commission, bar_seconds)
+    for symbol, bars in bars_by_symbol.items():
+        simulator.add_symbol(symbol, bars, strategy_signals(strategy_class, bars, params), params)
+    simulator.run()
+    return {
+        'fills': simulator.fills,
+        'trades': simulator.trades,
+        **simulator.summary()
+    }
@@ -0,0 +1,99 @@
+import sys
+import json
+import logging
+import argparse
+
+from benchmarks.suite import (
+    PROFILES,
+    DEFAULT_THRESHOLD,
+    run_benchmarks,
+    save_results,
+    load_results,
+    compare_results
+)
+from benchmarks.startup import STARTUP_PATHS, IMPORT_BUDGET_MS, IMPORT_RUNS, check_startup
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    handlers=[logging.StreamHandler(sys.stdout)]
+)
+
+def report(key, timing):
+    print(f"{key:<60} {timing['min'] * 1000:>12.3f} ms  (median {timing['median'] * 1000:.3f} ms, {timing['repeats']} runs)")
+
+def main():
+    """Run the benchmark suite, compare a run against a stored baseline, or check startup imports"""
+    parser = argparse.ArgumentParser(description="Benchmark indicators, data loading and the trading cycle")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run = commands.add_parser('run', help="Run the suite and write the results as JSON")
+    run.add_argument('--output', default='benchmark_results.json')
+
+    compare = commands.add_parser('compare', help="Flag slowdowns against a baseline")
+    compare.add_argument('baseline', help="Baseline JSON written by 'run'")
+    compare.add_argument('--current', help="Results JSON to compare (default: run the baseline's cases now)")
+    compare.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                         help="Relative slowdown that counts as a regression")
+    compare.add_argument('--output', help="Also write the fresh results here")
+
+    startup = commands.add_parser('startup', help="Check the entry point's import time and imported modules")
+    startup.add_argument('--path', choices=sorted(STARTUP_PATHS), action='append',
+                         help="Startup path to check (default: all)")
+    startup.add_argument('--runs', type=int, default=IMPORT_RUNS, help="Fresh interpreters per path")
+    startup.add_argument('--budget', type=float, action='append', metavar='MS',
+                         help="Import-time budget per --path, in order (default: built-in budgets)")
+    startup.add_argument('--output', help="Write the measurements as JSON")
+
+    for command in (run, compare):
+        command.add_argument('--profile', choices=sorted(PROFILES), help="Sizes to run (default: quick)")
+        command.add_argument('--filter', help="Only run benchmarks whose name contains this")
+        command.add_argument('--min-time', type=float, default=0.5, help="Seconds to repeat each case for")
+    args = parser.parse_args()
+
+    if args.command == 'startup':
+        budgets = dict(IMPORT_BUDGET_MS)
+        if args.budget:
+            budgets.update(zip(args.path or sorted(STARTUP_PATHS), args.budget))
+        results = check_startup(args.path, budgets, args.runs)
+        for path, result in results.items():
+            print(f"{path:<16} imports {result['import_ms']:>8.1f} ms (budget {result['budget_ms']} ms), "
+                  f"process {result['wall_ms']:>8.1f} ms  {result['status']}")
+            for name, ms in result['slowest']:
+                print(f"    {name:<40} {ms:>8.1f} ms")
+            if result['forbidden']:
+                print(f"    forbidden imports: {', '.join(result['forbidden'])}")
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump(results, f, indent=2)
+        if any(result['status'] != 'ok' for result in results.values()):
+            logging.error("Startup import check failed")
+            sys.exit(1)
+        return
+
+    if args.command == 'run':
+        profile = args.profile or 'quick'
+        results = run_benchmarks(profile, args.filter, args.min_time, progress=report)
+        save_results(results, args.output, profile)
+        logging.info(f"Wrote {len(results)} results to {args.output}")
+        return
+
+    baseline = load_results(args.baseline)
+    if args.current:
+        current = load_results(args.current)['results']
+    else:
+        profile = args.profile or baseline['profile']
+        current = run_benchmarks(profile, args.filter, args.min_time, only=set(baseline['results']), progress=report)
+        if args.output:
+            save_results(current, args.output, profile)
+
+    comparison = compare_results(baseline['results'], current, args.threshold)
+    print(comparison.to_string(index=False, float_format=lambda x: f'{x:.3f}'))
+    slower = comparison[comparison['status'] == 'slower']
+    if len(slower):
+        logging.error(f"{len(slower)} benchmark(s) slower than baseline by more than {args.threshold:.0%}")
+        sys.exit(1)
+    logging.info("No regressions beyond the threshold")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Import-time budget for the entry point.
+
+Each startup path is a statement run in a fresh interpreter under
+`python -X importtime`. Its import time is the summed cumulative time of
+the top-level imports the statement triggers, excluding what the
+interpreter imports on its own. A path fails the check if it loads a
+forbidden module or its median import time exceeds its budget.
+"""
+import os
+import sys
+import time
+import statistics
+import subprocess
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules a trading cycle loads on top of `main` (imported lazily by main())
+TRADING_MODULES = (
+    'alpaca_trade_api',
+    'analysis.market_analysis',
+    'strategies.trend_following',
+    'strategies.mean_reversion',
+    'strategies.snapshot',
+    'utils.bar_cache',
+    'utils.api_replay',
+    'execution.order_pipeline',
+    'execution.order_book'
+)
+
+STARTUP_PATHS = {
+    # Scheduled run outside market hours: import, check the clock, exit
+    'market_closed': 'import main; main.is_market_open()',
+    'trading': 'import main, ' + ', '.join(TRADING_MODULES)
+}
+
+# Modules (and their submodules) each path must never load
+FORBIDDEN_MODULES = {
+    'market_closed': ('numpy', 'pandas', 'pytz', 'dotenv', 'alpaca_trade_api', 'scipy', 'aiohttp'),
+    'trading': ('scipy', 'matplotlib')
+}
+
+# Median import time budgets in milliseconds, with headroom for CI runners
+IMPORT_BUDGET_MS = {
+    'market_closed': 100,
+    'trading': 1500
+}
+
+IMPORT_RUNS = 5
+
+def parse_importtime(stderr):
+    """[(depth, module, self_us, cumulative_us)] from `-X importtime` output"""
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip())) // 2
+        entries.append((depth, name.strip(), int(self_us), int(cumulative_us)))
+    return entries
+
+def _run(statement):
+    started = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', statement],
+        cwd=SRC_DIR, capture_output=True, text=True, check=True
+    )
+    return parse_importtime(completed.stderr), time.perf_counter() - started
+
+def measure_startup(statement, runs=IMPORT_RUNS):
+    """Median import time (ms) and wall time (ms) of `statement`, and what it imported"""
+    interpreter = {name for _, name, _, _ in _run('pass')[0]}
+    totals, walls = [], []
+    for _ in range(runs):
+        entries, wall = _run(statement)
+        own = [entry for entry in entries if entry[1] not in interpreter]
+        totals.append(sum(cumulative for depth, _, _, cumulative in own if depth == 0) / 1000)
+        walls.append(wall * 1000)
+    top = sorted((entry for entry in own if entry[0] == 0), key=lambda entry: -entry[3])
+    return {
+        'import_ms': statistics.median(totals),
+        'wall_ms': statistics.median(walls),
+        'modules': sorted(name for _, name, _, _ in own),
+        'slowest': [(name, cumulative / 1000) for _, name, _, cumulative in top[:5]]
+    }
+
+def check_startup(paths=None, budgets=IMPORT_BUDGET_MS, runs=IMPORT_RUNS):
+    """Measure each startup path against its budget and forbidden modules"""
+    results = {}
+    for path in paths or STARTUP_PATHS:
+        measured = measure_startup(STARTUP_PATHS[path], runs)
+        forbidden = sorted(
+            name for name in measured['modules']
+            if any(name == banned or name.startswith(banned + '.') for banned in FORBIDDEN_MODULES.get(path, ()))
+        )
+        budget = budgets.get(path)
+        status = 'ok'
+        if forbidden:
+            status = 'forbidden'
+        elif budget is not None and measured['import_ms'] > budget:
+            status = 'over budget'
+        results[path] = {
+            'import_ms': measured['import_ms'],
+            'wall_ms': measured['wall_ms'],
+            'budget_ms': budget,
+            'forbidden': forbidden,
+            'slowest': measured['slowest'],
+            'status': status
+        }
+    return results
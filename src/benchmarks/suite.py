@@ -0,0 +1,311 @@
+"""
+Benchmark definitions, runner and baseline comparison.
+
+Each benchmark is registered with the dimension it scales over, either
+'bars' (one series of that many bars) or 'symbols' (that many symbols),
+and a setup context manager that yields the callable to time. A profile
+picks the sizes to run; results are keyed "name[dimension=size]".
+"""
+import gc
+import os
+import sys
+import json
+import time
+import logging
+import platform
+import tempfile
+import statistics
+import contextlib
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+from alpaca_trade_api.rest import TimeFrame, TimeFrameUnit
+
+from analysis import technical_indicators as ti
+from analysis.indicator_kernel import compute_indicators, pack_bars
+from analysis.market_analysis import (
+    detect_market_regime,
+    detect_market_regimes,
+    regime_series,
+    add_indicators,
+    analyze_order_flow,
+    get_market_data,
+    get_market_data_for_symbols,
+    fetch_market_frames
+)
+from analysis.bar_store import BarStore
+from backtesting.simulator import simulate
+from utils.bar_cache import BarCache
+from utils.log_config import stop_logging
+from .synthetic import FakeAPI, synthetic_frame
+
+SIZES = {
+    'bars': (200, 10_000, 1_000_000, 10_000_000),
+    'symbols': (1, 10, 100, 1000)
+}
+
+# Largest size per dimension each profile runs
+PROFILES = {
+    'quick': {'bars': 10_000, 'symbols': 10},
+    'default': {'bars': 1_000_000, 'symbols': 100},
+    'full': {'bars': 10_000_000, 'symbols': 1000}
+}
+
+# Bars per symbol in the multi-symbol indicator benchmarks
+UNIVERSE_BARS = 2000
+
+# A case is repeated until it has run this long, within the repeat bounds
+MIN_RUN_SECONDS = 0.5
+MIN_REPEATS = 3
+MAX_REPEATS = 50
+
+# Relative slowdown that counts as a regression
+DEFAULT_THRESHOLD = 0.10
+
+BENCHMARKS = {}
+
+def benchmark(name, dimension):
+    """Register a setup context manager `setup(size)` yielding the callable to time"""
+    def register(setup):
+        BENCHMARKS[name] = (dimension, contextlib.contextmanager(setup))
+        return setup
+    return register
+
+def timeframes():
+    """The timeframes `main()` trades on"""
+    return {
+        '1m': TimeFrame.Minute,
+        '5m': TimeFrame(5, TimeFrameUnit.Minute),
+        '15m': TimeFrame(15, TimeFrameUnit.Minute),
+        '1h': TimeFrame.Hour,
+        '1d': TimeFrame.Day
+    }
+
+def universe(n_symbols):
+    return [f'SYM{i:04d}' for i in range(n_symbols)]
+
+# One bar frame at a time: the 10M-bar frame alone is most of a gigabyte
+@lru_cache(maxsize=1)
+def bar_frame(n_bars):
+    return synthetic_frame(n_bars)
+
+@lru_cache(maxsize=1)
+def universe_frames(n_symbols):
+    return [synthetic_frame(UNIVERSE_BARS, seed=i) for i in range(n_symbols)]
+
+INDICATOR_CALLS = {
+    'calculate_atr': lambda b: ti.calculate_atr(b['high'], b['low'], b['close']),
+    'calculate_rsi': lambda b: ti.calculate_rsi(b['close']),
+    'calculate_macd': lambda b: ti.calculate_macd(b['close']),
+    'calculate_bollinger_bands': lambda b: ti.calculate_bollinger_bands(b['close']),
+    'calculate_vwap': lambda b: ti.calculate_vwap(b['high'], b['low'], b['close'], b['volume']),
+    'calculate_adx': lambda b: ti.calculate_adx(b['high'], b['low'], b['close']),
+    'calculate_volume_profile': lambda b: ti.calculate_volume_profile(b['high'], b['low'], b['close'], b['volume']),
+    'calculate_support_resistance': lambda b: ti.calculate_support_resistance(
+        b['high'], b['low'], b['close'], b['volume']
+    )
+}
+
+def _register_bar_function(name, call):
+    @benchmark(name, 'bars')
+    def setup(n_bars):
+        bars = bar_frame(n_bars)
+        yield lambda: call(bars)
+
+for _name, _call in INDICATOR_CALLS.items():
+    _register_bar_function(f'indicators.{_name}', _call)
+_register_bar_function('market.detect_market_regime', lambda b: detect_market_regime(b, cache=False))
+_register_bar_function('market.analyze_order_flow', analyze_order_flow)
+
+@benchmark('kernel.compute_indicators', 'bars')
+def _kernel(n_bars):
+    bars = bar_frame(n_bars)
+    arrays = [bars[c].to_numpy() for c in ('high', 'low', 'close', 'volume')]
+    yield lambda: compute_indicators(*arrays, adx_period=14)
+
+@benchmark('kernel.compute_indicators_2d', 'symbols')
+def _kernel_2d(n_symbols):
+    high, low, close, volume, lengths = pack_bars(universe_frames(n_symbols))
+    yield lambda: compute_indicators(high, low, close, volume, lengths=lengths, adx_period=14)
+
+@benchmark('market.regime_series', 'bars')
+def _regime_series(n_bars):
+    # Regimes over a whole history whose frame already carries the indicators
+    bars = add_indicators(bar_frame(n_bars).copy())
+    yield lambda: regime_series(bars, cache=False)
+
+@benchmark('market.detect_market_regimes', 'symbols')
+def _regimes(n_symbols):
+    frames = dict(zip(universe(n_symbols), universe_frames(n_symbols)))
+    yield lambda: detect_market_regimes(frames, cache=False)
+
+@benchmark('data.get_market_data', 'symbols')
+def _market_data(n_symbols):
+    api = FakeAPI()
+    symbols = universe(n_symbols)
+    if n_symbols == 1:
+        yield lambda: get_market_data(api, symbols[0], timeframes())
+    else:
+        yield lambda: get_market_data_for_symbols(api, symbols, timeframes())
+
+@benchmark('data.get_market_data_cached', 'symbols')
+def _market_data_cached(n_symbols):
+    api = FakeAPI()
+    symbols = universe(n_symbols)
+    with tempfile.TemporaryDirectory() as root:
+        cache = BarCache(root)
+        yield lambda: get_market_data_for_symbols(api, symbols, timeframes(), cache=cache)
+
+@benchmark('data.bar_store_market_data', 'symbols')
+def _bar_store(n_symbols):
+    # The daemon's per-cycle read: array views plus indicators for every symbol
+    symbols = universe(n_symbols)
+    store = BarStore(symbols, timeframes())
+    store.load(fetch_market_frames(FakeAPI(), symbols, timeframes()))
+    yield lambda: [store.market_data(symbol) for symbol in symbols]
+
+@benchmark('backtest.simulate', 'symbols')
+def _simulate(n_symbols):
+    # Signals, bracket orders and fills for a universe through the matching engine
+    frames = dict(zip(universe(n_symbols), universe_frames(n_symbols)))
+    yield lambda: simulate(frames, 'trend_following')
+
+@benchmark('cycle.main', 'symbols')
+def _main_cycle(n_symbols):
+    api = FakeAPI()
+    account = api.get_account()
+    import main
+    with tempfile.TemporaryDirectory() as root:
+        saved = (main.initialize_api, main.is_market_open, sys.argv, os.environ.get('BAR_CACHE_DIR'))
+        root_handlers = logging.getLogger().handlers[:]
+        main.initialize_api = lambda: (api, account)
+        main.is_market_open = lambda: True
+        sys.argv = ['main.py', '--symbols', ','.join(universe(n_symbols)),
+                    '--log-file', os.path.join(root, 'trading_bot.log')]
+        os.environ['BAR_CACHE_DIR'] = root
+
+        def cycle():
+            try:
+                main.main()
+            except SystemExit:
+                pass
+
+        try:
+            yield cycle
+        finally:
+            # main() routes logging through its own queue listener; put ours back
+            stop_logging()
+            logging.getLogger().handlers[:] = root_handlers
+            main.initialize_api, main.is_market_open, sys.argv, cache_dir = saved
+            if cache_dir is None:
+                os.environ.pop('BAR_CACHE_DIR', None)
+            else:
+                os.environ['BAR_CACHE_DIR'] = cache_dir
+
+def select_cases(profile='quick', pattern=None):
+    """(name, dimension, size) for every case a profile runs, smallest sizes first"""
+    limits = PROFILES[profile]
+    cases = [
+        (name, dimension, size)
+        for name, (dimension, _) in BENCHMARKS.items()
+        for size in SIZES[dimension]
+        if size <= limits[dimension] and (pattern is None or pattern in name)
+    ]
+    # Grouping by size lets consecutive cases reuse the cached input data
+    return sorted(cases, key=lambda case: (case[1], case[2], case[0]))
+
+def case_key(name, dimension, size):
+    return f'{name}[{dimension}={size}]'
+
+def time_callable(func, min_time=MIN_RUN_SECONDS):
+    """Wall-clock timings of `func` after one warm-up call"""
+    func()
+    times = []
+    started = time.perf_counter()
+    while len(times) < MIN_REPEATS or (len(times) < MAX_REPEATS and time.perf_counter() - started < min_time):
+        gc.collect()
+        begin = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - begin)
+        # A single very slow case isn't worth three repeats
+        if times[0] > 10 * min_time:
+            break
+    return {
+        'min': min(times),
+        'median': statistics.median(times),
+        'mean': statistics.fmean(times),
+        'repeats': len(times)
+    }
+
+def run_benchmarks(profile='quick', pattern=None, min_time=MIN_RUN_SECONDS, only=None, progress=None):
+    """Time every selected case; returns {case key: timing dict}
+
+    `only` restricts the run to the given case keys (e.g. a baseline's) and
+    `progress(key, timing)` is called after each case. Logging is disabled
+    while timing so the bot's own records neither flood the output nor
+    dominate the measurements.
+    """
+    results = {}
+    logging.disable(logging.CRITICAL)
+    try:
+        for name, dimension, size in select_cases(profile, pattern):
+            key = case_key(name, dimension, size)
+            if only is not None and key not in only:
+                continue
+            with BENCHMARKS[name][1](size) as func:
+                results[key] = time_callable(func, min_time)
+            if progress is not None:
+                progress(key, results[key])
+    finally:
+        logging.disable(logging.NOTSET)
+        bar_frame.cache_clear()
+        universe_frames.cache_clear()
+    return results
+
+def environment():
+    """What produced a set of results; timings only compare on like machines"""
+    return {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'platform': platform.platform(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count(),
+        'timestamp': pd.Timestamp.now(tz='UTC').isoformat()
+    }
+
+def save_results(results, path, profile):
+    """Write results as a JSON baseline"""
+    with open(path, 'w') as f:
+        json.dump({'environment': environment(), 'profile': profile, 'results': results}, f, indent=2, sort_keys=True)
+
+def load_results(path):
+    with open(path) as f:
+        return json.load(f)
+
+def compare_results(baseline, current, threshold=DEFAULT_THRESHOLD):
+    """Compare two result dicts on min time
+
+    Returns a frame with one row per case and a status of 'slower' (beyond
+    `threshold`), 'faster', 'same', 'new' or 'missing'.
+    """
+    rows = []
+    for key in sorted(set(baseline) | set(current)):
+        before = baseline.get(key, {}).get('min')
+        after = current.get(key, {}).get('min')
+        if before is None:
+            status, ratio = 'new', np.nan
+        elif after is None:
+            status, ratio = 'missing', np.nan
+        else:
+            ratio = after / before
+            if ratio > 1 + threshold:
+                status = 'slower'
+            elif ratio < 1 / (1 + threshold):
+                status = 'faster'
+            else:
+                status = 'same'
+        rows.append({'case': key, 'baseline_ms': before and before * 1000,
+                     'current_ms': after and after * 1000, 'ratio': ratio, 'status': status})
+    return pd.DataFrame(rows, columns=['case', 'baseline_ms', 'current_ms', 'ratio', 'status'])
@@ -0,0 +1,201 @@
+"""
+Synthetic market data and an in-memory stand-in for the Alpaca REST client.
+
+Bars are random walks seeded per symbol and generated backwards from the
+most recent bar, so the same symbol always has the same history no matter
+how far back a request reaches. That keeps benchmark runs comparable.
+"""
+import time
+import zlib
+import itertools
+import numpy as np
+import pandas as pd
+from types import SimpleNamespace
+from alpaca_trade_api.rest import APIError, TimeFrame, TimeFrameUnit
+
+from analysis.market_analysis import EXCHANGE_TZ, SESSION_OPEN_MINUTE, MINUTES_PER_SESSION
+from utils.market_calendar import MarketCalendar
+
+# Default history served when a request has no start
+DEFAULT_HISTORY_DAYS = 30
+
+def random_walk_bars(index, seed=0, price=100.0):
+    """Random-walk bars over `index`, shaped like `get_bars(...).df`
+
+    The walk ends at `price` on the last bar and every field has its own
+    random stream drawn from the end, so a longer index only adds history.
+    """
+    n = len(index)
+    streams = [np.random.default_rng([seed, field]) for field in range(4)]
+    log_returns = streams[0].normal(0, 0.001, n)[::-1]
+    # close[i] = price * exp(-sum of the returns after bar i)
+    close = price * np.exp(log_returns - np.cumsum(log_returns[::-1])[::-1])
+    open_ = np.empty(n)
+    open_[1:] = close[:-1]
+    open_[:1] = close[:1] * np.exp(-log_returns[:1])
+    spread = np.abs(streams[1].normal(0, 0.0005, n)[::-1]) * close
+    high = np.maximum(open_, close) + spread
+    low = np.minimum(open_, close) - spread
+    return pd.DataFrame({
+        'open': open_,
+        'high': high,
+        'low': low,
+        'close': close,
+        'volume': streams[2].integers(100, 10000, n)[::-1].astype(float),
+        'trade_count': streams[3].integers(1, 200, n)[::-1],
+        'vwap': (high + low + close) / 3
+    }, index=pd.DatetimeIndex(index, name='timestamp'))
+
+def synthetic_frame(n_bars, seed=0, end='2024-06-28 20:00'):
+    """`n_bars` consecutive minute bars ending at `end` (UTC)"""
+    index = pd.date_range(end=pd.Timestamp(end, tz='UTC'), periods=n_bars, freq='1min')
+    return random_walk_bars(index, seed)
+
+def symbol_seed(symbol, seed=0):
+    """Stable per-symbol seed (Python's str hash is salted per process)"""
+    return zlib.crc32(f'{seed}:{symbol}'.encode())
+
+def session_timestamps(start, end, timeframe):
+    """Bar timestamps (UTC) of a timeframe within regular sessions between start and end"""
+    first_day = start.tz_convert(EXCHANGE_TZ).tz_localize(None).normalize()
+    last_day = end.tz_convert(EXCHANGE_TZ).tz_localize(None).normalize()
+    days = pd.bdate_range(first_day, last_day)
+
+    if timeframe.unit == TimeFrameUnit.Day:
+        wall = days
+    else:
+        step = timeframe.amount * (60 if timeframe.unit == TimeFrameUnit.Hour else 1)
+        offsets = pd.to_timedelta(
+            np.arange(SESSION_OPEN_MINUTE, SESSION_OPEN_MINUTE + MINUTES_PER_SESSION, step), unit='min'
+        )
+        wall = pd.DatetimeIndex((days.values[:, None] + offsets.values[None, :]).ravel())
+
+    index = wall.tz_localize(EXCHANGE_TZ).tz_convert('UTC')
+    return index[(index >= start) & (index <= end)]
+
+def _parse_timeframe(timeframe):
+    """A `TimeFrame` from a TimeFrame or its string form ('5Min', '1Day')"""
+    if isinstance(timeframe, TimeFrame):
+        return timeframe
+    for unit in TimeFrameUnit:
+        amount = str(timeframe)[:-len(unit.value)]
+        if str(timeframe).endswith(unit.value) and amount.isdigit():
+            return TimeFrame(int(amount), unit)
+    raise APIError({'code': 42210000, 'message': f'invalid timeframe: {timeframe}'})
+
+class FakeAPI:
+    """Deterministic in-memory stand-in for `tradeapi.REST`
+
+    Serves random-walk bars over regular sessions up to `now` for any
+    symbol and accepts orders without side effects. Each call sleeps
+    `latency` seconds to mimic the network; the default of zero measures
+    our own overhead only.
+    """
+
+    def __init__(self, now=None, equity=100000.0, latency=0.0, seed=0):
+        self.now = pd.Timestamp(now or pd.Timestamp.now(tz='UTC')).floor('min')
+        if self.now.tz is None:
+            self.now = self.now.tz_localize('UTC')
+        self.equity = equity
+        self.latency = latency
+        self.seed = seed
+        self.orders = []
+        self._order_ids = itertools.count(1)
+        self._history = {}
+
+    def _wait(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _bars(self, symbol, timeframe, start):
+        """History for (symbol, timeframe) from at least `start`, generated once"""
+        key = (symbol, str(timeframe))
+        frame = self._history.get(key)
+        if frame is None or frame.attrs['start'] > start:
+            index = session_timestamps(start, self.now, timeframe)
+            frame = random_walk_bars(index, symbol_seed(symbol, self.seed))
+            frame.attrs['start'] = start
+            self._history[key] = frame
+        return frame
+
+    def get_bars(self, symbol, timeframe, start=None, end=None, adjustment=None, limit=None, **kwargs):
+        self._wait()
+        timeframe = _parse_timeframe(timeframe)
+        start = pd.Timestamp(start) if start is not None else self.now - pd.Timedelta(days=DEFAULT_HISTORY_DAYS)
+        start = start.tz_localize('UTC') if start.tz is None else start.tz_convert('UTC')
+        end = pd.Timestamp(end) if end is not None else self.now
+        end = end.tz_localize('UTC') if end.tz is None else end.tz_convert('UTC')
+
+        symbols = [symbol] if isinstance(symbol, str) else list(symbol)
+        frames = []
+        for name in symbols:
+            bars = self._bars(name, timeframe, start)
+            bars = bars.iloc[bars.index.searchsorted(start):bars.index.searchsorted(end, side='right')]
+            frames.append(bars.iloc[:limit] if limit else bars)
+
+        if isinstance(symbol, str):
+            df = frames[0].copy()
+        else:
+            df = pd.concat([bars.assign(symbol=name) for name, bars in zip(symbols, frames)])
+        return SimpleNamespace(df=df)
+
+    def get_latest_trade(self, symbol):
+        self._wait()
+        bars = self._bars(symbol, TimeFrame.Minute, self.now - pd.Timedelta(days=DEFAULT_HISTORY_DAYS))
+        return SimpleNamespace(symbol=symbol, price=float(bars['close'].iloc[-1]), timestamp=bars.index[-1])
+
+    def get_account(self):
+        self._wait()
+        return SimpleNamespace(
+            status='ACTIVE',
+            cash=str(self.equity),
+            equity=str(self.equity),
+            buying_power=str(2 * self.equity),
+            portfolio_value=str(self.equity)
+        )
+
+    def get_clock(self):
+        self._wait()
+        return SimpleNamespace(timestamp=self.now, is_open=True)
+
+    def get_calendar(self, start=None, end=None):
+        """Sessions under the NYSE holiday rules"""
+        self._wait()
+        start = pd.Timestamp(start or self.now - pd.Timedelta(days=DEFAULT_HISTORY_DAYS)).date()
+        end = pd.Timestamp(end or self.now + pd.Timedelta(days=DEFAULT_HISTORY_DAYS)).date()
+        calendar = MarketCalendar.from_rules(start, end)
+        sessions = []
+        day = start
+        while day <= end:
+            session = calendar.session(day)
+            if session is not None:
+                sessions.append(SimpleNamespace(
+                    date=day.isoformat(), open=f'{session[0]:%H:%M}', close=f'{session[1]:%H:%M}'
+                ))
+            day += pd.Timedelta(days=1)
+        return sessions
+
+    def get_position(self, symbol):
+        self._wait()
+        raise APIError({'code': 40410000, 'message': 'position does not exist'})
+
+    def list_positions(self):
+        self._wait()
+        return []
+
+    def list_orders(self, **kwargs):
+        self._wait()
+        return []
+
+    def cancel_order(self, order_id):
+        self._wait()
+
+    def close_position(self, symbol, qty=None):
+        self._wait()
+        raise APIError({'code': 40410000, 'message': 'position does not exist'})
+
+    def submit_order(self, **kwargs):
+        self._wait()
+        order = SimpleNamespace(id=str(next(self._order_ids)), status='accepted', **kwargs)
+        self.orders.append(order)
+        return order
@@ -0,0 +1,232 @@
+import time
+import asyncio
+import logging
+import numpy as np
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+
+from analysis.market_analysis import (
+    is_market_open,
+    fetch_market_frames,
+    BARS_PER_TIMEFRAME
+)
+from analysis.bar_store import BarStore
+from streaming.bar_stream import BarStream
+from streaming.trade_stream import TradeUpdateStream
+from strategies.snapshot import build_snapshot
+from execution.order_pipeline import OrderPipeline
+from execution.order_book import OrderBook
+from execution.risk_engine import PortfolioRiskEngine, place_entries
+from utils.timing import TIMINGS, span
+
+# How often the cached account (equity, buying power) is refreshed
+ACCOUNT_REFRESH_SECONDS = 15 * 60
+
+# How often the order book is reconciled against the broker
+RECONCILE_SECONDS = 5 * 60
+
+# How often stage timings are exported, when enabled
+TIMINGS_EXPORT_SECONDS = 60
+
+class TradingDaemon:
+    """Long-running bot driven by the market data websocket
+
+    Keeps one authenticated REST session and the bars in a `BarStore` of
+    fixed-size ring buffers (float32 prices with `bar_dtype=np.float32`).
+    Closed minute bars from the stream are queued, so the socket keeps
+    reading while a cycle runs. One consumer appends them in place,
+    updating the intraday timeframes and the day's daily bar, and while
+    the market is open runs the trading cycle on array views of the latest
+    bars. Bars that queue up behind a slow cycle are stored together, and
+    each of their symbols is evaluated once, on its latest bar. Each
+    (re)connect backfills through the REST API (and the bar cache, when
+    given) so bars missed while disconnected are not lost.
+
+    Positions and open orders come from an `OrderBook`. With a
+    `trade_stream_url` it is kept current by the trade updates stream and
+    resynchronised on every reconnect; either way it is reconciled with the
+    broker every `RECONCILE_SECONDS`. New entries are sized against those
+    positions by a `PortfolioRiskEngine`. With a `timings_path`, stage
+    timings are exported there every `TIMINGS_EXPORT_SECONDS` and on shutdown.
+    """
+
+    def __init__(self, api, account, symbols, timeframes, cycle, stream_url,
+                 key, secret, cache=None, bars=BARS_PER_TIMEFRAME, trade_stream_url=None,
+                 timings_path=None, bar_dtype=np.float64):
+        self.api = api
+        self.account = account
+        self.symbols = list(symbols)
+        self.timeframes = timeframes
+        self.cycle = cycle
+        self.cache = cache
+        self.bars = bars
+        self.store = BarStore(self.symbols, timeframes, bars, bar_dtype)
+        self.backfilled = False
+        self.account_refreshed = time.monotonic()
+        self.book = OrderBook()
+        self.risk = PortfolioRiskEngine()
+        self.book_synced = None
+        self.timings_path = timings_path
+        self.timings_exported = time.monotonic()
+        self.logger = logging.getLogger(self.__class__.__name__)
+        # Bars, backfills and cycles run one at a time off the event loop
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.bar_queue = asyncio.Queue()
+        # Order acknowledgements don't hold up the next evaluation
+        self.orders = OrderPipeline(api, book=self.book)
+        self.stream = BarStream(
+            stream_url, key, secret, self.symbols,
+            on_bar=self.on_bar,
+            on_connect=self.backfill
+        )
+        self.trade_stream = None
+        if trade_stream_url is not None:
+            self.trade_stream = TradeUpdateStream(
+                trade_stream_url, key, secret,
+                on_update=self.on_trade_update,
+                on_connect=self.sync_book
+            )
+
+    def _backfill(self):
+        frames = fetch_market_frames(self.api, self.symbols, self.timeframes, self.bars, cache=self.cache)
+        missed = 0
+        for symbol in self.symbols:
+            minute_bars = frames.get((symbol, 'minute'))
+            last = self.store.last_timestamp(symbol)
+            if minute_bars is not None and last is not None:
+                missed += int((minute_bars.index > pd.Timestamp(last, tz='UTC')).sum())
+        self.store.load(frames)
+        if self.backfilled:
+            self.logger.info(f"Backfilled {missed} minute bars missed while disconnected")
+        self.backfilled = True
+
+    async def backfill(self):
+        """Reload the bar frames after every (re)connect"""
+        await asyncio.get_running_loop().run_in_executor(self.executor, self._backfill)
+
+    def _sync_book(self):
+        """Seed the order book, or reconcile it once it has been seeded"""
+        if self.book_synced is None:
+            self.book.seed(self.api)
+        else:
+            drift = self.book.reconcile(self.api)
+            if drift:
+                self.logger.info(f"Reconciled order book ({len(drift)} differences)")
+        self.book_synced = time.monotonic()
+
+    async def sync_book(self):
+        """Resynchronise the order book after every trade stream (re)connect"""
+        await asyncio.get_running_loop().run_in_executor(self.executor, self._sync_book)
+
+    async def on_trade_update(self, event):
+        """Handle an order event from the trade updates stream"""
+        self.book.apply_trade_update(event)
+        if event['event'] in ('fill', 'partial_fill'):
+            order = event['order']
+            self.logger.info(f"Trade update: {event['event']} {order['side']} {event.get('qty')} "
+                             f"{order['symbol']} @ {event.get('price')}")
+
+    def _append_bar(self, message):
+        """Add a stream bar to its symbol's minute ring; revisions replace the stored bar"""
+        timestamp = pd.Timestamp(message['t'])
+        if timestamp.tz is None:
+            timestamp = timestamp.tz_localize('UTC')
+        return self.store.append_minute(message['S'], timestamp.value, {
+            'open': message['o'],
+            'high': message['h'],
+            'low': message['l'],
+            'close': message['c'],
+            'volume': message['v'],
+            'trade_count': message.get('n', 0),
+            'vwap': message.get('vw', message['c'])
+        })
+
+    def _evaluate(self, symbol):
+        """Run one trading cycle for a symbol on the current frames"""
+        try:
+            if time.monotonic() - self.account_refreshed > ACCOUNT_REFRESH_SECONDS:
+                self.account = self.api.get_account()
+                self.account_refreshed = time.monotonic()
+            if self.book_synced is None or time.monotonic() - self.book_synced > RECONCILE_SECONDS:
+                self._sync_book()
+            data = self.store.market_data(symbol)
+            snapshot = build_snapshot(symbol, data, self.account, self.book.positions(),
+                                      self.book.open_orders(symbol))
+            with span('trading_cycle', symbol):
+                entry = self.cycle(self.api, snapshot, orders=self.orders, defer_entries=True)
+            if entry is not None:
+                # Sized against the whole book, not just this symbol
+                closes = {held: self.store.closes(held) for held in [symbol, *snapshot.positions]}
+                place_entries([entry], self.risk.size([entry], snapshot.equity, snapshot.positions, closes))
+        except Exception as e:
+            self.logger.error(f"Error in trading cycle for {symbol}: {str(e)}")
+        if self.timings_path and time.monotonic() - self.timings_exported > TIMINGS_EXPORT_SECONDS:
+            self._export_timings()
+
+    def _export_timings(self):
+        try:
+            TIMINGS.export(self.timings_path)
+        except OSError as e:
+            self.logger.error(f"Error exporting timings: {str(e)}")
+        self.timings_exported = time.monotonic()
+
+    async def on_bar(self, message):
+        """Queue a bar-close event from the stream for `process_bars`"""
+        if message.get('S') in self.symbols:
+            self.bar_queue.put_nowait(message)
+
+    def _process_bars(self, messages):
+        """Store a batch of stream bars, then run one cycle per symbol with a new bar"""
+        updated = {}
+        for message in messages:
+            try:
+                if self._append_bar(message):
+                    updated[message['S']] = True
+            except (KeyError, TypeError, ValueError) as e:
+                self.logger.error(f"Dropping malformed bar for {message.get('S')}: {str(e)}")
+        if not updated or not is_market_open():
+            return
+        for symbol in updated:
+            self._evaluate(symbol)
+
+    async def process_bars(self):
+        """Take every bar queued since the last batch and process it off the event loop"""
+        loop = asyncio.get_running_loop()
+        while True:
+            messages = [await self.bar_queue.get()]
+            while not self.bar_queue.empty():
+                messages.append(self.bar_queue.get_nowait())
+            if len(messages) > len(self.symbols):
+                self.logger.warning(f"Trading cycles are {len(messages)} bars behind the stream")
+            await loop.run_in_executor(self.executor, self._process_bars, messages)
+
+    async def run(self):
+        consumer = asyncio.create_task(self.process_bars())
+        try:
+            if self.trade_stream is None:
+                await self.stream.run()
+            else:
+                await asyncio.gather(self.stream.run(), self.trade_stream.run())
+        finally:
+            consumer.cancel()
+            self.executor.shutdown(wait=True)
+            self.orders.close()
+            if self.timings_path:
+                self._export_timings()
+
+    async def stop(self):
+        await self.stream.stop()
+        if self.trade_stream is not None:
+            await self.trade_stream.stop()
+
+def run_daemon(api, account, symbols, timeframes, cycle, stream_url, key, secret, cache=None,
+               trade_stream_url=None, timings_path=None, bar_dtype=np.float64):
+    """Run the trading daemon until interrupted"""
+    daemon = TradingDaemon(api, account, symbols, timeframes, cycle, stream_url, key, secret, cache,
+                           trade_stream_url=trade_stream_url, timings_path=timings_path,
+                           bar_dtype=bar_dtype)
+    logging.info(f"Starting daemon mode on {stream_url}")
+    try:
+        asyncio.run(daemon.run())
+    except KeyboardInterrupt:
+        logging.info("Daemon stopped")
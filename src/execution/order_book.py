@@ -0,0 +1,167 @@
+import logging
+import threading
+from types import MappingProxyType
+from alpaca_trade_api.entity import Order, Position
+
+# Open orders come back in a single page of at most this many
+MAX_OPEN_ORDERS = 500
+
+# Order statuses after which an order can no longer fill
+TERMINAL_STATUSES = frozenset({'filled', 'canceled', 'expired', 'rejected', 'replaced', 'done_for_day'})
+
+def _qty(value):
+    return float(value or 0)
+
+def _format_qty(qty):
+    return str(int(qty)) if float(qty).is_integer() else str(qty)
+
+class OrderBook:
+    """Local copy of the account's open orders and positions
+
+    Seeded with one `list_positions` and one `list_orders` call, then kept
+    current by `apply_trade_update` (fed by the `trade_updates` stream) and
+    `apply_order` (fed by order acknowledgements), so strategies can read
+    positions and open orders without a REST call. `reconcile` reloads both
+    from the broker, logging any drift.
+
+    Positions are Alpaca `Position` entities. Between reconciliations only
+    their `qty`, `side` and `avg_entry_price` track fills; broker-computed
+    fields such as `market_value` are as of the last reload. Safe to use
+    from several threads.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._positions = {}
+        self._orders = {}
+        # Orders the stream has seen finish, so late acknowledgements aren't re-added
+        self._closed = set()
+        # Filled quantity already applied per order, for fills first seen in an acknowledgement
+        self._applied = {}
+        self.updates = 0
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+    @classmethod
+    def from_api(cls, api):
+        book = cls()
+        book.seed(api)
+        return book
+
+    @staticmethod
+    def _fetch(api):
+        positions = {position.symbol: position for position in api.list_positions()}
+        orders = {order.id: order for order in api.list_orders(status='open', limit=MAX_OPEN_ORDERS)}
+        return positions, orders
+
+    def seed(self, api):
+        """Load all positions and open orders (two requests)"""
+        positions, orders = self._fetch(api)
+        with self._lock:
+            self._positions = positions
+            self._orders = orders
+            self._closed.clear()
+            self._applied.clear()
+
+    def reconcile(self, api):
+        """Reload from the broker; returns a description of each difference found"""
+        positions, orders = self._fetch(api)
+        with self._lock:
+            drift = []
+            for symbol in sorted(set(positions) | set(self._positions)):
+                local = _qty(getattr(self._positions.get(symbol), 'qty', 0))
+                remote = _qty(getattr(positions.get(symbol), 'qty', 0))
+                if local != remote:
+                    drift.append(f"position {symbol}: local {local:g}, broker {remote:g}")
+            for order_id in sorted(set(orders) ^ set(self._orders)):
+                order = orders.get(order_id) or self._orders[order_id]
+                state = 'missing locally' if order_id in orders else 'no longer open'
+                drift.append(f"order {order_id} ({order.symbol}) {state}")
+            self._positions = positions
+            self._orders = orders
+            self._closed.clear()
+            self._applied.clear()
+        for difference in drift:
+            self.logger.warning(f"Order book drift: {difference}")
+        return drift
+
+    def position(self, symbol):
+        """Open position in `symbol`, or None"""
+        with self._lock:
+            return self._positions.get(symbol)
+
+    def positions(self):
+        """Immutable copy of all positions, keyed by symbol"""
+        with self._lock:
+            return MappingProxyType(dict(self._positions))
+
+    def open_orders(self, symbol=None):
+        """Open orders, optionally only those for `symbol`"""
+        with self._lock:
+            return tuple(order for order in self._orders.values() if symbol is None or order.symbol == symbol)
+
+    def apply_order(self, order):
+        """Track an order we just submitted, unless the stream already reported it
+
+        Paper market orders often come back already (partly) filled; their
+        fills update the position right away, so the next cycle sees it
+        even before a trade update arrives, or without a stream at all.
+        """
+        with self._lock:
+            if order.id in self._closed:
+                return
+            filled = _qty(getattr(order, 'filled_qty', 0))
+            if filled > self._applied.get(order.id, 0):
+                self._fill(order.symbol, {
+                    'qty': filled - self._applied.get(order.id, 0),
+                    'price': getattr(order, 'filled_avg_price', None),
+                    'order': {'side': order.side}
+                })
+                self._applied[order.id] = filled
+            if getattr(order, 'status', None) in TERMINAL_STATUSES:
+                self._orders.pop(order.id, None)
+            else:
+                self._orders.setdefault(order.id, order)
+
+    def _fill(self, symbol, event):
+        """Update a position for a (partial) fill"""
+        position = self._positions.get(symbol)
+        before = _qty(getattr(position, 'qty', 0))
+        price = _qty(event.get('price'))
+        if event.get('position_qty') is not None:
+            after = _qty(event['position_qty'])
+        else:
+            fill = _qty(event.get('qty'))
+            after = before + (fill if event['order']['side'] == 'buy' else -fill)
+
+        if after == 0:
+            self._positions.pop(symbol, None)
+            return
+        if position is None or before * after < 0:
+            # New position, or flipped through flat
+            average = price
+        elif abs(after) > abs(before):
+            average = (before * _qty(position.avg_entry_price) + (after - before) * price) / after
+        else:
+            average = _qty(position.avg_entry_price)
+        raw = dict(getattr(position, '_raw', None) or vars(position)) if position is not None else {'symbol': symbol}
+        raw.update(qty=_format_qty(after), side='long' if after > 0 else 'short', avg_entry_price=str(average))
+        self._positions[symbol] = Position(raw)
+
+    def apply_trade_update(self, event):
+        """Apply one `trade_updates` event payload"""
+        order = Order(event['order'])
+        with self._lock:
+            self.updates += 1
+            if event['event'] in ('fill', 'partial_fill'):
+                if order.id in self._applied and event.get('position_qty') is None:
+                    # Only the part not already applied from the acknowledgement
+                    filled = _qty(event['order'].get('filled_qty'))
+                    event = {**event, 'qty': max(filled - self._applied[order.id], 0)}
+                self._fill(order.symbol, event)
+                self._applied[order.id] = _qty(event['order'].get('filled_qty'))
+            if order.status in TERMINAL_STATUSES:
+                self._orders.pop(order.id, None)
+                self._applied.pop(order.id, None)
+                self._closed.add(order.id)
+            else:
+                self._orders[order.id] = order
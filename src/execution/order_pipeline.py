@@ -0,0 +1,134 @@
+import time
+import logging
+import threading
+import numpy as np
+from dataclasses import dataclass, field
+from typing import Any, Optional
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from utils.timing import TIMINGS
+
+# Upper bound on concurrent submit_order requests
+MAX_ORDER_WORKERS = 8
+
+@dataclass
+class OrderTicket:
+    """One order request and what came back for it
+
+    `latency` is the acknowledgement latency in seconds: from handing the
+    request to the client until the broker accepted or rejected it.
+    `request` holds the keyword arguments of `call`.
+    """
+    request: dict
+    # Client method the request is sent with
+    call: str = 'submit_order'
+    order: Any = None
+    error: Optional[Exception] = None
+    latency: Optional[float] = None
+    queued_at: float = field(default_factory=time.monotonic)
+
+    @property
+    def symbol(self):
+        return self.request.get('symbol')
+
+    @property
+    def ok(self):
+        return self.order is not None
+
+class OrderPipeline:
+    """Asynchronous order submission queue
+
+    `submit` returns immediately with a future for the request's
+    `OrderTicket`; up to `max_workers` orders (typically for different
+    symbols) are in flight at once. Every ticket records its
+    acknowledgement latency, summarised by `latency_stats`. Accepted orders
+    are added to `book` (an `OrderBook`) when one is given.
+    """
+
+    def __init__(self, api, max_workers=MAX_ORDER_WORKERS, book=None):
+        self.api = api
+        self.book = book
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='orders')
+        self.tickets = []
+        self.pending = set()
+        self.lock = threading.Lock()
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+    def _send(self, ticket):
+        started = time.monotonic()
+        try:
+            ticket.order = getattr(self.api, ticket.call)(**ticket.request)
+        except Exception as e:
+            ticket.error = e
+        ticket.latency = time.monotonic() - started
+        TIMINGS.record(ticket.call, ticket.latency, ticket.symbol)
+
+        request = ticket.request
+        if ticket.call == 'close_position':
+            description = f"close {request['symbol']}"
+        else:
+            description = f"{request['side']} {request['qty']} {request['symbol']}"
+        if ticket.ok:
+            if self.book is not None:
+                self.book.apply_order(ticket.order)
+            self.logger.info(f"Order acknowledged: {description} "
+                             f"({request.get('order_class', 'simple')}) in {ticket.latency * 1000:.1f} ms")
+        else:
+            self.logger.error(f"Order rejected: {description}: {ticket.error}")
+        return ticket
+
+    def submit(self, request):
+        """Queue a `submit_order` request; returns a future for its ticket"""
+        return self._queue(OrderTicket(request))
+
+    def close_position(self, symbol):
+        """Queue a `close_position` request; returns a future for its ticket
+
+        The broker liquidates the position at market and deals with its open
+        bracket legs itself, so no cancels have to be sent (and confirmed) first.
+        """
+        return self._queue(OrderTicket({'symbol': symbol}, call='close_position'))
+
+    def _queue(self, ticket):
+        future = self.executor.submit(self._send, ticket)
+        with self.lock:
+            self.tickets.append(ticket)
+            self.pending.add(future)
+        future.add_done_callback(self._done)
+        return future
+
+    def _done(self, future):
+        with self.lock:
+            self.pending.discard(future)
+
+    def wait(self, timeout=None):
+        """Block until every queued order has been acknowledged or rejected"""
+        with self.lock:
+            pending = set(self.pending)
+        wait(pending, timeout=timeout)
+
+    def latency_stats(self):
+        """Acknowledgement latency percentiles (ms) over completed orders"""
+        with self.lock:
+            latencies = [t.latency for t in self.tickets if t.latency is not None]
+            failed = sum(1 for t in self.tickets if t.latency is not None and not t.ok)
+        if not latencies:
+            return {'orders': 0, 'failed': 0}
+        latencies = np.array(latencies) * 1000
+        return {
+            'orders': len(latencies),
+            'failed': failed,
+            'p50_ms': float(np.percentile(latencies, 50)),
+            'p95_ms': float(np.percentile(latencies, 95)),
+            'max_ms': float(latencies.max())
+        }
+
+    def close(self):
+        """Wait for outstanding orders and stop the workers"""
+        self.executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,190 @@
+import logging
+import numpy as np
+from dataclasses import dataclass
+from typing import Any, Optional
+
+# Daily returns in the rolling covariance window
+COVARIANCE_LOOKBACK = 60
+TRADING_DAYS_PER_YEAR = 252
+
+# Portfolio limits, as fractions of equity (volatility is annualised)
+MAX_GROSS_EXPOSURE = 1.0
+MAX_NET_EXPOSURE = 0.5
+MAX_NAME_WEIGHT = 0.1
+MAX_PORTFOLIO_VOLATILITY = 0.25
+
+@dataclass(frozen=True)
+class EntryCandidate:
+    """A new position a strategy wants to open, before it is sized
+
+    `kelly` is the strategy's Kelly fraction and `max_weight` its largest
+    position as a fraction of equity; the target weight before portfolio
+    limits is `kelly * |strength|`, capped at `max_weight`. `price` is what
+    shares are sized at; `entry_price` is the signal's reference price the
+    stop and target were set from.
+    """
+    symbol: str
+    side: str
+    strength: float
+    price: float
+    kelly: float
+    max_weight: float
+    entry_price: Optional[float] = None
+    stop_loss: Optional[float] = None
+    take_profit: Optional[float] = None
+    strategy: Any = None
+
+def _position_values(positions):
+    """{symbol: signed market value} of the open positions"""
+    values = {}
+    for symbol, position in positions.items():
+        value = getattr(position, 'market_value', None)
+        if value is None:
+            value = float(position.qty) * float(getattr(position, 'current_price', None) or position.avg_entry_price)
+        values[symbol] = float(value)
+    return values
+
+def returns_matrix(closes, symbols, lookback=COVARIANCE_LOOKBACK):
+    """(lookback, symbols) matrix of the latest close-to-close returns
+
+    Series are right-aligned on their latest bar; symbols with a shorter
+    history (or none, when missing from `closes`) are NaN where unknown.
+    """
+    matrix = np.full((lookback, len(symbols)), np.nan)
+    for column, symbol in enumerate(symbols):
+        close = closes.get(symbol)
+        if close is None:
+            continue
+        close = np.asarray(close, dtype=np.float64)[-(lookback + 1):]
+        if len(close) > 1:
+            returns = close[1:] / close[:-1] - 1
+            matrix[lookback - len(returns):, column] = returns
+    return matrix
+
+def covariance(returns):
+    """Sample covariance of the columns of a returns matrix, treating unknown returns as the mean"""
+    known = ~np.isnan(returns)
+    counts = known.sum(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means = np.where(counts > 0, np.nansum(returns, axis=0) / counts, 0.0)
+    centred = np.where(known, returns - means, 0.0)
+    return centred.T @ centred / max(len(returns) - 1, 1)
+
+class PortfolioRiskEngine:
+    """Sizes every entry candidate of a cycle together
+
+    Starting from each strategy's Kelly weight, capped per name, all new
+    weights are scaled by one common factor, the largest that keeps the
+    portfolio (open positions plus the new entries) within the gross and
+    net exposure limits and under `max_volatility`, computed from a rolling
+    covariance of daily returns. Sizing is a handful of array operations
+    whatever the number of candidates, and needs no broker calls: equity
+    comes from the cached account and prices from the snapshots.
+    """
+
+    def __init__(self, max_gross=MAX_GROSS_EXPOSURE, max_net=MAX_NET_EXPOSURE,
+                 max_name=MAX_NAME_WEIGHT, max_volatility=MAX_PORTFOLIO_VOLATILITY,
+                 lookback=COVARIANCE_LOOKBACK):
+        self.max_gross = max_gross
+        self.max_net = max_net
+        self.max_name = max_name
+        self.max_volatility = max_volatility
+        self.lookback = lookback
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+    def target_weights(self, candidates, equity, positions=None, closes=None):
+        """Signed target weight (fraction of equity) of each candidate's new position"""
+        n = len(candidates)
+        if not n or equity <= 0:
+            return np.zeros(n)
+        held = _position_values(positions or {})
+        symbols = [candidate.symbol for candidate in candidates]
+        sign = np.array([1.0 if candidate.side in ('long', 'buy') else -1.0 for candidate in candidates])
+        strength = np.abs([candidate.strength for candidate in candidates])
+        kelly = np.array([candidate.kelly for candidate in candidates])
+        max_weight = np.array([candidate.max_weight for candidate in candidates])
+
+        # Strategy sizing, then the per-name cap on the position it would leave
+        weights = sign * np.minimum(np.maximum(kelly * strength, 0), np.minimum(max_weight, self.max_name))
+        held_weights = np.array([held.get(symbol, 0.0) for symbol in symbols]) / equity
+        weights = np.clip(weights, -self.max_name - held_weights, self.max_name - held_weights)
+        weights[weights * sign < 0] = 0.0
+
+        scale = max(min(1.0, self._exposure_scale(weights, held, equity),
+                        self._volatility_scale(weights, symbols, held, equity, closes or {})), 0.0)
+        if scale < 1:
+            self.logger.info("Scaled %d entries to %.0f%% to stay within the portfolio limits", n, scale * 100)
+        return weights * scale
+
+    def _exposure_scale(self, weights, held, equity):
+        """Largest factor on `weights` within the gross and net limits"""
+        held_weights = np.array(list(held.values())) / equity
+        scale = 1.0
+        gross_new = np.abs(weights).sum()
+        if gross_new > 0:
+            scale = min(scale, (self.max_gross - np.abs(held_weights).sum()) / gross_new)
+        net_held, net_new = held_weights.sum(), weights.sum()
+        if net_new != 0 and abs(net_held + net_new) > self.max_net:
+            scale = min(scale, (np.sign(net_new) * self.max_net - net_held) / net_new)
+        return scale
+
+    def _volatility_scale(self, weights, symbols, held, equity, closes):
+        """Largest factor on `weights` that keeps the portfolio under `max_volatility`
+
+        Solves (h + s w)' C (h + s w) = limit^2 for s, with h the open
+        positions' weights and C the annualised covariance.
+        """
+        if self.max_volatility is None or not closes:
+            return 1.0
+        universe = list(dict.fromkeys(symbols + list(held)))
+        columns = {symbol: i for i, symbol in enumerate(universe)}
+        new = np.zeros(len(universe))
+        np.add.at(new, [columns[symbol] for symbol in symbols], weights)
+        current = np.array([held.get(symbol, 0.0) for symbol in universe]) / equity
+
+        cov = covariance(returns_matrix(closes, universe, self.lookback)) * TRADING_DAYS_PER_YEAR
+        a = new @ cov @ new
+        b = current @ cov @ new
+        c = current @ cov @ current - self.max_volatility ** 2
+        if a <= 0:
+            return 1.0
+        discriminant = b * b - a * c
+        if discriminant < 0:
+            return 0.0
+        return (-b + np.sqrt(discriminant)) / a
+
+    def size(self, candidates, equity, positions=None, closes=None):
+        """Whole-share quantity of each candidate (0 where the limits leave no room)
+
+        `positions` maps symbols to open positions and `closes` symbols to
+        daily closes, which the covariance is estimated from.
+        """
+        weights = self.target_weights(candidates, equity, positions, closes)
+        prices = np.array([candidate.price for candidate in candidates], dtype=np.float64)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            shares = np.floor(np.abs(weights) * equity / prices)
+        return np.nan_to_num(shares).astype(np.int64)
+
+def place_entries(candidates, quantities):
+    """Place each sized candidate's entry through its strategy; returns the orders (or futures)"""
+    placed = []
+    for candidate, qty in zip(candidates, quantities):
+        qty = int(qty)
+        if qty <= 0:
+            logging.info("Entry %s %s skipped: no room within the portfolio limits", candidate.side, candidate.symbol)
+            continue
+        order = candidate.strategy.place_order(
+            side=candidate.side,
+            qty=qty,
+            stop_loss=candidate.stop_loss,
+            take_profit=candidate.take_profit
+        )
+        if order:
+            placed.append(order)
+            logging.info("Order %s: %s %d %s, entry %.2f, stop %.2f, target %.2f",
+                         'queued' if candidate.strategy.orders is not None else 'placed', candidate.side, qty,
+                         candidate.symbol, candidate.entry_price, candidate.stop_loss, candidate.take_profit,
+                         extra={'fields': {'symbol': candidate.symbol, 'side': candidate.side, 'qty': qty,
+                                           'entry': candidate.entry_price, 'stop': candidate.stop_loss,
+                                           'target': candidate.take_profit}})
+    return placed
@@ -0,0 +1,352 @@
+"""
+Multi-process trading cycle for large universes.
+
+The coordinator process owns the broker: it fetches the bars, keeps the
+`OrderBook`, sizes entries and sends every order. The symbol universe is
+split into contiguous shards that a pool of worker processes evaluates in
+parallel: each worker builds its shard's timeframes, computes indicators
+and regimes and runs the strategies, outside the coordinator's GIL.
+
+Bars reach the workers through shared memory. Every fetched kind of frame
+('minute', '1d', ...) is written into one block of (symbols, bars) arrays,
+which workers map once and read in place, so a cycle pickles only each
+shard's account, positions and open orders. Workers never call the broker:
+their strategies submit into a local outbox, and the recorded cancels,
+orders and entry candidates are merged back in universe order, so a cycle
+sends the same orders in the same order however the shards were scheduled.
+"""
+import os
+import logging
+import multiprocessing
+import numpy as np
+import pandas as pd
+from dataclasses import replace
+from multiprocessing import shared_memory
+from concurrent.futures import Future, ProcessPoolExecutor
+
+from alpaca_trade_api.entity import Account, Order, Position
+
+from analysis.bar_store import BAR_COLUMNS
+from analysis.market_analysis import (
+    BARS_PER_TIMEFRAME,
+    add_indicators_bulk,
+    assemble_market_data,
+    detect_market_regimes,
+    fetch_market_frames
+)
+from strategies.snapshot import build_snapshot
+from strategies.base_strategy import entry_request
+from execution.order_pipeline import OrderPipeline
+from execution.order_book import OrderBook
+from execution.risk_engine import PortfolioRiskEngine, place_entries
+from utils.log_config import setup_worker_logging, forward_worker_logs
+from utils.timing import span
+
+# Shards per worker process, so a slow shard doesn't hold up the cycle
+SHARDS_PER_WORKER = 2
+
+# Spare bars allocated per row, so slightly longer frames reuse the blocks
+CAPACITY_HEADROOM = 1.25
+
+# Per-worker state, set up once by the pool initializer
+_worker = {}
+
+def _raw(entity):
+    """The JSON fields of an Alpaca entity (or any plain object) for sending to a worker"""
+    raw = getattr(entity, '_raw', None)
+    return dict(raw) if raw is not None else dict(vars(entity))
+
+class SharedFrames:
+    """Bar frames of one kind for a whole universe, in a shared memory block
+
+    Row i holds symbol i's bars from the start of the row; `lengths[i]` of
+    them are valid. Timestamps are UTC nanoseconds. The coordinator
+    rewrites the block in place each cycle while its frames fit; workers
+    attach by name with `attach`.
+    """
+
+    def __init__(self, n_symbols, capacity, columns=BAR_COLUMNS):
+        self.shape = (n_symbols, capacity)
+        self.columns = tuple(columns)
+        size = n_symbols * capacity * 8 * (len(self.columns) + 1) + n_symbols * 8
+        self.shm = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        self.arrays = self._views(self.shm, self.shape, self.columns)
+
+    @staticmethod
+    def _views(shm, shape, columns):
+        """{'timestamp', columns..., 'length'} arrays over a block"""
+        n_symbols, capacity = shape
+        cells = n_symbols * capacity
+        arrays = {'timestamp': np.ndarray(shape, dtype=np.int64, buffer=shm.buf)}
+        for i, name in enumerate(columns, start=1):
+            arrays[name] = np.ndarray(shape, dtype=np.float64, buffer=shm.buf, offset=8 * cells * i)
+        arrays['length'] = np.ndarray(n_symbols, dtype=np.int64, buffer=shm.buf,
+                                      offset=8 * cells * (len(columns) + 1))
+        return arrays
+
+    @property
+    def spec(self):
+        """What a worker needs to attach: (name, shape, columns)"""
+        return self.shm.name, self.shape, self.columns
+
+    def fits(self, n_symbols, length):
+        return n_symbols == self.shape[0] and length <= self.shape[1]
+
+    def write(self, row, frame):
+        """Store one symbol's frame (or nothing, for None) in its row"""
+        n = 0 if frame is None else min(len(frame), self.shape[1])
+        self.arrays['length'][row] = n
+        if not n:
+            return
+        frame = frame.iloc[-n:]
+        index = frame.index if frame.index.tz is not None else frame.index.tz_localize('UTC')
+        self.arrays['timestamp'][row, :n] = index.tz_convert('UTC').asi8
+        for name in self.columns:
+            self.arrays[name][row, :n] = frame[name].to_numpy(dtype=np.float64) if name in frame.columns else np.nan
+
+    @staticmethod
+    def attach(spec):
+        """Map a block created by the coordinator; returns (shm, arrays)"""
+        name, shape, columns = spec
+        shm = shared_memory.SharedMemory(name=name)
+        return shm, SharedFrames._views(shm, shape, columns)
+
+    @staticmethod
+    def frame(arrays, row):
+        """A symbol's bars as a DataFrame like the one that was written"""
+        n = int(arrays['length'][row])
+        index = pd.DatetimeIndex(arrays['timestamp'][row, :n].astype('M8[ns]'), name='timestamp').tz_localize('UTC')
+        return pd.DataFrame({name: arrays[name][row, :n] for name in arrays if name not in ('timestamp', 'length')},
+                            index=index)
+
+    def close(self):
+        # The views must go before the mapping can be closed
+        self.arrays = {}
+        self.shm.close()
+        self.shm.unlink()
+
+class _Outbox:
+    """Stands in for the order pipeline and the API inside a worker
+
+    Strategies submit, close and cancel as usual; the calls are recorded in
+    order for the coordinator to carry out. A close returns a future that
+    never completes here: the coordinator logs its outcome.
+    """
+
+    def __init__(self):
+        self.actions = []
+
+    def submit(self, request):
+        self.actions.append(('submit', request))
+        return request
+
+    def close_position(self, symbol):
+        self.actions.append(('close', symbol))
+        return Future()
+
+    def cancel_order(self, order_id):
+        self.actions.append(('cancel', order_id))
+
+class _EntryRouter:
+    """Places a worker's entry from the coordinator, in place of the strategy that proposed it"""
+
+    def __init__(self, symbol, orders):
+        self.symbol = symbol
+        self.orders = orders
+
+    def place_order(self, side, qty, stop_loss=None, take_profit=None):
+        return self.orders.submit(entry_request(self.symbol, side, qty, stop_loss, take_profit))
+
+def _log_close(future):
+    ticket = future.result()
+    if ticket.ok:
+        logging.info(f"Position closed: {ticket.symbol}")
+
+def _init_worker(cycle, records, level):
+    """Pool initializer: log to the coordinator and keep the trading cycle function"""
+    setup_worker_logging(records, level)
+    _worker['cycle'] = cycle
+    _worker['blocks'] = {}
+
+def _arrays(spec):
+    """A shared block's arrays, attached on first use and kept while the coordinator reuses it"""
+    blocks = _worker['blocks']
+    name = spec[0]
+    if name not in blocks:
+        blocks[name] = SharedFrames.attach(spec)
+    return blocks[name][1]
+
+def _release(live):
+    """Unmap blocks the coordinator has replaced"""
+    blocks = _worker['blocks']
+    for name in [name for name in blocks if name not in live]:
+        shm, arrays = blocks.pop(name)
+        del arrays
+        shm.close()
+
+def _evaluate_shard(task):
+    """Run the trading cycle for one shard; returns [(symbol, actions, entry, error)] in shard order"""
+    shard, rows, specs, timeframes, bars, account, positions, open_orders = task
+    _release({spec[0] for spec in specs.values()})
+    arrays = {kind: _arrays(spec) for kind, spec in specs.items()}
+    account = Account(account)
+    positions = {symbol: Position(raw) for symbol, raw in positions.items()}
+    cycle = _worker['cycle']
+
+    data, errors = {}, {}
+    for symbol, row in rows:
+        try:
+            frames = {(symbol, kind): SharedFrames.frame(kind_arrays, row) for kind, kind_arrays in arrays.items()}
+            data[symbol] = assemble_market_data(frames, symbol, timeframes, bars, indicators=False)
+        except Exception as e:
+            errors[symbol] = str(e)
+    for tf in timeframes:
+        with_indicators = add_indicators_bulk({symbol: data[symbol][tf] for symbol in data})
+        for symbol in data:
+            data[symbol][tf] = with_indicators[symbol]
+    regimes = detect_market_regimes({symbol: data[symbol]['1d'] for symbol in data})
+
+    results = []
+    for symbol, _ in rows:
+        if symbol in errors:
+            results.append((symbol, [], None, errors[symbol]))
+            continue
+        outbox = _Outbox()
+        try:
+            orders = [Order(raw) for raw in open_orders.get(symbol, ())]
+            snapshot = build_snapshot(symbol, data[symbol], account, positions, orders)
+            entry = cycle(outbox, snapshot, regimes[symbol], outbox, defer_entries=True)
+            if entry is not None:
+                entry = replace(entry, strategy=None)
+            results.append((symbol, outbox.actions, entry, None))
+        except Exception as e:
+            results.append((symbol, outbox.actions, None, str(e)))
+    return shard, results
+
+class ShardedRunner:
+    """Coordinator of a pool of processes evaluating the universe in shards
+
+    `cycle` is `run_trading_cycle` (passed in, like the daemon's). Use as a
+    context manager, or call `close` to stop the pool and free the shared
+    memory. `workers` defaults to the number of cores.
+    """
+
+    def __init__(self, symbols, timeframes, cycle, workers=None, bars=BARS_PER_TIMEFRAME,
+                 shards_per_worker=SHARDS_PER_WORKER, risk=None):
+        self.symbols = list(symbols)
+        self.timeframes = timeframes
+        self.bars = bars
+        self.workers = max(1, min(workers or os.cpu_count(), len(self.symbols)))
+        n_shards = min(len(self.symbols), self.workers * shards_per_worker)
+        # Contiguous, near-equal slices of the universe, in universe order
+        bounds = np.linspace(0, len(self.symbols), n_shards + 1).astype(int)
+        self.shards = [list(range(start, end)) for start, end in zip(bounds[:-1], bounds[1:]) if end > start]
+        self.risk = risk or PortfolioRiskEngine()
+        self.blocks = {}
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+        context = multiprocessing.get_context('spawn')
+        self._records = context.Queue()
+        self._listener = forward_worker_logs(self._records)
+        self.pool = ProcessPoolExecutor(
+            max_workers=self.workers, mp_context=context, initializer=_init_worker,
+            initargs=(cycle, self._records, logging.getLogger().getEffectiveLevel())
+        )
+        self.logger.info(f"Evaluating {len(self.symbols)} symbols in {len(self.shards)} shards "
+                         f"across {self.workers} worker processes")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.pool.shutdown()
+        self._listener.stop()
+        for block in self.blocks.values():
+            block.close()
+        self.blocks = {}
+
+    def share(self, frames):
+        """Write `fetch_market_frames` output into the shared blocks; returns their specs"""
+        kinds = sorted({kind for _, kind in frames})
+        for kind in kinds:
+            longest = max((len(frames[(symbol, kind)]) for symbol in self.symbols if (symbol, kind) in frames),
+                          default=0)
+            block = self.blocks.get(kind)
+            if block is None or not block.fits(len(self.symbols), longest):
+                if block is not None:
+                    block.close()
+                block = SharedFrames(len(self.symbols), max(int(longest * CAPACITY_HEADROOM), 1))
+                self.blocks[kind] = block
+            for row, symbol in enumerate(self.symbols):
+                block.write(row, frames.get((symbol, kind)))
+        for kind in [kind for kind in self.blocks if kind not in kinds]:
+            self.blocks.pop(kind).close()
+        return {kind: block.spec for kind, block in self.blocks.items()}
+
+    def evaluate(self, specs, account, positions, book):
+        """Run every shard; returns [(symbol, actions, entry, error)] in universe order"""
+        account = _raw(account)
+        tasks = []
+        for shard, rows in enumerate(self.shards):
+            symbols = [self.symbols[row] for row in rows]
+            tasks.append((
+                shard,
+                list(zip(symbols, rows)),
+                specs,
+                list(self.timeframes),
+                self.bars,
+                account,
+                {symbol: _raw(positions[symbol]) for symbol in symbols if symbol in positions},
+                {symbol: [_raw(order) for order in book.open_orders(symbol)] for symbol in symbols}
+            ))
+        # Shards are contiguous slices and come back in task order
+        return [result for _, results in self.pool.map(_evaluate_shard, tasks) for result in results]
+
+    def run_cycle(self, api, account, cache=None):
+        """One trading cycle for the whole universe
+
+        Fetches the bars, evaluates the shards in the pool, then sends the
+        workers' orders and cancels in universe order and sizes and places
+        every new entry as one batch. Returns (order latency stats,
+        number of symbols that failed).
+        """
+        with span('get_market_data'):
+            frames = fetch_market_frames(api, self.symbols, self.timeframes, self.bars, cache=cache)
+        with span('share_bars'):
+            specs = self.share(frames)
+        book = OrderBook.from_api(api)
+        positions = book.positions()
+        with span('evaluate_shards'):
+            results = self.evaluate(specs, account, positions, book)
+
+        failures = 0
+        entries = []
+        with OrderPipeline(api, book=book) as orders:
+            for symbol, actions, entry, error in results:
+                if error is not None:
+                    failures += 1
+                    logging.error(f"Error in trading cycle for {symbol}: {error}")
+                for action, argument in actions:
+                    try:
+                        if action == 'cancel':
+                            api.cancel_order(argument)
+                        elif action == 'close':
+                            orders.close_position(argument).add_done_callback(_log_close)
+                        else:
+                            orders.submit(argument)
+                    except Exception as e:
+                        logging.error(f"Error routing {action} for {symbol}: {str(e)}")
+                if entry is not None:
+                    entries.append(replace(entry, strategy=_EntryRouter(symbol, orders)))
+
+            # Size every new entry together against the portfolio's limits
+            if entries:
+                with span('size_entries'):
+                    closes = {symbol: frames[(symbol, '1d')]['close'] for symbol in self.symbols
+                              if (symbol, '1d') in frames}
+                    quantities = self.risk.size(entries, float(account.equity), positions, closes)
+                place_entries(entries, quantities)
+        return orders.latency_stats(), failures
@@ -1,33 +1,24 @@
 import os
 import sys
+import time
 import logging
-import alpaca_trade_api as tradeapi
-from datetime import datetime
-from dotenv import load_dotenv
-from alpaca_trade_api.rest import TimeFrame
+import argparse
 
-from analysis.market_analysis import (
-    detect_market_regime,
-    analyze_order_flow,
-    analyze_market_microstructure,
-    is_market_open,
-    get_market_data
-)
-from strategies.trend_following import TrendFollowingStrategy
-from strategies.mean_reversion import MeanReversionStrategy
+# Only standard-library-backed modules at import time: pandas, numpy and the
+# Alpaca client are imported where they are needed, so a run outside market
+# hours exits without loading them
+from utils.market_calendar import is_market_open, default_calendar, refresh_calendar, set_default_calendar
+from utils.timing import TIMINGS, DEFAULT_TIMINGS_PATH, span
+from utils.log_config import setup_logging, DEFAULT_LOG_FILE, DEFAULT_JSON_LOG_FILE
 
-# Set up logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler("trading_bot.log"),
-        logging.StreamHandler(sys.stdout)
-    ]
-)
+# Universe traded when nothing else is configured
+DEFAULT_SYMBOLS = "SPY"
 
 def initialize_api():
     """Initialize and validate API connection"""
+    import alpaca_trade_api as tradeapi
+    from dotenv import load_dotenv
+    
     # Load environment variables
     load_dotenv()
     
@@ -59,90 +50,305 @@ def initialize_api():
         logging.error(f"❌ Connection error: {e}")
         sys.exit(1)
 
+def run_trading_cycle(api, snapshot, regime=None, orders=None, defer_entries=False):
+    """Run regime detection, strategy selection and order management once
+    
+    Everything the strategy reads comes from the cycle's `MarketSnapshot`;
+    the only broker calls made here are order submissions, which go through
+    the `orders` pipeline when one is given. With `defer_entries` a new
+    entry is not sized or placed but returned as an `EntryCandidate`, for
+    the caller to size together with other symbols' entries.
+    """
+    from analysis.market_analysis import detect_market_regime
+    from strategies.trend_following import TrendFollowingStrategy
+    from strategies.mean_reversion import MeanReversionStrategy
+    
+    symbol = snapshot.symbol
+    
+    # Detect market regime (unless it was already computed in bulk)
+    if regime is None:
+        with span('detect_market_regime', symbol):
+            regime = detect_market_regime(snapshot.data['1d'])
+    regime_name = 'Trending' if regime['is_trending'] else 'Ranging' if regime['is_ranging'] else 'Volatile'
+    
+    # Select strategy based on market regime
+    if regime['is_trending']:
+        strategy = TrendFollowingStrategy(api, snapshot, orders)
+    else:
+        strategy = MeanReversionStrategy(api, snapshot, orders)
+    logging.info("Market regime (%s): %s, using %s", symbol, regime_name, type(strategy).__name__,
+                 extra={'fields': {'symbol': symbol, 'regime': regime_name, 'adx': regime['adx'],
+                                   'volatility': regime['volatility'], 'strategy': type(strategy).__name__},
+                        'diagnostic': True})
+    
+    # Get current position
+    position = strategy.get_position()
+    pending = None if position else snapshot.pending_entry
+    
+    if pending is not None:
+        # The last entry is still working, or its fill hasn't reached the
+        # order book yet; another signal now would double the position
+        logging.info("Entry in %s still pending (order %s), skipping signals", symbol, pending.id,
+                     extra={'fields': {'symbol': symbol, 'order_id': pending.id}, 'diagnostic': True})
+    elif position:
+        # Manage existing position
+        entry_price = float(position.avg_entry_price)
+        current_price = snapshot.price
+        
+        # Calculate stop loss and take profit
+        stop_loss = strategy.calculate_stop_loss(entry_price, 'long' if float(position.qty) > 0 else 'short')
+        take_profit = strategy.calculate_take_profit(entry_price, 'long' if float(position.qty) > 0 else 'short')
+        
+        # Check if we should exit
+        if (float(position.qty) > 0 and current_price <= stop_loss) or \
+           (float(position.qty) < 0 and current_price >= stop_loss) or \
+           (float(position.qty) > 0 and current_price >= take_profit) or \
+           (float(position.qty) < 0 and current_price <= take_profit):
+            if strategy.close_position(reason='stop loss or take profit') is None:
+                logging.error("Could not close the position in %s on stop loss or take profit", symbol)
+    else:
+        # Generate new signals
+        with span('generate_signals', symbol):
+            signals = strategy.generate_signals()
+        
+        if signals['signal']:
+            # Calculate stop loss and take profit
+            stop_loss = strategy.calculate_stop_loss(signals['price'], signals['signal'])
+            take_profit = strategy.calculate_take_profit(signals['price'], signals['signal'])
+            if defer_entries:
+                return strategy.entry_candidate(signals, stop_loss, take_profit)
+            
+            # Calculate position size
+            qty = strategy.calculate_position_size(signals['strength'])
+            
+            # Place order
+            order = strategy.place_order(
+                side=signals['signal'],
+                qty=qty,
+                stop_loss=stop_loss,
+                take_profit=take_profit
+            )
+            
+            if order:
+                logging.info("Order %s: %s %d %s, entry %.2f, stop %.2f, target %.2f",
+                             'queued' if orders is not None else 'placed', signals['signal'], qty, symbol,
+                             signals['price'], stop_loss, take_profit,
+                             extra={'fields': {'symbol': symbol, 'side': signals['signal'], 'qty': qty,
+                                               'entry': signals['price'], 'stop': stop_loss, 'target': take_profit}})
+    
+    logging.debug("Trading cycle completed successfully (%s)", symbol)
+
+def load_universe(args):
+    """Symbols to trade: --symbols, then --universe-file, then $TRADING_SYMBOLS"""
+    if args.symbols:
+        symbols = args.symbols.split(',')
+    elif args.universe_file:
+        with open(args.universe_file) as f:
+            symbols = [line.split('#')[0] for line in f]
+    else:
+        symbols = os.getenv('TRADING_SYMBOLS', DEFAULT_SYMBOLS).split(',')
+    # Normalise and de-duplicate while keeping the configured order
+    return list(dict.fromkeys(s.strip().upper() for s in symbols if s.strip()))
+
+def parse_args():
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="Alpaca trading bot")
+    parser.add_argument('--daemon', action='store_true',
+                        help="Run continuously off the bar stream instead of one cycle")
+    parser.add_argument('--stream-url', default=None,
+                        help="Market data websocket URL (e.g. a local fake stream server)")
+    parser.add_argument('--trade-stream-url', default=None,
+                        help="Trade updates websocket URL (defaults to the account's; 'none' to poll)")
+    parser.add_argument('--float32-bars', action='store_true',
+                        help="Store the daemon's in-memory bars as float32 to halve their memory")
+    parser.add_argument('--symbols', help="Comma-separated symbols to trade")
+    parser.add_argument('--universe-file', help="File with one symbol per line")
+    parser.add_argument('--record', metavar='PATH',
+                        help="Record all API traffic to this file (.gz to compress)")
+    parser.add_argument('--replay', metavar='PATH',
+                        help="Serve API calls from a recording instead of Alpaca (no network)")
+    parser.add_argument('--replay-speed', type=float, default=1.0,
+                        help="Replay speed-up; 0 replays without any delays")
+    parser.add_argument('--replay-latency', type=float,
+                        help="Fixed per-call latency in seconds instead of the recorded one")
+    parser.add_argument('--replay-pace', action='store_true',
+                        help="Also reproduce the gaps between recorded calls")
+    parser.add_argument('--workers', type=int, nargs='?', const=0, metavar='N',
+                        help="Evaluate the universe in N worker processes (one per core if N is omitted)")
+    parser.add_argument('--cycles', type=int, default=1,
+                        help="Run the trading cycle this many times back to back (load tests)")
+    parser.add_argument('--log-file', default=DEFAULT_LOG_FILE, help="Text log file")
+    parser.add_argument('--log-json', metavar='PATH', nargs='?', const=DEFAULT_JSON_LOG_FILE,
+                        help=f"Also write structured JSON-lines logs (default {DEFAULT_JSON_LOG_FILE})")
+    parser.add_argument('--log-sample', type=int, default=1, metavar='N',
+                        help="Keep only every Nth per-symbol diagnostic record of each kind")
+    parser.add_argument('--log-rate', type=float, metavar='PER_SECOND',
+                        help="At most this many per-symbol diagnostic records of each kind per second")
+    parser.add_argument('--timings', metavar='PATH', nargs='?', const=DEFAULT_TIMINGS_PATH,
+                        help="Time each stage and write p50/p95/p99 per stage and symbol to PATH "
+                             f"(a Prometheus textfile if it ends in .prom, else JSON lines; default {DEFAULT_TIMINGS_PATH})")
+    return parser.parse_args()
+
 def main():
     """Main trading bot function"""
-    # Initialize API
-    api, account = initialize_api()
+    args = parse_args()
+    # Log records are formatted and written on a background thread
+    setup_logging(log_file=args.log_file, json_file=args.log_json,
+                  sample_every=args.log_sample, max_per_second=args.log_rate)
+    TIMINGS.enabled = bool(args.timings)
     
-    # Check if market is open
-    if not is_market_open():
-        logging.info("Market is closed. Exiting.")
+    # Check if market is open before authenticating or loading the heavy
+    # modules (a replayed session was recorded while it was; the daemon
+    # waits for the open itself)
+    if not args.replay and not args.daemon and not is_market_open():
+        next_open = default_calendar().next_open()
+        logging.info(f"Market is closed (next open {next_open:%Y-%m-%d %H:%M %Z}). Exiting." if next_open
+                     else "Market is closed. Exiting.")
         sys.exit(0)
     
+    from alpaca_trade_api.rest import TimeFrame, TimeFrameUnit
+    from analysis.market_analysis import get_market_data_for_symbols, detect_market_regimes
+    from strategies.snapshot import build_snapshot
+    from utils.bar_cache import BarCache, DEFAULT_CACHE_DIR
+    from utils.api_replay import RecordingAPI, ReplayAPI
+    from execution.order_pipeline import OrderPipeline
+    from execution.order_book import OrderBook
+    from execution.risk_engine import PortfolioRiskEngine, place_entries
+    
+    # Initialize API
+    if args.replay:
+        api = ReplayAPI(
+            args.replay,
+            latency=args.replay_latency,
+            speed=args.replay_speed or None,
+            pace=args.replay_pace
+        )
+        account = api.get_account()
+        logging.info(f"Replaying API session recorded at {api.recorded_at}")
+    else:
+        with span('initialize_api'):
+            api, account = initialize_api()
+        # The on-disk calendar answered the check above; fetch the exchange's
+        # own calendar when it has none (or it is running out) and re-check
+        set_default_calendar(refresh_calendar(api))
+        if not args.daemon and not is_market_open():
+            logging.info("Market is closed according to the exchange calendar. Exiting.")
+            sys.exit(0)
+    if args.record:
+        api = RecordingAPI(api, args.record)
+        api.record('get_account', account)
+        logging.info(f"Recording API traffic to {args.record}")
+    
     # Trading parameters
-    symbol = "SPY"
+    symbols = load_universe(args)
+    # Intraday timeframes are resampled locally from one minute-bar request
     timeframes = {
         '1m': TimeFrame.Minute,
-        '5m': TimeFrame.Minute,
-        '15m': TimeFrame.Minute,
+        '5m': TimeFrame(5, TimeFrameUnit.Minute),
+        '15m': TimeFrame(15, TimeFrameUnit.Minute),
         '1h': TimeFrame.Hour,
         '1d': TimeFrame.Day
     }
+    # Recordings must hold complete responses, not deltas on top of a local cache
+    cache = None if args.record or args.replay else BarCache(os.getenv('BAR_CACHE_DIR', DEFAULT_CACHE_DIR))
     
-    try:
-        # Get market data
-        data = get_market_data(api, symbol, timeframes)
-        
-        # Detect market regime
-        regime = detect_market_regime(data['1d'])
-        logging.info(f"Market regime: {'Trending' if regime['is_trending'] else 'Ranging' if regime['is_ranging'] else 'Volatile'}")
-        
-        # Select strategy based on market regime
-        if regime['is_trending']:
-            strategy = TrendFollowingStrategy(api, symbol, account)
-            logging.info("Using Trend Following Strategy")
+    if args.daemon:
+        # Keep one session open and trade on every bar close
+        from daemon import run_daemon
+        from streaming.bar_stream import DEFAULT_DATA_STREAM_URL
+        from streaming.trade_stream import DEFAULT_PAPER_BASE_URL, trading_stream_url
+        stream_url = args.stream_url or os.getenv('APCA_DATA_STREAM_URL', DEFAULT_DATA_STREAM_URL)
+        trade_stream_url = args.trade_stream_url or os.getenv('APCA_TRADE_STREAM_URL') or \
+            trading_stream_url(os.getenv('APCA_BASE_URL') or DEFAULT_PAPER_BASE_URL)
+        # A replayed session has no live account to listen to; poll the book instead
+        if args.replay or trade_stream_url.lower() == 'none':
+            trade_stream_url = None
+        run_daemon(
+            api, account, symbols, timeframes, run_trading_cycle, stream_url,
+            os.getenv('APCA_API_KEY_ID'), os.getenv('APCA_API_SECRET_KEY'), cache,
+            trade_stream_url=trade_stream_url, timings_path=args.timings,
+            bar_dtype='float32' if args.float32_bars else 'float64'
+        )
+        return
+    
+    risk = PortfolioRiskEngine()
+    runner = None
+    if args.workers is not None:
+        # Shards of the universe are evaluated in worker processes; this
+        # process keeps the broker connection and sends every order
+        from execution.sharded_runner import ShardedRunner
+        runner = ShardedRunner(symbols, timeframes, run_trading_cycle, workers=args.workers or None, risk=risk)
+    failed_cycles = 0
+    for cycle in range(args.cycles):
+        started = time.perf_counter()
+        if runner is not None:
+            try:
+                stats, failures = runner.run_cycle(api, account, cache)
+            except Exception as e:
+                logging.error(f"Error in main trading loop: {str(e)}")
+                runner.close()
+                sys.exit(1)
         else:
-            strategy = MeanReversionStrategy(api, symbol, account)
-            logging.info("Using Mean Reversion Strategy")
-        
-        # Get current position
-        position = strategy.get_position()
+            try:
+                # Get market data for the whole universe in batched requests,
+                # downloading only bars newer than the on-disk cache
+                with span('get_market_data'):
+                    data = get_market_data_for_symbols(api, symbols, timeframes, cache=cache)
+                with span('detect_market_regimes'):
+                    regimes = detect_market_regimes({symbol: data[symbol]['1d'] for symbol in symbols})
+                # Positions and open orders for the whole account in two requests
+                book = OrderBook.from_api(api)
+                positions = book.positions()
+            except Exception as e:
+                logging.error(f"Error in main trading loop: {str(e)}")
+                sys.exit(1)
         
-        if position:
-            # Manage existing position
-            entry_price = float(position.avg_entry_price)
-            current_price = float(api.get_latest_trade(symbol).price)
+            failures = 0
+            entries = []
+            # Orders for all symbols are submitted concurrently while the loop moves on
+            with OrderPipeline(api, book=book) as orders:
+                for symbol in symbols:
+                    try:
+                        snapshot = build_snapshot(symbol, data[symbol], account, positions, book.open_orders(symbol))
+                        with span('trading_cycle', symbol):
+                            entry = run_trading_cycle(api, snapshot, regimes[symbol], orders, defer_entries=True)
+                        if entry is not None:
+                            entries.append(entry)
+                    except Exception as e:
+                        failures += 1
+                        logging.error(f"Error in trading cycle for {symbol}: {str(e)}")
             
-            # Calculate stop loss and take profit
-            stop_loss = strategy.calculate_stop_loss(entry_price, 'long' if float(position.qty) > 0 else 'short')
-            take_profit = strategy.calculate_take_profit(entry_price, 'long' if float(position.qty) > 0 else 'short')
-            
-            # Check if we should exit
-            if (float(position.qty) > 0 and current_price <= stop_loss) or \
-               (float(position.qty) < 0 and current_price >= stop_loss) or \
-               (float(position.qty) > 0 and current_price >= take_profit) or \
-               (float(position.qty) < 0 and current_price <= take_profit):
-                strategy.close_position()
-                logging.info("Position closed based on stop loss or take profit")
-        else:
-            # Generate new signals
-            signals = strategy.generate_signals(data)
-            
-            if signals['signal']:
-                # Calculate position size
-                qty = strategy.calculate_position_size(signals['strength'])
-                
-                # Calculate stop loss and take profit
-                stop_loss = strategy.calculate_stop_loss(signals['price'], signals['signal'])
-                take_profit = strategy.calculate_take_profit(signals['price'], signals['signal'])
-                
-                # Place order
-                order = strategy.place_order(
-                    side=signals['signal'],
-                    qty=qty,
-                    stop_loss=stop_loss,
-                    take_profit=take_profit
-                )
-                
-                if order:
-                    logging.info(f"Order placed: {signals['signal']} {qty} {symbol}")
-                    logging.info(f"Entry: {signals['price']:.2f}, Stop: {stop_loss:.2f}, Target: {take_profit:.2f}")
+                # Size every new entry together against the portfolio's limits
+                if entries:
+                    with span('size_entries'):
+                        closes = {symbol: data[symbol]['1d']['close'] for symbol in symbols if '1d' in data[symbol]}
+                        quantities = risk.size(entries, float(account.equity), positions, closes)
+                    place_entries(entries, quantities)
+            stats = orders.latency_stats()
         
-        logging.info("Trading cycle completed successfully")
+        if stats['orders']:
+            logging.info(f"{stats['orders']} orders ({stats['failed']} rejected), ack latency "
+                         f"p50 {stats['p50_ms']:.1f} ms, p95 {stats['p95_ms']:.1f} ms, max {stats['max_ms']:.1f} ms")
         
-    except Exception as e:
-        logging.error(f"Error in main trading loop: {str(e)}")
+        elapsed = time.perf_counter() - started
+        if args.cycles > 1 or args.replay:
+            logging.info(f"Cycle {cycle + 1} took {elapsed:.3f}s ({len(symbols) / elapsed:.1f} symbols/s)")
+        
+        if failures == len(symbols):
+            failed_cycles += 1
+    
+    if runner is not None:
+        runner.close()
+    
+    if args.timings:
+        for row in TIMINGS.summary(by_symbol=False):
+            logging.info(f"Timing {row['stage']}: {row['count']} calls, p50 {row['p50_ms']:.2f} ms, "
+                         f"p95 {row['p95_ms']:.2f} ms, p99 {row['p99_ms']:.2f} ms")
+        TIMINGS.export(args.timings)
+        logging.info(f"Wrote stage timings to {args.timings}")
+    
+    if failed_cycles:
         sys.exit(1)
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
\ No newline at end of file
@@ -0,0 +1,48 @@
+import sys
+import json
+import time
+import logging
+import argparse
+
+from backtest import load_bars
+from strategies.registry import strategy_names
+from backtesting.optimizer import optimize, DEFAULT_GRIDS
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    handlers=[logging.StreamHandler(sys.stdout)]
+)
+
+def main():
+    """Run a walk-forward parameter sweep over bars from a CSV file"""
+    parser = argparse.ArgumentParser(description="Walk-forward parameter optimization")
+    parser.add_argument('csv', help="CSV with timestamp, open, high, low, close, volume columns")
+    parser.add_argument('--strategy', choices=strategy_names(), default='mean_reversion')
+    parser.add_argument('--grid', help="JSON file mapping parameter names to lists of values")
+    parser.add_argument('--splits', type=int, default=5, help="Walk-forward splits")
+    parser.add_argument('--workers', type=int, help="Worker processes (default: all cores)")
+    parser.add_argument('--metric', default='total_return', help="Metric used to pick the best combo")
+    parser.add_argument('--output', default='optimization_results.csv.gz',
+                        help="Result table (compression inferred from the extension)")
+    args = parser.parse_args()
+
+    grid = DEFAULT_GRIDS[args.strategy]
+    if args.grid:
+        with open(args.grid) as f:
+            grid = json.load(f)
+
+    bars = load_bars(args.csv)
+    started = time.perf_counter()
+    results, walk_forward = optimize(
+        bars, args.strategy, grid, n_splits=args.splits,
+        max_workers=args.workers, metric=args.metric
+    )
+    logging.info(f"Sweep finished in {time.perf_counter() - started:.1f}s")
+
+    results.to_csv(args.output, index=False)
+    logging.info(f"Wrote {len(results)} rows to {args.output}")
+    logging.info(f"Walk-forward results:\n{walk_forward.to_string(index=False)}")
+
+if __name__ == "__main__":
+    main()
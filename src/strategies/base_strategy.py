@@ -1,23 +1,200 @@
 from abc import ABC, abstractmethod
+from typing import NamedTuple
+import uuid
 import logging
+import numpy as np
+
+from analysis.market_analysis import bar_close_times
+from utils.timing import span
+from execution.risk_engine import EntryCandidate
+
+# Signal directions to order sides
+ORDER_SIDES = {
+    'long': 'buy',
+    'short': 'sell',
+    'buy': 'buy',
+    'sell': 'sell'
+}
+
+def order_price(price):
+    """Round a price to a valid tick: pennies at $1 and above, else 1/100 of a cent"""
+    price = float(price)
+    return round(price, 2 if price >= 1 else 4)
+
+def client_order_id(symbol):
+    """Unique id that lets a retried submission be recognised as the same order"""
+    return f"{symbol}-{uuid.uuid4().hex[:20]}"
+
+def entry_request(symbol, side, qty, stop_loss=None, take_profit=None):
+    """`submit_order` arguments for a market entry with its exits attached
+    
+    With both exits this is one bracket order, whose stop and target
+    legs cancel each other; with just one it is a one-triggers-other order.
+    """
+    request = {
+        'symbol': symbol,
+        'qty': qty,
+        'side': ORDER_SIDES[side],
+        'type': 'market',
+        'time_in_force': 'gtc',
+        'client_order_id': client_order_id(symbol)
+    }
+    if stop_loss:
+        request['stop_loss'] = {'stop_price': order_price(stop_loss)}
+    if take_profit:
+        request['take_profit'] = {'limit_price': order_price(take_profit)}
+    if stop_loss and take_profit:
+        request['order_class'] = 'bracket'
+    elif stop_loss or take_profit:
+        request['order_class'] = 'oto'
+    return request
+
+class SignalSeries(NamedTuple):
+    """A strategy's rules evaluated at every bar
+    
+    `long` and `short` are boolean arrays, `strength` is signed (positive
+    for long) and 0 without a signal, and `stop`/`target` are the exit
+    levels of a position entered at that bar's price.
+    """
+    long: np.ndarray
+    short: np.ndarray
+    strength: np.ndarray
+    stop: np.ndarray
+    target: np.ndarray
 
 class BaseStrategy(ABC):
-    def __init__(self, api, symbol, account):
+    """A trading strategy, live and in backtests
+    
+    The rules are written once, in `signal_series`, as array expressions
+    over the columns named in `INPUTS`. The backtester evaluates them over
+    a whole history in one pass; the live path evaluates them over the
+    snapshot and reads the last bar, so both always agree.
+    """
+    
+    # Registry name, set by `register_strategy`
+    name = None
+    # Inputs of the rules: {input: (timeframe, indicator column)}; every
+    # strategy reads at least 'price' and 'vwap'
+    INPUTS = {}
+    # Rule thresholds, exit multiples, indicator periods and Kelly inputs
+    PARAMS = {}
+    
+    def __init__(self, api, snapshot, orders=None, params=None):
         self.api = api
-        self.symbol = symbol
-        self.account = account
+        self.snapshot = snapshot
+        self.symbol = snapshot.symbol
+        self.account = snapshot.account
+        # Optional OrderPipeline; without one orders are sent synchronously
+        self.orders = orders
+        self.params = {**self.PARAMS, **(params or {})}
+        self.max_position_size = self.params['max_position_size']
+        self.risk_per_trade = self.params['risk_per_trade']
+        self.win_rate = self.params['win_rate']
+        self.avg_win = self.params['avg_win']
+        self.avg_loss = self.params['avg_loss']
         self.logger = logging.getLogger(self.__class__.__name__)
     
+    @classmethod
     @abstractmethod
-    def generate_signals(self, data):
-        """Generate trading signals based on market data"""
+    def signal_series(cls, inputs, params):
+        """Evaluate the rules at every bar
+        
+        `inputs` maps each `INPUTS` name to a float64 array, all of one
+        length; returns a `SignalSeries` of that length.
+        """
         pass
     
+    @classmethod
+    def signal_timeframe(cls):
+        """Timeframe the rules are evaluated on, that of the 'price' input"""
+        return cls.INPUTS['price'][0]
+    
+    @classmethod
+    def timeframes(cls):
+        """Timeframes the rules read, the signal timeframe first"""
+        return list(dict.fromkeys([cls.signal_timeframe()] + [tf for tf, _ in cls.INPUTS.values()]))
+    
+    @classmethod
+    def frame_inputs(cls, frames):
+        """`INPUTS` read from {timeframe: indicator frame}, at every bar of the signal timeframe
+        
+        Inputs of other timeframes are joined as of each signal bar's close:
+        they hold the latest bar of their timeframe that had closed by then
+        (NaN before the first), so no bar is read before it is complete.
+        On data that ends at a bar close, the last element of every input is
+        its timeframe's latest bar, as `snapshot_inputs` reads it live.
+        """
+        signal_tf = cls.signal_timeframe()
+        closes = {tf: bar_close_times(frames[tf].index, tf) for tf in cls.timeframes()}
+        at = closes[signal_tf]
+        inputs = {}
+        for name, (tf, column) in cls.INPUTS.items():
+            values = np.asarray(frames[tf][column], dtype=np.float64)
+            if tf == signal_tf:
+                inputs[name] = values
+                continue
+            latest = np.searchsorted(closes[tf], at, side='right') - 1
+            inputs[name] = np.full(len(at), np.nan)
+            known = latest >= 0
+            inputs[name][known] = values[latest[known]]
+        return inputs
+    
+    @classmethod
+    def frame_signals(cls, frames, params=None):
+        """`signal_series` over every bar of the signal timeframe, as the backtester runs it"""
+        return cls.signal_series(cls.frame_inputs(frames), {**cls.PARAMS, **(params or {})})
+    
+    def snapshot_inputs(self):
+        """`INPUTS` read from the snapshot, right-aligned on each timeframe's latest bar
+        
+        Timeframes hold different numbers of bars, so every array is cut to
+        the shortest; the last element of each is then its timeframe's
+        latest bar, which is all the live path reads.
+        """
+        inputs = {name: self.snapshot.values(tf, column) for name, (tf, column) in self.INPUTS.items()}
+        n = min(len(values) for values in inputs.values())
+        return {name: np.asarray(values[len(values) - n:], dtype=np.float64) for name, values in inputs.items()}
+    
+    @staticmethod
+    def latest_signals(inputs, series):
+        """The `generate_signals` dict for the last bar of a `SignalSeries`"""
+        long_signal, short_signal = bool(series.long[-1]), bool(series.short[-1])
+        return {
+            'signal': 'long' if long_signal else 'short' if short_signal else None,
+            'strength': float(series.strength[-1]),
+            'price': float(inputs['price'][-1]),
+            'vwap': float(inputs['vwap'][-1])
+        }
+    
+    def generate_signals(self):
+        """Generate trading signals based on the snapshot's market data"""
+        inputs = self.snapshot_inputs()
+        return self.latest_signals(inputs, self.signal_series(inputs, self.params))
+    
     @abstractmethod
     def calculate_position_size(self, signal_strength):
         """Calculate position size based on signal strength"""
         pass
     
+    def kelly_fraction(self):
+        """Kelly fraction for the strategy's estimated win rate and payoffs"""
+        return (self.win_rate * self.avg_win - (1 - self.win_rate) * self.avg_loss) / self.avg_win
+    
+    def entry_candidate(self, signals, stop_loss=None, take_profit=None):
+        """The entry `signals` ask for, to be sized by a `PortfolioRiskEngine`"""
+        return EntryCandidate(
+            symbol=self.symbol,
+            side=signals['signal'],
+            strength=signals['strength'],
+            price=self.snapshot.price,
+            kelly=self.kelly_fraction(),
+            max_weight=self.max_position_size,
+            entry_price=signals['price'],
+            stop_loss=stop_loss,
+            take_profit=take_profit,
+            strategy=self
+        )
+    
     @abstractmethod
     def calculate_stop_loss(self, entry_price, position_type):
         """Calculate stop loss level"""
@@ -28,67 +205,88 @@ class BaseStrategy(ABC):
         """Calculate take profit level"""
         pass
     
-    def place_order(self, side, qty, stop_loss=None, take_profit=None):
-        """Place an order with optional stop loss and take profit"""
+    def _client_order_id(self):
+        return client_order_id(self.symbol)
+    
+    def order_request(self, side, qty, stop_loss=None, take_profit=None):
+        """`submit_order` arguments for a market entry with its exits attached"""
+        return entry_request(self.symbol, side, qty, stop_loss, take_profit)
+    
+    def _send(self, request):
+        """Queue a request on the order pipeline, or submit it right away
+        
+        Returns a future for the `OrderTicket` when queued, otherwise the
+        order (None if it was rejected).
+        """
+        if self.orders is not None:
+            return self.orders.submit(request)
         try:
-            # Place main order
-            order = self.api.submit_order(
-                symbol=self.symbol,
-                qty=qty,
-                side=side,
-                type='market',
-                time_in_force='gtc'
-            )
-            
-            # Place stop loss if specified
-            if stop_loss:
-                self.api.submit_order(
-                    symbol=self.symbol,
-                    qty=qty,
-                    side='sell' if side == 'buy' else 'buy',
-                    type='stop',
-                    time_in_force='gtc',
-                    stop_price=stop_loss
-                )
-            
-            # Place take profit if specified
-            if take_profit:
-                self.api.submit_order(
-                    symbol=self.symbol,
-                    qty=qty,
-                    side='sell' if side == 'buy' else 'buy',
-                    type='limit',
-                    time_in_force='gtc',
-                    limit_price=take_profit
-                )
-            
-            self.logger.info(f"Order placed: {side} {qty} {self.symbol}")
+            with span('submit_order', self.symbol):
+                order = self.api.submit_order(**request)
+            self.logger.info(f"Order placed: {request['side']} {request['qty']} {self.symbol}")
             return order
-            
         except Exception as e:
             self.logger.error(f"Error placing order: {str(e)}")
             return None
     
-    def close_position(self):
-        """Close all positions for the symbol"""
+    def place_order(self, side, qty, stop_loss=None, take_profit=None):
+        """Place an entry order with optional stop loss and take profit, in one request"""
+        return self._send(self.order_request(side, qty, stop_loss, take_profit))
+    
+    def place_exit_orders(self, stop_loss, take_profit):
+        """Protect the open position with a one-cancels-other stop/target pair"""
+        position = self.snapshot.position
+        if position is None:
+            return None
+        qty = int(float(position.qty))
+        return self._send({
+            'symbol': self.symbol,
+            'qty': abs(qty),
+            'side': 'sell' if qty > 0 else 'buy',
+            'type': 'limit',
+            'time_in_force': 'gtc',
+            'limit_price': order_price(take_profit),
+            'order_class': 'oco',
+            'take_profit': {'limit_price': order_price(take_profit)},
+            'stop_loss': {'stop_price': order_price(stop_loss)},
+            'client_order_id': self._client_order_id()
+        })
+    
+    def close_position(self, reason=None):
+        """Close the symbol's position, long or short, with one `close_position` request
+        
+        The broker liquidates it at market and deals with its open bracket
+        legs, which would otherwise hold the shares and get a closing order
+        rejected. Returns a future for the `OrderTicket` when queued,
+        otherwise the closing order (None if it was rejected); the close is
+        logged once the broker has accepted it.
+        """
+        position = self.snapshot.position
+        if position is None:
+            self.logger.info(f"No position to close: {self.symbol}")
+            return None
+        qty = int(float(position.qty))
+        if qty == 0:
+            return None
+        message = f"Position closed: {qty} {self.symbol}" + (f" on {reason}" if reason else "")
+        
+        if self.orders is not None:
+            future = self.orders.close_position(self.symbol)
+            
+            def log_close(done):
+                if done.result().ok:
+                    self.logger.info(message)
+            future.add_done_callback(log_close)
+            return future
         try:
-            position = self.api.get_position(self.symbol)
-            qty = int(position.qty)
-            if qty > 0:
-                self.api.submit_order(
-                    symbol=self.symbol,
-                    qty=qty,
-                    side='sell',
-                    type='market',
-                    time_in_force='gtc'
-                )
-                self.logger.info(f"Position closed: {qty} {self.symbol}")
+            with span('close_position', self.symbol):
+                order = self.api.close_position(self.symbol)
         except Exception as e:
-            self.logger.info(f"No position to close: {str(e)}")
+            self.logger.error(f"Error closing position in {self.symbol}: {str(e)}")
+            return None
+        self.logger.info(message)
+        return order
     
     def get_position(self):
         """Get current position for the symbol"""
-        try:
-            return self.api.get_position(self.symbol)
-        except Exception:
-            return None 
\ No newline at end of file
+        return self.snapshot.position 
\ No newline at end of file
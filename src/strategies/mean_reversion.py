@@ -1,108 +1,134 @@
-from .base_strategy import BaseStrategy
+from .base_strategy import BaseStrategy, SignalSeries
+from .registry import register_strategy
+from analysis.indicator_kernel import rolling_mean
 import numpy as np
-import logging
 
+@register_strategy('mean_reversion')
 class MeanReversionStrategy(BaseStrategy):
-    def __init__(self, api, symbol, account):
-        super().__init__(api, symbol, account)
-        self.max_position_size = 0.05  # Maximum 5% of portfolio
-        self.risk_per_trade = 0.01     # 1% risk per trade
-        self.logger = logging.getLogger(self.__class__.__name__)
+    # Signals on the 15-minute timeframe instead of hourly; exits on the hourly
+    INPUTS = {
+        'rsi': ('15m', 'rsi'),
+        'bb_upper': ('15m', 'bb_upper'),
+        'bb_lower': ('15m', 'bb_lower'),
+        'bb_middle': ('15m', 'bb_middle'),
+        'price': ('15m', 'close'),
+        'vwap': ('15m', 'vwap'),
+        'atr': ('15m', 'atr'),
+        'exit_atr': ('1h', 'atr'),
+        'exit_bb_middle': ('1h', 'bb_middle')
+    }
+    PARAMS = {
+        'rsi_oversold': 30,
+        'rsi_overbought': 70,
+        'stop_atr_multiple': 2,     # Stop loss distance in hourly ATRs
+        'atr_average_period': 20,   # Bars in the average ATR
+        'rsi_period': 14,
+        'bb_period': 20,
+        'atr_period': 14,
+        'adx_period': 14,
+        'max_position_size': 0.05,  # Maximum 5% of portfolio
+        'risk_per_trade': 0.01,     # 1% risk per trade
+        'win_rate': 0.55,           # Estimated win rate (lower for mean reversion)
+        'avg_win': 0.015,           # Estimated average win (1.5%)
+        'avg_loss': 0.01            # Estimated average loss (1%)
+    }
     
-    def generate_signals(self, data):
+    @classmethod
+    def conditions(cls, inputs, params):
+        """Named long and short entry conditions, each a boolean array"""
+        rsi = inputs['rsi']
+        price = inputs['price']
+        vwap = inputs['vwap']
+        atr = inputs['atr']
+        avg_atr = rolling_mean(atr, params['atr_average_period'])
+        
+        with np.errstate(invalid='ignore'):
+            calm = atr < avg_atr
+            long_conditions = {
+                f"RSI < {params['rsi_oversold']}": rsi < params['rsi_oversold'],
+                'Price < BB Lower': price < inputs['bb_lower'],
+                'Price < VWAP': price < vwap,
+                'ATR < Avg ATR': calm
+            }
+            short_conditions = {
+                f"RSI > {params['rsi_overbought']}": rsi > params['rsi_overbought'],
+                'Price > BB Upper': price > inputs['bb_upper'],
+                'Price > VWAP': price > vwap,
+                'ATR < Avg ATR': calm
+            }
+        return long_conditions, short_conditions, avg_atr
+    
+    @classmethod
+    def signal_series(cls, inputs, params, conditions=None):
+        """Mean reversion rules over whole arrays; the target is the hourly middle band"""
+        long_conditions, short_conditions, _ = conditions or cls.conditions(inputs, params)
+        long = np.logical_and.reduce(list(long_conditions.values()))
+        short = np.logical_and.reduce(list(short_conditions.values()))
+        
+        # Signal strength: twice the deviation from the middle band
+        price = inputs['price']
+        bb_middle = inputs['bb_middle']
+        with np.errstate(invalid='ignore', divide='ignore'):
+            strength = np.where(long, np.minimum(1.0, (bb_middle - price) / bb_middle * 2), 0.0)
+            strength = np.where(short, -np.minimum(1.0, (price - bb_middle) / bb_middle * 2), strength)
+        
+        direction = np.where(short, -1.0, 1.0)
+        stop = price - direction * params['stop_atr_multiple'] * inputs['exit_atr']
+        return SignalSeries(long, short, strength, stop, inputs['exit_bb_middle'].copy())
+    
+    def generate_signals(self):
         """Generate trading signals based on mean reversion strategy"""
-        # Get latest data from 15-minute timeframe instead of hourly
-        timeframe_data = data['15m']
-        
-        # Calculate mean reversion indicators
-        rsi = timeframe_data['rsi'].iloc[-1]
-        bb_upper = timeframe_data['bb_upper'].iloc[-1]
-        bb_lower = timeframe_data['bb_lower'].iloc[-1]
-        bb_middle = timeframe_data['bb_middle'].iloc[-1]
-        price = timeframe_data['close'].iloc[-1]
-        vwap = timeframe_data['vwap'].iloc[-1]
-        
-        # Calculate volatility
-        atr = timeframe_data['atr'].iloc[-1]
-        avg_atr = timeframe_data['atr'].rolling(20).mean().iloc[-1]
-        
-        # Log current market conditions
-        self.logger.info(f"\n=== Market Conditions (15m) ===")
-        self.logger.info(f"Price: ${price:.2f}")
-        self.logger.info(f"VWAP: ${vwap:.2f}")
-        self.logger.info(f"RSI: {rsi:.2f}")
-        self.logger.info(f"Bollinger Bands:")
-        self.logger.info(f"  Upper: ${bb_upper:.2f}")
-        self.logger.info(f"  Middle: ${bb_middle:.2f}")
-        self.logger.info(f"  Lower: ${bb_lower:.2f}")
-        self.logger.info(f"Volatility:")
-        self.logger.info(f"  Current ATR: ${atr:.2f}")
-        self.logger.info(f"  Average ATR: ${avg_atr:.2f}")
-        
-        # Generate signals
-        long_conditions = {
-            'RSI < 30': rsi < 30,
-            'Price < BB Lower': price < bb_lower,
-            'Price < VWAP': price < vwap,
-            'ATR < Avg ATR': atr < avg_atr
-        }
-        
-        short_conditions = {
-            'RSI > 70': rsi > 70,
-            'Price > BB Upper': price > bb_upper,
-            'Price > VWAP': price > vwap,
-            'ATR < Avg ATR': atr < avg_atr
-        }
-        
-        # Log signal conditions
-        self.logger.info(f"\n=== Long Signal Conditions ===")
-        for condition, met in long_conditions.items():
-            self.logger.info(f"{condition}: {'✅' if met else '❌'}")
-        
-        self.logger.info(f"\n=== Short Signal Conditions ===")
-        for condition, met in short_conditions.items():
-            self.logger.info(f"{condition}: {'✅' if met else '❌'}")
-        
-        # Calculate final signals
-        long_signal = all(long_conditions.values())
-        short_signal = all(short_conditions.values())
-        
-        # Calculate signal strength
-        signal_strength = 0
-        if long_signal:
-            deviation = (bb_middle - price) / bb_middle
-            signal_strength = min(1.0, deviation * 2)
-            self.logger.info(f"\n✅ Long signal generated!")
-            self.logger.info(f"Signal strength: {signal_strength:.2f}")
-        elif short_signal:
-            deviation = (price - bb_middle) / bb_middle
-            signal_strength = -min(1.0, deviation * 2)
-            self.logger.info(f"\n✅ Short signal generated!")
-            self.logger.info(f"Signal strength: {signal_strength:.2f}")
-        else:
-            self.logger.info(f"\n❌ No trading signals generated")
-        
-        return {
-            'signal': 'long' if long_signal else 'short' if short_signal else None,
-            'strength': signal_strength,
-            'price': price,
-            'vwap': vwap
-        }
+        inputs = self.snapshot_inputs()
+        conditions = self.conditions(inputs, self.params)
+        signals = self.latest_signals(inputs, self.signal_series(inputs, self.params, conditions))
+        
+        long_conditions = {name: bool(values[-1]) for name, values in conditions[0].items()}
+        short_conditions = {name: bool(values[-1]) for name, values in conditions[1].items()}
+        price, vwap = signals['price'], signals['vwap']
+        rsi = float(inputs['rsi'][-1])
+        bb_upper = float(inputs['bb_upper'][-1])
+        bb_middle = float(inputs['bb_middle'][-1])
+        bb_lower = float(inputs['bb_lower'][-1])
+        atr = float(inputs['atr'][-1])
+        avg_atr = float(conditions[2][-1])
+        
+        # Log market conditions as one sampled diagnostic record; the message
+        # is only formatted if the record is actually written
+        self.logger.info(
+            "%s 15m: price %.2f, VWAP %.2f, RSI %.2f, BB %.2f/%.2f/%.2f, ATR %.2f (avg %.2f); "
+            "long conditions %d/4, short conditions %d/4",
+            self.symbol, price, vwap, rsi, bb_upper, bb_middle, bb_lower, atr, avg_atr,
+            sum(long_conditions.values()), sum(short_conditions.values()),
+            extra={
+                'fields': {
+                    'symbol': self.symbol,
+                    'price': price,
+                    'vwap': vwap,
+                    'rsi': rsi,
+                    'bb_upper': bb_upper,
+                    'bb_middle': bb_middle,
+                    'bb_lower': bb_lower,
+                    'atr': atr,
+                    'avg_atr': avg_atr,
+                    'long_conditions': long_conditions,
+                    'short_conditions': short_conditions
+                },
+                'diagnostic': True
+            }
+        )
+        
+        if signals['signal']:
+            self.logger.info("%s signal for %s, strength %.2f", signals['signal'].capitalize(),
+                             self.symbol, signals['strength'])
+        return signals
     
     def calculate_position_size(self, signal_strength):
         """Calculate position size based on signal strength and risk management"""
         # Get account equity
         equity = float(self.account.equity)
         
-        # Calculate base position size using Kelly Criterion
-        win_rate = 0.55  # Estimated win rate (lower for mean reversion)
-        avg_win = 0.015  # Estimated average win (1.5%)
-        avg_loss = 0.01  # Estimated average loss (1%)
-        
-        kelly_fraction = (win_rate * avg_win - (1 - win_rate) * avg_loss) / avg_win
-        
-        # Adjust for signal strength
-        adjusted_kelly = kelly_fraction * abs(signal_strength)
+        # Adjust the Kelly fraction for signal strength
+        adjusted_kelly = self.kelly_fraction() * abs(signal_strength)
         
         # Apply maximum position size limit
         position_size = min(adjusted_kelly, self.max_position_size)
@@ -111,7 +137,7 @@ class MeanReversionStrategy(BaseStrategy):
         position_value = equity * position_size
         
         # Get current price
-        price = float(self.api.get_latest_trade(self.symbol).price)
+        price = self.snapshot.price
         
         # Calculate number of shares
         shares = int(position_value / price)
@@ -121,18 +147,17 @@ class MeanReversionStrategy(BaseStrategy):
     def calculate_stop_loss(self, entry_price, position_type):
         """Calculate ATR-based stop loss"""
         # Get ATR
-        atr = float(self.api.get_bars(self.symbol, '1h', limit=1).df['atr'].iloc[-1])
+        atr = self.snapshot.latest('1h', 'atr')
         
         if position_type == 'long':
-            return entry_price - (2 * atr)
+            return entry_price - (self.params['stop_atr_multiple'] * atr)
         else:
-            return entry_price + (2 * atr)
+            return entry_price + (self.params['stop_atr_multiple'] * atr)
     
     def calculate_take_profit(self, entry_price, position_type):
         """Calculate mean reversion take profit"""
         # Get Bollinger Bands
-        bb_data = self.api.get_bars(self.symbol, '1h', limit=1).df
-        bb_middle = bb_data['bb_middle'].iloc[-1]
+        bb_middle = self.snapshot.latest('1h', 'bb_middle')
         
         if position_type == 'long':
             return bb_middle  # Target the middle band
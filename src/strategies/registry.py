@@ -0,0 +1,43 @@
+"""
+Registry of the strategies by name.
+
+A strategy class registers itself with `@register_strategy(name)`; the
+backtester, the optimizer and their command lines look strategies up here,
+so a new strategy module only has to be added to `BUILTIN_MODULES`.
+"""
+import importlib
+
+# Modules whose strategies register on import
+BUILTIN_MODULES = (
+    'strategies.trend_following',
+    'strategies.mean_reversion'
+)
+
+STRATEGIES = {}
+
+def register_strategy(name):
+    """Class decorator adding a `BaseStrategy` subclass to the registry under `name`"""
+    def register(cls):
+        if STRATEGIES.get(name, cls) is not cls:
+            raise ValueError(f"Strategy {name!r} is already registered to {STRATEGIES[name].__name__}")
+        cls.name = name
+        STRATEGIES[name] = cls
+        return cls
+    return register
+
+def _load_builtin():
+    for module in BUILTIN_MODULES:
+        importlib.import_module(module)
+
+def strategy_names():
+    """Sorted names of the registered strategies"""
+    _load_builtin()
+    return sorted(STRATEGIES)
+
+def get_strategy(name):
+    """The strategy class registered under `name`"""
+    _load_builtin()
+    try:
+        return STRATEGIES[name]
+    except KeyError:
+        raise ValueError(f"Unknown strategy {name!r}; available: {', '.join(sorted(STRATEGIES))}") from None
@@ -0,0 +1,89 @@
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Any, Mapping, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Order classes that only ever exit a position; any other open order in a
+# symbol with no position is an entry still working
+EXIT_ORDER_CLASSES = frozenset({'oco'})
+
+@dataclass(frozen=True)
+class MarketSnapshot:
+    """Everything one trading cycle knows about a symbol
+
+    Built once per cycle from data that has already been fetched (the
+    indicator frames from `get_market_data` or the `BarWindow`s of a
+    `BarStore`, the account and the open positions), so strategies never
+    have to go back to the broker to read a price or an indicator. The
+    frames are shared and must not be modified; `latest` and `values` read
+    either kind.
+    `open_orders` holds the symbol's open orders when they are known
+    locally (from an `OrderBook`), and is None otherwise.
+    """
+    symbol: str
+    data: Mapping[str, pd.DataFrame]
+    account: Any
+    positions: Mapping[str, Any]
+    price: float
+    timestamp: pd.Timestamp
+    open_orders: Optional[Tuple[Any, ...]] = None
+
+    @property
+    def position(self):
+        """Open position in this snapshot's symbol, or None"""
+        return self.positions.get(self.symbol)
+
+    @property
+    def pending_entry(self):
+        """An open order that will open a position in this symbol once filled, or None
+
+        Covers an entry (or its bracket legs) that has not filled yet, and
+        one whose fill has not reached the local order book.
+        """
+        for order in self.open_orders or ():
+            if (getattr(order, 'order_class', None) or 'simple') not in EXIT_ORDER_CLASSES:
+                return order
+        return None
+
+    @property
+    def equity(self):
+        return float(self.account.equity)
+
+    def values(self, timeframe, column):
+        """An indicator column as a NumPy array"""
+        return np.asarray(self.data[timeframe][column])
+
+    def latest(self, timeframe, column):
+        """Most recent value of an indicator column"""
+        return float(self.values(timeframe, column)[-1])
+
+def _last_timestamp(frame):
+    if isinstance(frame, pd.DataFrame):
+        return frame.index[-1]
+    return frame.last_timestamp
+
+def build_snapshot(symbol, data, account, positions, open_orders=None):
+    """Snapshot for one symbol; the price is the close of its most recent bar
+
+    `positions` maps symbols to positions, as returned by `positions_by_symbol`
+    or `OrderBook.positions`.
+    """
+    frames = [frame for frame in data.values() if len(frame)]
+    if not frames:
+        raise ValueError(f"No bars for {symbol}")
+    latest = max(frames, key=_last_timestamp)
+    return MarketSnapshot(
+        symbol=symbol,
+        data=MappingProxyType(dict(data)),
+        account=account,
+        positions=positions,
+        price=float(np.asarray(latest['close'])[-1]),
+        timestamp=_last_timestamp(latest),
+        open_orders=None if open_orders is None else tuple(open_orders)
+    )
+
+def positions_by_symbol(api):
+    """All open positions in one request, keyed by symbol"""
+    return MappingProxyType({position.symbol: position for position in api.list_positions()})
@@ -1,78 +1,85 @@
-from .base_strategy import BaseStrategy
+from .base_strategy import BaseStrategy, SignalSeries
+from .registry import register_strategy
 import numpy as np
 
+@register_strategy('trend_following')
 class TrendFollowingStrategy(BaseStrategy):
-    def __init__(self, api, symbol, account):
-        super().__init__(api, symbol, account)
-        self.max_position_size = 0.1  # Maximum 10% of portfolio
-        self.risk_per_trade = 0.02    # 2% risk per trade
+    INPUTS = {
+        # Trend strength
+        'adx': ('1d', 'adx'),
+        'plus_di': ('1d', 'plus_di'),
+        'minus_di': ('1d', 'minus_di'),
+        # Momentum
+        'macd': ('1h', 'macd'),
+        'macd_signal': ('1h', 'macd_signal'),
+        # Price action
+        'price': ('1d', 'close'),
+        'vwap': ('1d', 'vwap'),
+        'bb_upper': ('1d', 'bb_upper'),
+        'bb_lower': ('1d', 'bb_lower'),
+        'atr': ('1d', 'atr')
+    }
+    PARAMS = {
+        'adx_threshold': 25,        # Strong trend above this ADX
+        'stop_atr_multiple': 2.5,   # Stop loss distance in ATRs
+        'target_atr_multiple': 3,   # Take profit distance in ATRs
+        'rsi_period': 14,
+        'bb_period': 20,
+        'atr_period': 14,
+        'adx_period': 14,
+        'max_position_size': 0.1,   # Maximum 10% of portfolio
+        'risk_per_trade': 0.02,     # 2% risk per trade
+        'win_rate': 0.6,            # Estimated win rate
+        'avg_win': 0.02,            # Estimated average win (2%)
+        'avg_loss': 0.01            # Estimated average loss (1%)
+    }
     
-    def generate_signals(self, data):
-        """Generate trading signals based on trend following strategy"""
-        # Get latest data
-        daily_data = data['1d']
-        hourly_data = data['1h']
-        
-        # Calculate trend strength
-        adx = daily_data['adx'].iloc[-1]
-        plus_di = daily_data['plus_di'].iloc[-1]
-        minus_di = daily_data['minus_di'].iloc[-1]
-        
-        # Calculate momentum
-        macd = hourly_data['macd'].iloc[-1]
-        macd_signal = hourly_data['macd_signal'].iloc[-1]
-        
-        # Calculate price action
-        price = daily_data['close'].iloc[-1]
-        vwap = daily_data['vwap'].iloc[-1]
-        bb_upper = daily_data['bb_upper'].iloc[-1]
-        bb_lower = daily_data['bb_lower'].iloc[-1]
-        
-        # Generate signals
-        long_signal = (
-            adx > 25 and                    # Strong trend
-            plus_di > minus_di and          # Uptrend
-            macd > macd_signal and          # MACD crossover
-            price > vwap and                # Price above VWAP
-            price < bb_upper                # Not overbought
-        )
-        
-        short_signal = (
-            adx > 25 and                    # Strong trend
-            minus_di > plus_di and          # Downtrend
-            macd < macd_signal and          # MACD crossover
-            price < vwap and                # Price below VWAP
-            price > bb_lower                # Not oversold
-        )
-        
-        # Calculate signal strength
-        signal_strength = 0
-        if long_signal:
-            signal_strength = min(1.0, (adx / 100) * (plus_di / (plus_di + minus_di)))
-        elif short_signal:
-            signal_strength = -min(1.0, (adx / 100) * (minus_di / (plus_di + minus_di)))
-        
-        return {
-            'signal': 'long' if long_signal else 'short' if short_signal else None,
-            'strength': signal_strength,
-            'price': price,
-            'vwap': vwap
-        }
+    @classmethod
+    def signal_series(cls, inputs, params):
+        """Trend following rules over whole arrays"""
+        adx = inputs['adx']
+        plus_di = inputs['plus_di']
+        minus_di = inputs['minus_di']
+        macd = inputs['macd']
+        macd_signal = inputs['macd_signal']
+        price = inputs['price']
+        vwap = inputs['vwap']
+        atr = inputs['atr']
+        
+        with np.errstate(invalid='ignore', divide='ignore'):
+            trending = adx > params['adx_threshold']            # Strong trend
+            long = (
+                trending &
+                (plus_di > minus_di) &                          # Uptrend
+                (macd > macd_signal) &                          # MACD crossover
+                (price > vwap) &                                # Price above VWAP
+                (price < inputs['bb_upper'])                    # Not overbought
+            )
+            short = (
+                trending &
+                (minus_di > plus_di) &                          # Downtrend
+                (macd < macd_signal) &                          # MACD crossover
+                (price < vwap) &                                # Price below VWAP
+                (price > inputs['bb_lower'])                    # Not oversold
+            )
+            
+            # Signal strength: trend strength times the dominant DI's share
+            di_sum = plus_di + minus_di
+            strength = np.where(long, np.minimum(1.0, (adx / 100) * (plus_di / di_sum)), 0.0)
+            strength = np.where(short, -np.minimum(1.0, (adx / 100) * (minus_di / di_sum)), strength)
+        
+        direction = np.where(short, -1.0, 1.0)
+        stop = price - direction * params['stop_atr_multiple'] * atr
+        target = price + direction * params['target_atr_multiple'] * atr
+        return SignalSeries(long, short, strength, stop, target)
     
     def calculate_position_size(self, signal_strength):
         """Calculate position size based on signal strength and risk management"""
         # Get account equity
         equity = float(self.account.equity)
         
-        # Calculate base position size using Kelly Criterion
-        win_rate = 0.6  # Estimated win rate
-        avg_win = 0.02  # Estimated average win (2%)
-        avg_loss = 0.01  # Estimated average loss (1%)
-        
-        kelly_fraction = (win_rate * avg_win - (1 - win_rate) * avg_loss) / avg_win
-        
-        # Adjust for signal strength
-        adjusted_kelly = kelly_fraction * abs(signal_strength)
+        # Adjust the Kelly fraction for signal strength
+        adjusted_kelly = self.kelly_fraction() * abs(signal_strength)
         
         # Apply maximum position size limit
         position_size = min(adjusted_kelly, self.max_position_size)
@@ -81,7 +88,7 @@ class TrendFollowingStrategy(BaseStrategy):
         position_value = equity * position_size
         
         # Get current price
-        price = float(self.api.get_latest_trade(self.symbol).price)
+        price = self.snapshot.price
         
         # Calculate number of shares
         shares = int(position_value / price)
@@ -91,19 +98,19 @@ class TrendFollowingStrategy(BaseStrategy):
     def calculate_stop_loss(self, entry_price, position_type):
         """Calculate ATR-based stop loss"""
         # Get ATR
-        atr = float(self.api.get_bars(self.symbol, '1d', limit=1).df['atr'].iloc[-1])
+        atr = self.snapshot.latest('1d', 'atr')
         
         if position_type == 'long':
-            return entry_price - (2.5 * atr)
+            return entry_price - (self.params['stop_atr_multiple'] * atr)
         else:
-            return entry_price + (2.5 * atr)
+            return entry_price + (self.params['stop_atr_multiple'] * atr)
     
     def calculate_take_profit(self, entry_price, position_type):
         """Calculate ATR-based take profit"""
         # Get ATR
-        atr = float(self.api.get_bars(self.symbol, '1d', limit=1).df['atr'].iloc[-1])
+        atr = self.snapshot.latest('1d', 'atr')
         
         if position_type == 'long':
-            return entry_price + (3 * atr)
+            return entry_price + (self.params['target_atr_multiple'] * atr)
         else:
-            return entry_price - (3 * atr) 
\ No newline at end of file
+            return entry_price - (self.params['target_atr_multiple'] * atr) 
\ No newline at end of file
@@ -0,0 +1,3 @@
+"""
+Market data streaming package.
+""" 
\ No newline at end of file
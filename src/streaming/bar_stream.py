@@ -0,0 +1,62 @@
+import json
+import websockets
+
+from .base_stream import ReconnectingStream, StreamAuthError
+
+DEFAULT_DATA_STREAM_URL = 'wss://stream.data.alpaca.markets/v2/iex'
+
+class BarStream(ReconnectingStream):
+    """Alpaca market data websocket client for bar (and trade) events
+
+    Authenticates, subscribes and dispatches each message to `on_bar` /
+    `on_trade`. Dropped connections are retried with exponential backoff and
+    `on_connect` runs after every successful (re)subscription, so callers can
+    backfill whatever was missed while disconnected.
+    """
+
+    def __init__(self, url, key, secret, symbols, on_bar, on_trade=None,
+                 on_connect=None, max_backoff=30):
+        super().__init__(url, key, secret, max_backoff)
+        self.symbols = list(symbols)
+        self.on_bar = on_bar
+        self.on_trade = on_trade
+        self.on_connect = on_connect
+
+    async def _expect(self, websocket, message_type, msg=None):
+        """Wait for a control message, failing on stream errors"""
+        while True:
+            for message in json.loads(await websocket.recv()):
+                if message.get('T') == 'error':
+                    if message.get('code') in (401, 402, 403, 404):
+                        raise StreamAuthError(message.get('msg'))
+                    raise ConnectionError(f"Stream error {message.get('code')}: {message.get('msg')}")
+                if message.get('T') == message_type and (msg is None or message.get('msg') == msg):
+                    return message
+
+    async def _session(self):
+        """Connect, authenticate, subscribe and dispatch until the socket closes"""
+        async with websockets.connect(self.url) as websocket:
+            self._websocket = websocket
+            await self._expect(websocket, 'success', 'connected')
+
+            await websocket.send(json.dumps({'action': 'auth', 'key': self.key, 'secret': self.secret}))
+            await self._expect(websocket, 'success', 'authenticated')
+
+            subscription = {'action': 'subscribe', 'bars': self.symbols}
+            if self.on_trade is not None:
+                subscription['trades'] = self.symbols
+            await websocket.send(json.dumps(subscription))
+            await self._expect(websocket, 'subscription')
+            self.logger.info(f"Subscribed to bars for {', '.join(self.symbols)}")
+
+            if self.on_connect is not None:
+                await self.on_connect()
+
+            async for raw in websocket:
+                for message in json.loads(raw):
+                    if message.get('T') == 'b':
+                        await self.on_bar(message)
+                    elif message.get('T') == 't' and self.on_trade is not None:
+                        await self.on_trade(message)
+                    elif message.get('T') == 'error':
+                        self.logger.error(f"Stream error {message.get('code')}: {message.get('msg')}")
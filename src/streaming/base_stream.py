@@ -0,0 +1,54 @@
+import asyncio
+import logging
+import websockets
+
+class StreamAuthError(Exception):
+    """Raised when the stream rejects our credentials"""
+
+class ReconnectingStream:
+    """Websocket client that reconnects with exponential backoff
+
+    Subclasses implement `_session`, which connects, authenticates,
+    subscribes and dispatches messages until the socket closes; `run` keeps
+    calling it until `stop` is called. A `StreamAuthError` is not retried.
+    """
+
+    def __init__(self, url, key, secret, max_backoff=30):
+        self.url = url
+        self.key = key
+        self.secret = secret
+        self.max_backoff = max_backoff
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self._websocket = None
+        self._running = False
+
+    async def _session(self):
+        raise NotImplementedError
+
+    async def run(self):
+        """Run until `stop` is called, reconnecting on any connection failure"""
+        self._running = True
+        backoff = 1
+        while self._running:
+            try:
+                await self._session()
+                backoff = 1
+            except StreamAuthError:
+                raise
+            except (websockets.ConnectionClosed, OSError, ConnectionError, asyncio.TimeoutError) as e:
+                if not self._running:
+                    break
+                self.logger.warning(f"Stream disconnected ({e}); reconnecting in {backoff}s")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, self.max_backoff)
+                continue
+            if self._running:
+                # Server closed the socket cleanly; reconnect straight away
+                self.logger.warning("Stream closed by server; reconnecting")
+        self._websocket = None
+
+    async def stop(self):
+        """Stop the stream and close the socket"""
+        self._running = False
+        if self._websocket is not None:
+            await self._websocket.close()
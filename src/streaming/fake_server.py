@@ -0,0 +1,152 @@
+import json
+import asyncio
+import logging
+import argparse
+import numpy as np
+import pandas as pd
+import websockets
+
+class FakeStreamServer:
+    """Local stand-in for the Alpaca market data websocket
+
+    Speaks the same JSON protocol as the real stream (connected/auth/
+    subscribe control messages, then "b" bar messages) and replays a fixed
+    list of bars, so daemon mode can be exercised without network access.
+    `drop_after` closes the first connection after that many bars to
+    exercise reconnect and backfill.
+    """
+
+    def __init__(self, bars, host='127.0.0.1', port=8765, interval=0.0,
+                 key=None, secret=None, drop_after=None):
+        self.bars = list(bars)
+        self.host = host
+        self.port = port
+        self.interval = interval
+        self.key = key
+        self.secret = secret
+        self.drop_after = drop_after
+        self.position = 0
+        self.connections = 0
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self._server = None
+        self.finished = asyncio.Event()
+
+    @property
+    def url(self):
+        return f"ws://{self.host}:{self.port}"
+
+    async def _handler(self, websocket, path=None):
+        self.connections += 1
+        await websocket.send(json.dumps([{'T': 'success', 'msg': 'connected'}]))
+
+        auth = json.loads(await websocket.recv())
+        if auth.get('action') != 'auth' or \
+           (self.key is not None and (auth.get('key'), auth.get('secret')) != (self.key, self.secret)):
+            await websocket.send(json.dumps([{'T': 'error', 'code': 402, 'msg': 'auth failed'}]))
+            return
+        await websocket.send(json.dumps([{'T': 'success', 'msg': 'authenticated'}]))
+
+        subscription = json.loads(await websocket.recv())
+        symbols = set(subscription.get('bars', []))
+        await websocket.send(json.dumps([{
+            'T': 'subscription',
+            'trades': subscription.get('trades', []),
+            'quotes': [],
+            'bars': sorted(symbols)
+        }]))
+
+        sent = 0
+        while self.position < len(self.bars):
+            bar = self.bars[self.position]
+            self.position += 1
+            if bar['S'] not in symbols:
+                continue
+            await websocket.send(json.dumps([bar]))
+            sent += 1
+            if self.drop_after is not None and self.connections == 1 and sent >= self.drop_after:
+                self.logger.info(f"Dropping connection after {sent} bars")
+                await websocket.close()
+                return
+            if self.interval:
+                await asyncio.sleep(self.interval)
+        self.finished.set()
+        await websocket.wait_closed()
+
+    async def start(self):
+        self._server = await websockets.serve(self._handler, self.host, self.port)
+        self.logger.info(f"Fake stream listening on {self.url}")
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+def frame_to_messages(frame, symbol=None):
+    """Convert a bar frame (timestamp index) into stream bar messages"""
+    messages = []
+    for timestamp, row in frame.iterrows():
+        timestamp = pd.Timestamp(timestamp)
+        if timestamp.tz is None:
+            timestamp = timestamp.tz_localize('UTC')
+        messages.append({
+            'T': 'b',
+            'S': row['symbol'] if 'symbol' in frame.columns else symbol,
+            'o': float(row['open']),
+            'h': float(row['high']),
+            'l': float(row['low']),
+            'c': float(row['close']),
+            'v': float(row['volume']),
+            't': timestamp.tz_convert('UTC').strftime('%Y-%m-%dT%H:%M:%SZ'),
+            'n': int(row.get('trade_count', 0) or 0),
+            'vw': float(row.get('vwap', row['close']))
+        })
+    messages.sort(key=lambda m: (m['t'], m['S']))
+    return messages
+
+def synthetic_bars(symbols, count, start=None, seed=0):
+    """Random-walk minute bars for each symbol, as stream bar messages"""
+    rng = np.random.default_rng(seed)
+    start = pd.Timestamp(start) if start is not None else pd.Timestamp.now(tz='UTC').floor('min')
+    index = pd.date_range(start, periods=count, freq='1min', tz='UTC' if start.tz is None else None)
+    messages = []
+    for symbol in symbols:
+        close = 100 * np.exp(np.cumsum(rng.normal(0, 0.0005, count)))
+        open_ = np.concatenate([[close[0]], close[:-1]])
+        spread = np.abs(rng.normal(0, 0.0003, count)) * close
+        frame = pd.DataFrame({
+            'open': open_,
+            'high': np.maximum(open_, close) + spread,
+            'low': np.minimum(open_, close) - spread,
+            'close': close,
+            'volume': rng.integers(100, 10000, count).astype(float)
+        }, index=index)
+        messages.extend(frame_to_messages(frame, symbol))
+    messages.sort(key=lambda m: (m['t'], m['S']))
+    return messages
+
+async def _serve(server):
+    await server.start()
+    await server.finished.wait()
+    # Give the client a moment to consume the last bars
+    await asyncio.sleep(1)
+    await server.stop()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve bars over a fake Alpaca market data stream")
+    parser.add_argument('--csv', help="Bar CSV with timestamp, symbol, open, high, low, close, volume columns")
+    parser.add_argument('--symbols', default='SPY', help="Comma-separated symbols for synthetic bars")
+    parser.add_argument('--count', type=int, default=390, help="Synthetic bars per symbol")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--interval', type=float, default=1.0, help="Seconds between bars")
+    parser.add_argument('--drop-after', type=int, help="Drop the first connection after N bars")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    if args.csv:
+        bars = frame_to_messages(pd.read_csv(args.csv, index_col='timestamp', parse_dates=True))
+    else:
+        bars = synthetic_bars(args.symbols.split(','), args.count)
+    asyncio.run(_serve(FakeStreamServer(
+        bars, args.host, args.port, args.interval, drop_after=args.drop_after
+    )))
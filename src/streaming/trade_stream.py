@@ -0,0 +1,54 @@
+import json
+import websockets
+
+from .base_stream import ReconnectingStream, StreamAuthError
+
+DEFAULT_PAPER_BASE_URL = 'https://paper-api.alpaca.markets'
+
+def trading_stream_url(base_url=DEFAULT_PAPER_BASE_URL):
+    """Account stream URL for a REST base URL (same host, websocket scheme)"""
+    return base_url.rstrip('/').replace('https://', 'wss://', 1).replace('http://', 'ws://', 1) + '/stream'
+
+class TradeUpdateStream(ReconnectingStream):
+    """Alpaca account websocket client for `trade_updates` events
+
+    Every order event (new, fill, partial_fill, canceled, ...) is passed to
+    `on_update` with the message's `data` payload. `on_connect` runs after
+    every successful (re)subscription; events sent while disconnected are
+    not replayed by Alpaca, so callers should resynchronise there.
+    """
+
+    def __init__(self, url, key, secret, on_update, on_connect=None, max_backoff=30):
+        super().__init__(url, key, secret, max_backoff)
+        self.on_update = on_update
+        self.on_connect = on_connect
+
+    async def _expect(self, websocket, stream):
+        """Wait for a control message on `stream`"""
+        while True:
+            message = json.loads(await websocket.recv())
+            if message.get('stream') == stream:
+                return message.get('data', {})
+
+    async def _session(self):
+        """Connect, authenticate, listen and dispatch until the socket closes"""
+        async with websockets.connect(self.url) as websocket:
+            self._websocket = websocket
+
+            await websocket.send(json.dumps({'action': 'auth', 'key': self.key, 'secret': self.secret}))
+            authorization = await self._expect(websocket, 'authorization')
+            if authorization.get('status') != 'authorized':
+                raise StreamAuthError(f"Trade update stream authorization {authorization.get('status')}")
+
+            await websocket.send(json.dumps({'action': 'listen', 'data': {'streams': ['trade_updates']}}))
+            await self._expect(websocket, 'listening')
+            self.logger.info("Listening for trade updates")
+
+            if self.on_connect is not None:
+                await self.on_connect()
+
+            # Messages arrive as binary frames on the live endpoints
+            async for raw in websocket:
+                message = json.loads(raw)
+                if message.get('stream') == 'trade_updates':
+                    await self.on_update(message['data'])
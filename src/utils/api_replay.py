@@ -0,0 +1,305 @@
+"""
+Record and replay traffic to the Alpaca REST API.
+
+`RecordingAPI` wraps a live `tradeapi.REST` client and appends every call
+to the recorded methods (arguments, timing and the raw response) to a
+JSON-lines file. `ReplayAPI` has the same interface and serves that file
+back deterministically with no network, so trading cycles can be profiled
+and load-tested offline.
+"""
+import gzip
+import json
+import time
+import threading
+import importlib
+import numpy as np
+import pandas as pd
+from datetime import date, datetime, timezone
+from types import SimpleNamespace
+from alpaca_trade_api.rest import APIError
+
+RECORDING_VERSION = 1
+
+# Calls captured by RecordingAPI; anything else passes straight through
+RECORDED_METHODS = (
+    'get_bars',
+    'get_latest_trade',
+    'get_account',
+    'get_position',
+    'submit_order',
+    'close_position',
+    'list_positions',
+    'list_orders',
+    'get_clock',
+    'get_calendar'
+)
+
+# Arguments that depend on when a call is made rather than what it asks for;
+# replay matches calls without them
+TIME_DEPENDENT_ARGUMENTS = ('start', 'end', 'until', 'after', 'client_order_id')
+
+class ReplayMissError(KeyError):
+    """A call with no recorded response"""
+
+class ReplayedError(Exception):
+    """A recorded non-API exception, raised again on replay"""
+
+def _open(path, mode):
+    if str(path).endswith('.gz'):
+        return gzip.open(path, mode + 't', encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+def _encode_argument(value):
+    """JSON form of a call argument, used to match replayed calls"""
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, (datetime, date, pd.Timestamp)):
+        return value.isoformat()
+    if isinstance(value, (list, tuple)):
+        return [_encode_argument(v) for v in value]
+    if isinstance(value, dict):
+        return {str(k): _encode_argument(v) for k, v in value.items()}
+    # TimeFrame and friends
+    return str(value)
+
+def _encode_frame(frame):
+    return {
+        'columns': [str(c) for c in frame.columns],
+        'index': frame.index.asi8.tolist() if isinstance(frame.index, pd.DatetimeIndex) else frame.index.tolist(),
+        'tz': str(frame.index.tz) if isinstance(frame.index, pd.DatetimeIndex) and frame.index.tz else None,
+        'index_name': frame.index.name,
+        'data': {str(c): frame[c].tolist() for c in frame.columns}
+    }
+
+def _decode_frame(encoded):
+    index = encoded['index']
+    if encoded['tz'] is not None or encoded['index_name'] == 'timestamp':
+        index = pd.DatetimeIndex(np.asarray(index, dtype='datetime64[ns]'))
+        if encoded['tz'] is not None:
+            index = index.tz_localize('UTC').tz_convert(encoded['tz'])
+    frame = pd.DataFrame(encoded['data'], index=index, columns=encoded['columns'])
+    frame.index.name = encoded['index_name']
+    return frame
+
+def encode_response(value):
+    """JSON form of an API response
+
+    Alpaca entities are stored as their class and raw payload, which is
+    exactly what they are rebuilt from. Plain namespaces (e.g. from the
+    benchmark fake) are stored field by field.
+    """
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return {'value': value}
+    if hasattr(value, '_raw'):
+        cls = type(value)
+        return {'entity': f'{cls.__module__}.{cls.__qualname__}', 'raw': value._raw}
+    if isinstance(value, (list, tuple)):
+        return {'list': [encode_response(v) for v in value]}
+    if isinstance(value, pd.DataFrame):
+        return {'frame': _encode_frame(value)}
+    if isinstance(value, SimpleNamespace):
+        return {'namespace': {k: encode_response(v) for k, v in vars(value).items()}}
+    return {'value': _encode_argument(value)}
+
+def decode_response(encoded):
+    """Rebuild a response stored by `encode_response`"""
+    if 'entity' in encoded:
+        module, _, name = encoded['entity'].rpartition('.')
+        if not module.startswith('alpaca_trade_api'):
+            raise ValueError(f"Refusing to rebuild non-Alpaca class {encoded['entity']}")
+        return getattr(importlib.import_module(module), name)(encoded['raw'])
+    if 'list' in encoded:
+        return [decode_response(v) for v in encoded['list']]
+    if 'frame' in encoded:
+        return _decode_frame(encoded['frame'])
+    if 'namespace' in encoded:
+        return SimpleNamespace(**{k: decode_response(v) for k, v in encoded['namespace'].items()})
+    return encoded['value']
+
+def _encode_error(error):
+    if isinstance(error, APIError):
+        return {'api_error': error._error}
+    return {'type': type(error).__name__, 'message': str(error)}
+
+def _decode_error(encoded):
+    if 'api_error' in encoded:
+        return APIError(encoded['api_error'])
+    return ReplayedError(f"{encoded['type']}: {encoded['message']}")
+
+def call_key(method, args, kwargs, ignore=TIME_DEPENDENT_ARGUMENTS):
+    """Canonical key replayed calls are matched on"""
+    kwargs = {k: v for k, v in kwargs.items() if k not in ignore}
+    return json.dumps([method, args, kwargs], sort_keys=True)
+
+class RecordingAPI:
+    """Proxy around a REST client that records its traffic to `path`
+
+    Calls run against the wrapped client as usual; their arguments,
+    start offset, round-trip time and response (or error) are appended to
+    the recording. Safe to use from several threads.
+    """
+
+    def __init__(self, api, path, methods=RECORDED_METHODS):
+        self._api = api
+        self._methods = set(methods)
+        self._lock = threading.Lock()
+        self._seq = 0
+        self._started = time.monotonic()
+        self._file = _open(path, 'w')
+        self._file.write(json.dumps({
+            'version': RECORDING_VERSION,
+            'recorded_at': datetime.now(timezone.utc).isoformat()
+        }) + '\n')
+
+    def __getattr__(self, name):
+        attribute = getattr(self._api, name)
+        if name not in self._methods or not callable(attribute):
+            return attribute
+
+        def recorded(*args, **kwargs):
+            offset = time.monotonic() - self._started
+            entry = {
+                'method': name,
+                'args': _encode_argument(list(args)),
+                'kwargs': _encode_argument(kwargs),
+                'offset': offset
+            }
+            try:
+                result = attribute(*args, **kwargs)
+                entry['result'] = encode_response(result)
+                return result
+            except Exception as e:
+                entry['error'] = _encode_error(e)
+                raise
+            finally:
+                entry['elapsed'] = time.monotonic() - self._started - offset
+                self._write(entry)
+
+        return recorded
+
+    def record(self, method, result, *args, **kwargs):
+        """Record a response obtained outside the proxy (e.g. during login)"""
+        self._write({
+            'method': method,
+            'args': _encode_argument(list(args)),
+            'kwargs': _encode_argument(kwargs),
+            'offset': time.monotonic() - self._started,
+            'elapsed': 0.0,
+            'result': encode_response(result)
+        })
+
+    def _write(self, entry):
+        with self._lock:
+            entry['seq'] = self._seq
+            self._seq += 1
+            self._file.write(json.dumps(entry) + '\n')
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class ReplayAPI:
+    """Drop-in REST client that serves a recording back
+
+    Calls are matched on method and arguments, ignoring time-dependent ones
+    such as `start`; repeated calls get the recorded responses in order and
+    then keep getting the last one, so a session can be replayed any number
+    of times. Unmatched calls raise `ReplayMissError` when `strict`, and
+    otherwise get the next recorded response of the same method.
+
+    Each call sleeps for its recorded round-trip time, or for `latency`
+    seconds when given, divided by `speed`; `speed=None` disables waiting.
+    With `pace` calls also wait for their recorded offset into the session
+    (again divided by `speed`), reproducing a whole session's timeline.
+    """
+
+    def __init__(self, path, latency=None, speed=1.0, pace=False, strict=False,
+                 ignore=TIME_DEPENDENT_ARGUMENTS):
+        self.latency = latency
+        self.speed = speed
+        self.pace = pace
+        self.strict = strict
+        self.ignore = ignore
+        self.entries = []
+        with _open(path, 'r') as f:
+            header = json.loads(f.readline())
+            if header.get('version') != RECORDING_VERSION:
+                raise ValueError(f"Unsupported recording version {header.get('version')}")
+            self.recorded_at = header.get('recorded_at')
+            for line in f:
+                if line.strip():
+                    self.entries.append(json.loads(line))
+        # Responses are served in the order their calls started
+        self.entries.sort(key=lambda entry: (entry['offset'], entry['seq']))
+
+        self._by_key = {}
+        self._by_method = {}
+        for entry in self.entries:
+            key = call_key(entry['method'], entry['args'], entry['kwargs'], ignore)
+            self._by_key.setdefault(key, []).append(entry)
+            self._by_method.setdefault(entry['method'], []).append(entry)
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Rewind to the start of the recording"""
+        with self._lock:
+            self._cursors = {}
+            self._started = None
+            self.calls = 0
+
+    @property
+    def duration(self):
+        """Length of the recorded session in seconds"""
+        if not self.entries:
+            return 0.0
+        return max(entry['offset'] + entry['elapsed'] for entry in self.entries)
+
+    def _next(self, queue_key, queue):
+        """Next entry of a queue; the last one repeats once it runs out"""
+        position = self._cursors.get(queue_key, 0)
+        self._cursors[queue_key] = position + 1
+        return queue[min(position, len(queue) - 1)]
+
+    def _lookup(self, method, args, kwargs):
+        key = call_key(method, _encode_argument(list(args)), _encode_argument(kwargs), self.ignore)
+        with self._lock:
+            if self._started is None:
+                self._started = time.monotonic()
+            self.calls += 1
+            if key in self._by_key:
+                return self._next(('key', key), self._by_key[key])
+            if self.strict or method not in self._by_method:
+                raise ReplayMissError(f"No recorded response for {method}{tuple(args)} {kwargs}")
+            return self._next(('method', method), self._by_method[method])
+
+    def _wait(self, entry):
+        if self.speed is None:
+            return
+        if self.pace:
+            delay = self._started + entry['offset'] / self.speed - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+        latency = entry['elapsed'] if self.latency is None else self.latency
+        if latency > 0:
+            time.sleep(latency / self.speed)
+
+    def _call(self, method, args, kwargs):
+        entry = self._lookup(method, args, kwargs)
+        self._wait(entry)
+        if 'error' in entry:
+            raise _decode_error(entry['error'])
+        return decode_response(entry['result'])
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return lambda *args, **kwargs: self._call(name, args, kwargs)
@@ -0,0 +1,284 @@
+import os
+import logging
+import numpy as np
+import pandas as pd
+
+from utils.timing import span
+
+DEFAULT_CACHE_DIR = '.bar_cache'
+DEFAULT_MAX_BARS = 200000    # History kept per (symbol, timeframe)
+DEFAULT_REVISION_BARS = 3    # Trailing bars re-fetched to pick up late revisions
+# Spare rows allocated whenever a file is (re)written, as a fraction of the
+# bars stored and at least MIN_SPARE_BARS, so later appends write in place
+SPARE_FRACTION = 0.25
+MIN_SPARE_BARS = 1024
+
+BAR_DTYPE = np.dtype([
+    ('timestamp', 'i8'),     # Bar open time, UTC nanoseconds
+    ('open', 'f8'),
+    ('high', 'f8'),
+    ('low', 'f8'),
+    ('close', 'f8'),
+    ('volume', 'f8'),
+    ('trade_count', 'f8'),
+    ('vwap', 'f8')
+])
+BAR_COLUMNS = BAR_DTYPE.names[1:]
+
+# Cache files start with a fixed header; the records follow at HEADER_BYTES
+# and only the first `length` of the file's rows hold bars
+CACHE_MAGIC = b'BARS0001'
+HEADER_DTYPE = np.dtype([('magic', 'S8'), ('length', '<i8')])
+HEADER_BYTES = 64
+
+def _to_utc(timestamp):
+    """Parse a timestamp as UTC, passing None through"""
+    if timestamp is None:
+        return None
+    timestamp = pd.Timestamp(timestamp)
+    if timestamp.tz is None:
+        return timestamp.tz_localize('UTC')
+    return timestamp.tz_convert('UTC')
+
+def empty_bars():
+    """An empty bar frame shaped like `get_bars(...).df`"""
+    index = pd.DatetimeIndex([], tz='UTC', name='timestamp')
+    return pd.DataFrame({column: pd.Series(dtype='f8') for column in BAR_COLUMNS}, index=index)
+
+def split_bars_by_symbol(frame, symbols):
+    """Split a (possibly multi-symbol) `get_bars(...).df` into {symbol: frame}
+
+    Single-symbol responses have no `symbol` column and belong to the only
+    requested symbol. Symbols without any bars get an empty frame.
+    """
+    if 'symbol' not in frame.columns:
+        frames = {symbols[0]: frame} if len(frame) or len(frame.columns) else {}
+    else:
+        frames = {
+            symbol: group.drop(columns='symbol')
+            for symbol, group in frame.groupby('symbol', sort=False)
+        }
+    return {symbol: frames.get(symbol, empty_bars()) for symbol in symbols}
+
+class BarCache:
+    """On-disk bar store keyed by (symbol, timeframe)
+
+    Each key is a single file of bar records, memory-mapped on read, with a
+    header holding how many of its preallocated rows are in use. Fetches
+    only ask the broker for bars newer than the cached tail (plus a few
+    trailing bars, so late revisions overwrite what we stored), and storing
+    them writes just those rows in place; the file is only rewritten when
+    it runs out of spare rows.
+    """
+
+    def __init__(self, root=DEFAULT_CACHE_DIR, max_bars=DEFAULT_MAX_BARS,
+                 revision_bars=DEFAULT_REVISION_BARS):
+        self.root = root
+        self.max_bars = max_bars
+        self.revision_bars = revision_bars
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+    def path(self, symbol, timeframe):
+        """File holding the bars for a symbol and timeframe"""
+        safe_symbol = str(symbol).replace('/', '_')
+        return os.path.join(self.root, safe_symbol, f"{timeframe}.bars")
+
+    def _map(self, symbol, timeframe, mode='r'):
+        """Memory-map a cache file; returns (map, header, all rows), or None if there is none"""
+        path = self.path(symbol, timeframe)
+        if not os.path.exists(path):
+            return None
+        try:
+            raw = np.memmap(path, dtype=np.uint8, mode=mode)
+            header = raw[:HEADER_DTYPE.itemsize].view(HEADER_DTYPE)
+            rows = raw[HEADER_BYTES:].view(BAR_DTYPE)
+            if header['magic'][0] != CACHE_MAGIC or not 0 <= header['length'][0] <= len(rows):
+                raise ValueError("not a bar cache file")
+            return raw, header, rows
+        except Exception as e:
+            self.logger.warning(f"Discarding unreadable bar cache {path}: {str(e)}")
+            return None
+
+    def _read(self, symbol, timeframe):
+        """Memory-map the stored bars, or return an empty array"""
+        mapped = self._map(symbol, timeframe)
+        if mapped is None:
+            return np.empty(0, dtype=BAR_DTYPE)
+        _, header, rows = mapped
+        return rows[:header['length'][0]]
+
+    def _write(self, symbol, timeframe, records):
+        """Atomically replace the stored bars, leaving spare rows to append into"""
+        path = self.path(symbol, timeframe)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        header = np.zeros(1, dtype=HEADER_DTYPE)
+        header['magic'] = CACHE_MAGIC
+        header['length'] = len(records)
+        capacity = len(records) + max(int(len(records) * SPARE_FRACTION), MIN_SPARE_BARS)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(header.tobytes().ljust(HEADER_BYTES, b'\0'))
+            f.write(np.ascontiguousarray(records, dtype=BAR_DTYPE).tobytes())
+            # The spare rows are a sparse zero tail
+            f.truncate(HEADER_BYTES + capacity * BAR_DTYPE.itemsize)
+        os.replace(tmp_path, path)
+
+    def _read_coverage(self, symbol, timeframe):
+        """Earliest start time already requested for this key (UTC ns), or None
+
+        The first stored bar usually comes after the requested start (weekends,
+        overnight gaps), so coverage is tracked separately from the data.
+        """
+        try:
+            with open(self.path(symbol, timeframe) + '.start') as f:
+                return int(f.read().strip())
+        except (OSError, ValueError):
+            return None
+
+    def _write_coverage(self, symbol, timeframe, start_ns):
+        """Record the earliest start time requested for this key"""
+        path = self.path(symbol, timeframe) + '.start'
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            f.write(str(start_ns))
+
+    @staticmethod
+    def to_records(frame):
+        """Convert a bar frame with a timestamp index into cache records"""
+        records = np.empty(len(frame), dtype=BAR_DTYPE)
+        if frame.empty:
+            return records
+        index = pd.DatetimeIndex(frame.index)
+        if index.tz is None:
+            index = index.tz_localize('UTC')
+        records['timestamp'] = index.tz_convert('UTC').asi8
+        for column in BAR_COLUMNS:
+            records[column] = frame[column].to_numpy(dtype='f8') if column in frame.columns else np.nan
+        return records
+
+    @staticmethod
+    def to_frame(records):
+        """Convert cache records into a bar frame like `get_bars(...).df`"""
+        index = pd.DatetimeIndex(pd.to_datetime(np.asarray(records['timestamp']), utc=True), name='timestamp')
+        return pd.DataFrame({column: np.asarray(records[column]) for column in BAR_COLUMNS}, index=index)
+
+    def load(self, symbol, timeframe, start=None):
+        """Load cached bars, optionally only those at or after `start`"""
+        records = self._read(symbol, timeframe)
+        if start is not None and len(records):
+            first = np.searchsorted(records['timestamp'], _to_utc(start).value)
+            records = records[first:]
+        return self.to_frame(records)
+
+    def last_timestamp(self, symbol, timeframe):
+        """Timestamp of the newest cached bar, or None"""
+        records = self._read(symbol, timeframe)
+        if not len(records):
+            return None
+        return pd.Timestamp(int(records['timestamp'][-1]), tz='UTC')
+
+    def store(self, symbol, timeframe, frame):
+        """Merge fresh bars into the cache; fresh bars win on equal timestamps
+
+        Everything from the first fresh bar on is replaced, so revised or
+        withdrawn bars in that range are corrected. The fresh rows are
+        written in place and the stored length updated after them; only
+        when the file is full is it rewritten, keeping the last `max_bars`.
+        """
+        fresh = self.to_records(frame)
+        fresh = fresh[np.argsort(fresh['timestamp'], kind='stable')]
+        mapped = self._map(symbol, timeframe, mode='r+')
+        if mapped is None:
+            raw, header, rows = None, None, np.empty(0, dtype=BAR_DTYPE)
+        else:
+            raw, header, rows = mapped
+        cached = rows[:header['length'][0]] if header is not None else rows
+        if not len(fresh):
+            return cached
+
+        cut = int(np.searchsorted(cached['timestamp'], fresh['timestamp'][0]))
+        length = cut + len(fresh)
+        if header is not None and length <= len(rows):
+            rows[cut:length] = fresh
+            raw.flush()
+            header['length'] = length
+            raw.flush()
+            return rows[:length]
+
+        merged = np.concatenate([cached[:cut], fresh])
+        if len(merged) > self.max_bars:
+            merged = merged[-self.max_bars:]
+            # Trimmed history no longer reaches back to the old coverage start
+            self._write_coverage(symbol, timeframe, int(merged['timestamp'][0]))
+        self._write(symbol, timeframe, merged)
+        return merged
+
+    def _fetch_start(self, cached, coverage, start_ts):
+        """Where a fetch has to start, and whether the cache already covers `start_ts`"""
+        covers_start = len(cached) > 0 and coverage is not None and \
+            (start_ts is None or coverage <= start_ts.value)
+        if covers_start:
+            # Delta fetch: re-request the last few bars to pick up revisions
+            tail = max(len(cached) - self.revision_bars, 0)
+            return covers_start, pd.Timestamp(int(cached['timestamp'][tail]), tz='UTC')
+        return covers_start, start_ts
+
+    def get_bars_multi(self, api, symbols, timeframe, start=None, **kwargs):
+        """Cached, batched drop-in for `api.get_bars(symbols, timeframe, ...)`
+
+        Symbols the cache already covers share one delta request from the
+        earliest of their cached tails; the rest share one request for the
+        full range, so a new symbol never turns the others' deltas into a
+        full fetch. Returns {symbol: frame} with every cached bar at or
+        after `start`.
+        """
+        symbols = list(symbols)
+        start_ts = _to_utc(start)
+
+        plans = {}
+        for symbol in symbols:
+            cached = self._read(symbol, timeframe)
+            plans[symbol] = self._fetch_start(cached, self._read_coverage(symbol, timeframe), start_ts)
+
+        groups = {}
+        for symbol in symbols:
+            groups.setdefault(plans[symbol][0], []).append(symbol)
+
+        fresh = {}
+        for covers_start, group in groups.items():
+            fetch_starts = [plans[symbol][1] for symbol in group]
+            fetch_kwargs = dict(kwargs)
+            if covers_start:
+                fetch_kwargs.pop('limit', None)
+            if None not in fetch_starts:
+                fetch_kwargs['start'] = min(fetch_starts).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+            request_symbols = group[0] if len(group) == 1 else group
+            with span('get_bars', group[0] if len(group) == 1 else None):
+                bars = api.get_bars(request_symbols, timeframe, **fetch_kwargs).df
+            fresh.update(split_bars_by_symbol(bars, group))
+
+        frames = {}
+        for symbol in symbols:
+            covers_start, _ = plans[symbol]
+            if covers_start:
+                self.logger.debug(f"Bar cache hit for {symbol} {timeframe}: {len(fresh[symbol])} new/revised bars")
+
+            merged = self.store(symbol, timeframe, fresh[symbol])
+            if not covers_start and start_ts is not None:
+                coverage = start_ts.value
+                if len(merged) >= self.max_bars:
+                    coverage = max(coverage, int(merged['timestamp'][0]))
+                self._write_coverage(symbol, timeframe, coverage)
+            if start_ts is not None:
+                merged = merged[np.searchsorted(merged['timestamp'], start_ts.value):]
+            frames[symbol] = self.to_frame(merged)
+        return frames
+
+    def get_bars(self, api, symbol, timeframe, start=None, **kwargs):
+        """Cached drop-in for `api.get_bars(symbol, timeframe, ...).df`
+
+        Returns every cached bar at or after `start`, requesting only the
+        bars the cache does not have yet.
+        """
+        return self.get_bars_multi(api, [symbol], timeframe, start, **kwargs)[symbol]
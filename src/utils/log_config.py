@@ -0,0 +1,182 @@
+"""
+Non-blocking logging for the trading loop.
+
+`setup_logging` puts a single `QueueHandler` on the root logger. Records
+are handed to a background `QueueListener` as they are, unformatted: the
+%-style message arguments, the JSON encoding of structured fields and all
+file and console I/O happen on the listener thread, not on the decision
+path.
+
+Worker processes log through `setup_worker_logging`, which sends their
+records over a multiprocessing queue to the parent, where
+`forward_worker_logs` hands them to the same handlers.
+
+Structured fields are attached with `extra={'fields': {...}}`. Records
+also marked `'diagnostic': True` (per-symbol, per-cycle detail) pass a
+`SamplingFilter` before they are queued, so at hundreds of symbols they
+can be thinned to every Nth and/or capped per second.
+"""
+import sys
+import json
+import time
+import queue
+import atexit
+import logging
+import threading
+import logging.handlers
+from datetime import datetime, timezone
+
+DEFAULT_LOG_FILE = 'trading_bot.log'
+DEFAULT_JSON_LOG_FILE = 'trading_bot.jsonl'
+TEXT_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+_listener = None
+
+def _json_default(value):
+    # numpy scalars and anything else json can't encode natively
+    if hasattr(value, 'item'):
+        return value.item()
+    return str(value)
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record: time, level, logger, message and its fields"""
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage()
+        }
+        fields = getattr(record, 'fields', None)
+        if fields:
+            entry.update(fields)
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=_json_default)
+
+class SamplingFilter(logging.Filter):
+    """Thin out diagnostic records; everything else passes
+
+    Diagnostic records are counted per (logger, message template): every
+    `every`-th one passes, and with `max_per_second` at most that many per
+    second (token bucket). `dropped` counts what was filtered out.
+    """
+
+    def __init__(self, every=1, max_per_second=None):
+        super().__init__()
+        self.every = max(int(every), 1)
+        self.max_per_second = max_per_second
+        self.dropped = 0
+        self._counts = {}
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def _allow_rate(self, key, now):
+        tokens, updated = self._buckets.get(key, (self.max_per_second, now))
+        tokens = min(self.max_per_second, tokens + (now - updated) * self.max_per_second)
+        if tokens < 1:
+            self._buckets[key] = (tokens, now)
+            return False
+        self._buckets[key] = (tokens - 1, now)
+        return True
+
+    def filter(self, record):
+        if not getattr(record, 'diagnostic', False):
+            return True
+        key = (record.name, record.msg)
+        with self._lock:
+            count = self._counts.get(key, 0)
+            self._counts[key] = count + 1
+            allowed = count % self.every == 0
+            if allowed and self.max_per_second is not None:
+                allowed = self._allow_rate(key, time.monotonic())
+            if not allowed:
+                self.dropped += 1
+        return allowed
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that leaves formatting to the listener
+
+    The stock `prepare` renders the message on the calling thread so the
+    record can be pickled; our queue is in-process, so the record is queued
+    untouched and formatted by the listener's handlers instead.
+    """
+
+    def prepare(self, record):
+        return record
+
+def setup_logging(level=logging.INFO, log_file=DEFAULT_LOG_FILE, json_file=None,
+                  console=True, sample_every=1, max_per_second=None):
+    """Route all logging through a background queue listener
+
+    Writes the usual text log to `log_file` and the console, plus JSON lines
+    to `json_file` when given. Safe to call more than once: later calls
+    replace the previous configuration. The queue is flushed at exit.
+    """
+    global _listener
+    stop_logging()
+
+    handlers = []
+    text = logging.Formatter(TEXT_FORMAT)
+    if log_file:
+        handlers.append(logging.FileHandler(log_file))
+    if console:
+        handlers.append(logging.StreamHandler(sys.stdout))
+    for handler in handlers:
+        handler.setFormatter(text)
+    if json_file:
+        json_handler = logging.FileHandler(json_file)
+        json_handler.setFormatter(JsonFormatter())
+        handlers.append(json_handler)
+
+    records = queue.SimpleQueue()
+    queue_handler = DeferredQueueHandler(records)
+    queue_handler.addFilter(SamplingFilter(sample_every, max_per_second))
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+        handler.close()
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+
+    _listener = logging.handlers.QueueListener(records, *handlers)
+    _listener.start()
+    return _listener
+
+def stop_logging():
+    """Drain the queue and close the handlers"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+class _Forward:
+    """Listener target that passes worker records to the parent's own loggers"""
+
+    def handle(self, record):
+        logging.getLogger(record.name).handle(record)
+
+def setup_worker_logging(records, level=logging.INFO):
+    """Send a worker process's records to the parent over the `records` queue
+
+    Messages are rendered in the worker (the stock `QueueHandler` does so
+    before pickling); structured fields and the diagnostic flag travel with
+    the record, so sampling still applies in the parent.
+    """
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(logging.handlers.QueueHandler(records))
+    root.setLevel(level)
+
+def forward_worker_logs(records):
+    """Start a thread writing the records of `setup_worker_logging` workers; stop it when they are done"""
+    listener = logging.handlers.QueueListener(records, _Forward())
+    listener.start()
+    return listener
+
+atexit.register(stop_logging)
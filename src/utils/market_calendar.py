@@ -0,0 +1,286 @@
+"""
+Exchange calendar: trading sessions with holidays and early closes.
+
+The calendar is fetched through the Alpaca `get_calendar` endpoint once
+and cached as JSON next to the bar cache. It is re-fetched only when it is
+about to run out. Without a cached copy (or offline) the NYSE holiday and
+early-close rules are used instead. Lookups are dictionary and array
+indexing on the exchange date, so checking whether the market is open
+costs microseconds and no network. Standard library only, so the
+market-closed path of `main` stays light.
+"""
+import os
+import json
+import logging
+from datetime import date, datetime, time, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+EXCHANGE_TZ = ZoneInfo('America/New_York')
+REGULAR_OPEN = time(9, 30)
+REGULAR_CLOSE = time(16, 0)
+EARLY_CLOSE = time(13, 0)
+
+CALENDAR_VERSION = 1
+CALENDAR_FILE = 'calendar.json'
+# Same directory as the bar cache, so CI persists both together
+DEFAULT_CALENDAR_DIR = '.bar_cache'
+
+# Days of sessions requested around today, and how close to the end of the
+# cached range a calendar is re-fetched
+FETCH_PAST_DAYS = 7
+FETCH_AHEAD_DAYS = 366
+REFRESH_MARGIN_DAYS = 30
+
+_default = None
+
+def calendar_path():
+    return os.path.join(os.getenv('BAR_CACHE_DIR', DEFAULT_CALENDAR_DIR), CALENDAR_FILE)
+
+def _parse_time(value):
+    if isinstance(value, time):
+        return value
+    value = str(value)
+    return time(int(value[:2]), int(value[-2:]))
+
+def _easter(year):
+    """Gregorian Easter Sunday (anonymous algorithm)"""
+    a, b, c = year % 19, year // 100, year % 100
+    d, e = b // 4, b % 4
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = c // 4, c % 4
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month = (h + l - 7 * m + 114) // 31
+    return date(year, month, (h + l - 7 * m + 114) % 31 + 1)
+
+def _nth_weekday(year, month, weekday, n):
+    """n-th `weekday` (0 = Monday) of a month; n = -1 for the last one"""
+    if n > 0:
+        first = date(year, month, 1)
+        return first + timedelta(days=(weekday - first.weekday()) % 7 + 7 * (n - 1))
+    last = date(year + month // 12, month % 12 + 1, 1) - timedelta(days=1)
+    return last - timedelta(days=(last.weekday() - weekday) % 7)
+
+def _observed(day):
+    """Saturday holidays move to Friday, Sunday ones to Monday"""
+    if day.weekday() == 5:
+        return day - timedelta(days=1)
+    if day.weekday() == 6:
+        return day + timedelta(days=1)
+    return day
+
+def nyse_holidays(year):
+    """Full-day NYSE closures of a year under the standard rules"""
+    holidays = {
+        _nth_weekday(year, 1, 0, 3),         # Martin Luther King Jr. Day
+        _nth_weekday(year, 2, 0, 3),         # Washington's Birthday
+        _easter(year) - timedelta(days=2),   # Good Friday
+        _nth_weekday(year, 5, 0, -1),        # Memorial Day
+        _observed(date(year, 7, 4)),         # Independence Day
+        _nth_weekday(year, 9, 0, 1),         # Labor Day
+        _nth_weekday(year, 11, 3, 4),        # Thanksgiving
+        _observed(date(year, 12, 25))        # Christmas
+    }
+    # New Year's Day is not moved back into the previous year
+    if date(year, 1, 1).weekday() != 5:
+        holidays.add(_observed(date(year, 1, 1)))
+    if year >= 2022:
+        holidays.add(_observed(date(year, 6, 19)))  # Juneteenth
+    return holidays
+
+def nyse_early_closes(year):
+    """1 PM closes: July 3, the day after Thanksgiving and Christmas Eve, on trading weekdays"""
+    closes = {_nth_weekday(year, 11, 3, 4) + timedelta(days=1)}
+    for day in (date(year, 7, 3), date(year, 12, 24)):
+        # Mon-Thu only: on a Friday it is either the observed holiday or a normal day
+        if day.weekday() < 4:
+            closes.add(day)
+    return closes - nyse_holidays(year)
+
+class MarketCalendar:
+    """Trading sessions over a contiguous range of dates
+
+    `sessions` holds (date, open, close) in exchange local time. Days in
+    range without a session are closed. Queries outside the range raise
+    ValueError.
+    """
+
+    def __init__(self, sessions, start, end, source='rules', fetched_at=None):
+        self.start = start
+        self.end = end
+        self.source = source
+        self.fetched_at = fetched_at
+        self._first = start.toordinal()
+        self._sessions = {}
+        for day, open_time, close_time in sessions:
+            if start <= day <= end:
+                self._sessions[day.toordinal()] = (
+                    datetime.combine(day, _parse_time(open_time), EXCHANGE_TZ),
+                    datetime.combine(day, _parse_time(close_time), EXCHANGE_TZ)
+                )
+        # _next[i]: first session strictly after day first + i (None past the end)
+        self._next = [None] * (end.toordinal() - self._first + 1)
+        following = None
+        for i in range(len(self._next) - 1, -1, -1):
+            self._next[i] = following
+            if self._first + i in self._sessions:
+                following = self._sessions[self._first + i]
+
+    @classmethod
+    def from_rules(cls, start, end):
+        """Weekdays minus NYSE holidays, with early closes"""
+        holidays, early = set(), set()
+        for year in range(start.year, end.year + 1):
+            holidays |= nyse_holidays(year)
+            early |= nyse_early_closes(year)
+        sessions = []
+        day = start
+        while day <= end:
+            if day.weekday() < 5 and day not in holidays:
+                sessions.append((day, REGULAR_OPEN, EARLY_CLOSE if day in early else REGULAR_CLOSE))
+            day += timedelta(days=1)
+        return cls(sessions, start, end, source='rules')
+
+    @classmethod
+    def from_api(cls, api, start, end):
+        """Fetch sessions with one `get_calendar` request"""
+        sessions = []
+        for entry in api.get_calendar(start=start.isoformat(), end=end.isoformat()):
+            raw = entry if isinstance(entry, dict) else getattr(entry, '_raw', None) or vars(entry)
+            sessions.append((date.fromisoformat(str(raw['date'])[:10]), raw['open'], raw['close']))
+        return cls(sessions, start, end, source='api', fetched_at=datetime.now(timezone.utc).isoformat())
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp = f'{path}.tmp'
+        with open(tmp, 'w') as f:
+            json.dump({
+                'version': CALENDAR_VERSION,
+                'source': self.source,
+                'fetched_at': self.fetched_at,
+                'start': self.start.isoformat(),
+                'end': self.end.isoformat(),
+                'sessions': [
+                    [open_at.date().isoformat(), open_at.strftime('%H:%M'), close_at.strftime('%H:%M')]
+                    for open_at, close_at in (self._sessions[key] for key in sorted(self._sessions))
+                ]
+            }, f)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            stored = json.load(f)
+        if stored.get('version') != CALENDAR_VERSION:
+            raise ValueError(f"Unsupported calendar version {stored.get('version')}")
+        return cls(
+            [(date.fromisoformat(day), open_time, close_time) for day, open_time, close_time in stored['sessions']],
+            date.fromisoformat(stored['start']),
+            date.fromisoformat(stored['end']),
+            source=stored['source'],
+            fetched_at=stored['fetched_at']
+        )
+
+    def covers(self, day):
+        return self.start <= day <= self.end
+
+    def _index(self, day):
+        if not self.covers(day):
+            raise ValueError(f"{day} is outside the calendar ({self.start} to {self.end})")
+        return day.toordinal() - self._first
+
+    @staticmethod
+    def _now(now):
+        return datetime.now(EXCHANGE_TZ) if now is None else now.astimezone(EXCHANGE_TZ)
+
+    def session(self, day):
+        """(open, close) of a date's session in exchange time, or None if closed"""
+        self._index(day)
+        return self._sessions.get(day.toordinal())
+
+    def is_trading_day(self, day):
+        return self.session(day) is not None
+
+    def is_open(self, now=None):
+        """Whether the regular session is in progress (`now` defaults to the current time)"""
+        now = self._now(now)
+        session = self.session(now.date())
+        return session is not None and session[0] <= now < session[1]
+
+    def next_session(self, now=None):
+        """(open, close) of the session in progress or the next one; None past the end"""
+        now = self._now(now)
+        today = now.date()
+        session = self._sessions.get(today.toordinal())
+        if session is not None and now < session[1]:
+            return session
+        return self._next[self._index(today)]
+
+    def next_open(self, now=None):
+        """Next session open after `now` (None if it is beyond the calendar)"""
+        now = self._now(now)
+        session = self.next_session(now)
+        if session is not None and session[0] <= now:
+            session = self._next[self._index(now.date())]
+        return None if session is None else session[0]
+
+    def next_close(self, now=None):
+        session = self.next_session(now)
+        return None if session is None else session[1]
+
+def _rules_around(today):
+    return MarketCalendar.from_rules(date(today.year - 1, 1, 1), date(today.year + 1, 12, 31))
+
+def load_calendar(path=None, today=None):
+    """The cached calendar if it covers today, otherwise the rule-based one (no network)"""
+    path = path or calendar_path()
+    today = today or datetime.now(EXCHANGE_TZ).date()
+    try:
+        calendar = MarketCalendar.load(path)
+        if calendar.covers(today):
+            return calendar
+    except (OSError, ValueError, KeyError) as e:
+        if not isinstance(e, FileNotFoundError):
+            logging.warning(f"Ignoring unreadable market calendar {path}: {e}")
+    return _rules_around(today)
+
+def refresh_calendar(api, path=None, today=None):
+    """The exchange calendar, re-fetched through `get_calendar` only when needed
+
+    A cached API calendar is reused while it reaches at least
+    `REFRESH_MARGIN_DAYS` past today; otherwise one request fetches the
+    next `FETCH_AHEAD_DAYS` and the result is saved to `path`. If the
+    request fails the cached or rule-based calendar is returned.
+    """
+    path = path or calendar_path()
+    today = today or datetime.now(EXCHANGE_TZ).date()
+    calendar = load_calendar(path, today)
+    if calendar.source == 'api' and calendar.covers(today + timedelta(days=REFRESH_MARGIN_DAYS)):
+        return calendar
+    try:
+        calendar = MarketCalendar.from_api(
+            api, today - timedelta(days=FETCH_PAST_DAYS), today + timedelta(days=FETCH_AHEAD_DAYS)
+        )
+        calendar.save(path)
+        logging.info(f"Cached market calendar through {calendar.end} in {path}")
+    except Exception as e:
+        logging.error(f"Error fetching market calendar: {str(e)}")
+    return calendar
+
+def default_calendar():
+    """Process-wide calendar, loaded from disk on first use and when the date moves past it"""
+    global _default
+    today = datetime.now(EXCHANGE_TZ).date()
+    if _default is None or not _default.covers(today):
+        _default = load_calendar(today=today)
+    return _default
+
+def set_default_calendar(calendar):
+    global _default
+    _default = calendar
+
+def is_market_open(now=None):
+    """Check if the regular session is in progress, holidays and early closes included"""
+    return default_calendar().is_open(now)
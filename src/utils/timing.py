@@ -0,0 +1,214 @@
+"""
+Per-stage latency instrumentation for the trading cycle.
+
+Hot-path stages are wrapped in `span(stage, symbol)`. While timing is
+disabled (the default) that returns a shared no-op context manager, so
+instrumented code pays one attribute check. Once `TIMINGS.enabled` is set,
+every span records its wall time in a log-linear histogram per
+(stage, symbol), from which p50/p95/p99 are read. Results are exported
+as a Prometheus textfile (".prom") or appended as JSON lines.
+"""
+import os
+import json
+import time
+import threading
+import contextlib
+from datetime import datetime, timezone
+
+# Sub-buckets per power of two; bucket midpoints are within 1/16 (6.25%) of any value in them
+SUB_BUCKET_BITS = 3
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+DEFAULT_TIMINGS_PATH = 'trading_timings.jsonl'
+
+_NULL_SPAN = contextlib.nullcontext()
+
+def _bucket(ns):
+    """Histogram bucket of a duration in nanoseconds"""
+    if ns < 2 * SUB_BUCKETS:
+        return max(ns, 0)
+    shift = ns.bit_length() - SUB_BUCKET_BITS - 1
+    return (shift + 1) * SUB_BUCKETS + (ns >> shift) - SUB_BUCKETS
+
+def _bucket_bounds(bucket):
+    """[low, high) nanoseconds covered by a bucket"""
+    if bucket < 2 * SUB_BUCKETS:
+        return bucket, bucket + 1
+    shift = bucket // SUB_BUCKETS - 1
+    low = (bucket % SUB_BUCKETS + SUB_BUCKETS) << shift
+    return low, low + (1 << shift)
+
+class Histogram:
+    """Log-linear latency histogram with sparse integer buckets"""
+
+    __slots__ = ('counts', 'count', 'total', 'min', 'max')
+
+    def __init__(self):
+        self.counts = {}
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = 0
+
+    def add(self, ns):
+        bucket = _bucket(ns)
+        self.counts[bucket] = self.counts.get(bucket, 0) + 1
+        self.count += 1
+        self.total += ns
+        if self.min is None or ns < self.min:
+            self.min = ns
+        if ns > self.max:
+            self.max = ns
+
+    def merge(self, other):
+        for bucket, count in other.counts.items():
+            self.counts[bucket] = self.counts.get(bucket, 0) + count
+        self.count += other.count
+        self.total += other.total
+        if other.min is not None and (self.min is None or other.min < self.min):
+            self.min = other.min
+        self.max = max(self.max, other.max)
+
+    def quantile(self, q):
+        """Approximate `q` quantile in nanoseconds (bucket midpoint, clamped to min/max)"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bucket in sorted(self.counts):
+            seen += self.counts[bucket]
+            if seen >= rank:
+                low, high = _bucket_bounds(bucket)
+                return min(max((low + high) / 2, self.min), self.max)
+        return self.max
+
+    def summary(self):
+        """Count and latencies in milliseconds"""
+        stats = {'count': self.count}
+        if self.count:
+            stats['mean_ms'] = self.total / self.count / 1e6
+            for q in QUANTILES:
+                stats[f'p{round(q * 100)}_ms'] = self.quantile(q) / 1e6
+            stats['max_ms'] = self.max / 1e6
+        return stats
+
+class _Span:
+    __slots__ = ('timings', 'stage', 'symbol', 'started')
+
+    def __init__(self, timings, stage, symbol):
+        self.timings = timings
+        self.stage = stage
+        self.symbol = symbol
+
+    def __enter__(self):
+        self.started = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        self.timings.record_ns(self.stage, time.perf_counter_ns() - self.started, self.symbol)
+
+def _labels(**labels):
+    return ','.join(f'{name}="{value}"' for name, value in labels.items())
+
+class Timings:
+    """Registry of per-(stage, symbol) latency histograms; safe to use from several threads"""
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def span(self, stage, symbol=None):
+        """Context manager timing one execution of `stage`"""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, stage, symbol)
+
+    def record_ns(self, stage, ns, symbol=None):
+        if not self.enabled:
+            return
+        key = (stage, symbol)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.add(ns)
+
+    def record(self, stage, seconds, symbol=None):
+        """Record a duration measured elsewhere (e.g. an order's ack latency)"""
+        self.record_ns(stage, int(seconds * 1e9), symbol)
+
+    def reset(self):
+        with self._lock:
+            self._histograms = {}
+
+    def _snapshot(self):
+        """(per stage, per (stage, symbol)) histograms, merged under the lock"""
+        stages = {}
+        symbols = {}
+        with self._lock:
+            for (stage, symbol), histogram in self._histograms.items():
+                stages.setdefault(stage, Histogram()).merge(histogram)
+                if symbol is not None:
+                    symbols[(stage, symbol)] = Histogram()
+                    symbols[(stage, symbol)].merge(histogram)
+        return stages, symbols
+
+    def summary(self, by_symbol=True):
+        """One row per stage (symbol None) and, with `by_symbol`, per stage and symbol"""
+        stages, symbols = self._snapshot()
+        rows = [{'stage': stage, 'symbol': None, **stages[stage].summary()} for stage in sorted(stages)]
+        if by_symbol:
+            rows += [
+                {'stage': stage, 'symbol': symbol, **symbols[(stage, symbol)].summary()}
+                for stage, symbol in sorted(symbols)
+            ]
+        return rows
+
+    def write_prometheus(self, path):
+        """Write a node_exporter textfile; replaced atomically so scrapes never see half a file"""
+        stages, symbols = self._snapshot()
+        lines = []
+        for metric, histograms, help_text in (
+            ('trading_stage_seconds', {(stage,): h for stage, h in stages.items()},
+             'Time spent in each trading cycle stage'),
+            ('trading_stage_symbol_seconds', symbols,
+             'Time spent in each trading cycle stage, per symbol')
+        ):
+            lines += [f'# HELP {metric} {help_text}', f'# TYPE {metric} summary']
+            for key in sorted(histograms):
+                histogram = histograms[key]
+                labels = _labels(stage=key[0]) if len(key) == 1 else _labels(stage=key[0], symbol=key[1])
+                for q in QUANTILES:
+                    lines.append(f'{metric}{{{labels},quantile="{q}"}} {histogram.quantile(q) / 1e9:.9f}')
+                lines.append(f'{metric}_sum{{{labels}}} {histogram.total / 1e9:.9f}')
+                lines.append(f'{metric}_count{{{labels}}} {histogram.count}')
+        tmp = f'{path}.tmp'
+        with open(tmp, 'w') as f:
+            f.write('\n'.join(lines) + '\n')
+        os.replace(tmp, path)
+
+    def append_jsonl(self, path):
+        """Append the current summary, one JSON object per row"""
+        timestamp = datetime.now(timezone.utc).isoformat()
+        with open(path, 'a') as f:
+            for row in self.summary():
+                f.write(json.dumps({'timestamp': timestamp, **row}) + '\n')
+
+    def export(self, path):
+        """Prometheus textfile for a ".prom" path, JSON lines otherwise"""
+        if str(path).endswith('.prom'):
+            self.write_prometheus(path)
+        else:
+            self.append_jsonl(path)
+
+# Process-wide registry the instrumented code records into
+TIMINGS = Timings()
+
+def span(stage, symbol=None):
+    """Time a stage in the process-wide registry (a no-op while it is disabled)"""
+    if not TIMINGS.enabled:
+        return _NULL_SPAN
+    return _Span(TIMINGS, stage, symbol)
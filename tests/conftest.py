@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Modules import each other from the src directory, as the entry points run them
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
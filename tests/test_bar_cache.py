@@ -0,0 +1,74 @@
+"""Bar cache storage and delta fetches"""
+import os
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+
+from utils.bar_cache import BarCache
+
+def minute_bars(start, n, close=100.0):
+    index = pd.date_range(pd.Timestamp(start, tz='UTC'), periods=n, freq='1min', name='timestamp')
+    values = np.full(n, close)
+    return pd.DataFrame({'open': values, 'high': values, 'low': values, 'close': values,
+                         'volume': values, 'trade_count': values, 'vwap': values}, index=index)
+
+def test_store_appends_in_place(tmp_path):
+    cache = BarCache(str(tmp_path))
+    cache.store('AAA', '1Min', minute_bars('2024-01-02 15:00', 500))
+    path = cache.path('AAA', '1Min')
+    before = os.stat(path)
+
+    # Two new bars, one revised bar before them
+    cache.store('AAA', '1Min', minute_bars('2024-01-02 23:19', 3, close=101.0))
+    after = os.stat(path)
+    assert (after.st_ino, after.st_size) == (before.st_ino, before.st_size)
+
+    bars = cache.load('AAA', '1Min')
+    assert len(bars) == 502
+    assert (bars['close'].iloc[:499] == 100.0).all() and (bars['close'].iloc[499:] == 101.0).all()
+
+def test_store_replaces_withdrawn_bars(tmp_path):
+    cache = BarCache(str(tmp_path))
+    cache.store('AAA', '1Min', minute_bars('2024-01-02 15:00', 10))
+    fresh = minute_bars('2024-01-02 15:05', 5, close=99.0).iloc[[0, 2, 4]]
+    cache.store('AAA', '1Min', fresh)
+    bars = cache.load('AAA', '1Min')
+    assert list(bars.index) == list(minute_bars('2024-01-02 15:00', 5).index) + list(fresh.index)
+    assert (bars['close'].iloc[5:] == 99.0).all()
+
+def test_full_file_is_rewritten_with_the_latest_bars(tmp_path):
+    cache = BarCache(str(tmp_path), max_bars=1500)
+    cache.store('AAA', '1Min', minute_bars('2024-01-02 15:00', 1000))
+    for offset in range(1000, 3000, 250):
+        cache.store('AAA', '1Min', minute_bars(pd.Timestamp('2024-01-02 15:00') + pd.Timedelta(minutes=offset), 250))
+    bars = cache.load('AAA', '1Min')
+    assert len(bars) <= 1500 + 1024
+    assert bars.index[-1] == pd.Timestamp('2024-01-02 15:00', tz='UTC') + pd.Timedelta(minutes=2999)
+    assert bars.index.is_monotonic_increasing and bars.index.is_unique
+
+class BarsAPI:
+    def __init__(self, bars):
+        self.bars = bars
+        self.requests = []
+
+    def get_bars(self, symbols, timeframe, start=None, **kwargs):
+        symbols = [symbols] if isinstance(symbols, str) else symbols
+        self.requests.append((tuple(symbols), start))
+        start = pd.Timestamp(start) if start else None
+        frames = [frame[frame.index >= start].assign(symbol=symbol) if start is not None else frame.assign(symbol=symbol)
+                  for symbol, frame in self.bars.items() if symbol in symbols]
+        return SimpleNamespace(df=pd.concat(frames))
+
+def test_new_symbol_does_not_widen_the_delta(tmp_path):
+    cache = BarCache(str(tmp_path))
+    history = minute_bars('2024-01-02 15:00', 600)
+    api = BarsAPI({'AAA': history, 'BBB': history})
+    start = '2024-01-02T15:00:00Z'
+    cache.get_bars_multi(api, ['AAA'], '1Min', start=start)
+
+    api.requests.clear()
+    frames = cache.get_bars_multi(api, ['AAA', 'BBB'], '1Min', start=start)
+    tail = history.index[-cache.revision_bars].strftime('%Y-%m-%dT%H:%M:%SZ')
+    assert sorted(api.requests) == [(('AAA',), tail), (('BBB',), start)]
+    assert len(frames['AAA']) == len(frames['BBB']) == 600
@@ -0,0 +1,71 @@
+"""Stream minutes keep the daemon's daily bar current, as `daily_bars` builds it"""
+import numpy as np
+import pandas as pd
+
+from analysis.bar_store import BarStore
+from analysis.market_analysis import daily_bars
+
+COLUMNS = ['open', 'high', 'low', 'close', 'volume', 'trade_count', 'vwap']
+
+def minute_bars(start, end, seed):
+    """Random-walk minute bars from `start` to `end`, exchange time, around the clock"""
+    rng = np.random.default_rng(seed)
+    index = pd.date_range(start, end, freq='1min', tz='America/New_York').tz_convert('UTC')
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.001, len(index))))
+    return pd.DataFrame({
+        'open': close * (1 + rng.normal(0, 0.0005, len(index))),
+        'high': close * 1.001,
+        'low': close * 0.999,
+        'close': close,
+        'volume': rng.integers(0, 1000, len(index)).astype(float),
+        'trade_count': rng.integers(1, 50, len(index)).astype(float),
+        'vwap': close
+    }, index=index)
+
+def stream(store, symbol, bars):
+    for timestamp, row in bars.iterrows():
+        store.append_minute(symbol, timestamp.value, row.to_dict())
+
+def assert_last_day(store, symbol, expected):
+    window = store._ring(symbol, '1d').window()
+    for column in COLUMNS:
+        assert np.isclose(window[column][-1], expected[column].iloc[-1]), column
+
+def test_stream_minutes_update_the_daily_bar():
+    history = minute_bars('2024-03-04 09:30', '2024-03-04 15:59', seed=1)
+    today = minute_bars('2024-03-05 08:00', '2024-03-05 16:30', seed=2)
+    store = BarStore(['AAA'], ['1m', '5m', '1h', '1d'], bars=50)
+    store.load({('AAA', 'minute'): history, ('AAA', '1d'): daily_bars(history)})
+    assert len(store._ring('AAA', '1d')) == 1
+
+    session = today.between_time('14:30', '20:59')
+    for i in range(0, len(today), 37):
+        stream(store, 'AAA', today.iloc[i:i + 37])
+        seen = session[session.index <= today.index[min(i + 36, len(today) - 1)]]
+        if len(seen):
+            assert_last_day(store, 'AAA', daily_bars(seen))
+    assert len(store._ring('AAA', '1d')) == 2
+    assert store._ring('AAA', '1d').last_timestamp == daily_bars(session).index[-1].value
+
+    # A revised minute is folded in once, replacing the original
+    revision = session.iloc[[-1]].copy()
+    revision[['close', 'volume']] = [90.0, 5000.0]
+    stream(store, 'AAA', revision)
+    assert_last_day(store, 'AAA', daily_bars(pd.concat([session.iloc[:-1], revision])))
+    # The day's indicators are recomputed over the current bar
+    assert store.market_data('AAA')['1d']['close'][-1] == 90.0
+
+def test_backfilled_day_is_revised_under_its_label():
+    minutes = minute_bars('2024-03-05 09:30', '2024-03-05 11:59', seed=3)
+    # A REST daily bar for today, labelled at midnight UTC
+    backfilled = daily_bars(minutes.iloc[:60])
+    backfilled.index = pd.DatetimeIndex([pd.Timestamp('2024-03-05', tz='UTC')])
+    store = BarStore(['AAA'], ['5m', '1d'], bars=50)
+    store.load({('AAA', 'minute'): minutes.iloc[:120], ('AAA', '1d'): backfilled})
+    assert_last_day(store, 'AAA', daily_bars(minutes.iloc[:120]))
+
+    stream(store, 'AAA', minutes.iloc[120:])
+    daily = store._ring('AAA', '1d')
+    assert len(daily) == 1
+    assert daily.last_timestamp == backfilled.index[-1].value
+    assert_last_day(store, 'AAA', daily_bars(minutes))
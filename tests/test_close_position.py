@@ -0,0 +1,53 @@
+"""Positions are closed in one broker request and only reported closed once accepted"""
+import logging
+from types import SimpleNamespace
+
+from alpaca_trade_api.entity import Position
+
+from execution.order_pipeline import OrderPipeline
+from strategies.snapshot import MarketSnapshot
+from strategies.trend_following import TrendFollowingStrategy
+
+class Broker:
+    def __init__(self, reject=False):
+        self.reject = reject
+        self.calls = []
+
+    def close_position(self, symbol):
+        self.calls.append(('close_position', symbol))
+        if self.reject:
+            raise RuntimeError('insufficient qty available')
+        return SimpleNamespace(id='1', symbol=symbol, side='sell', status='accepted')
+
+    def cancel_order(self, order_id):
+        self.calls.append(('cancel_order', order_id))
+
+def strategy(api, orders=None):
+    position = Position({'symbol': 'AAA', 'qty': '10', 'avg_entry_price': '5'})
+    leg = SimpleNamespace(id='leg', symbol='AAA', order_class='bracket')
+    snapshot = MarketSnapshot('AAA', {}, SimpleNamespace(equity='100000'), {'AAA': position}, 5.0, None, (leg,))
+    return TrendFollowingStrategy(api, snapshot, orders)
+
+def closes(caplog):
+    return [r for r in caplog.records if r.getMessage().startswith('Position closed')]
+
+def test_close_is_one_request(caplog):
+    api = Broker()
+    with caplog.at_level(logging.INFO):
+        assert strategy(api).close_position() is not None
+    assert api.calls == [('close_position', 'AAA')]
+    assert len(closes(caplog)) == 1
+
+def test_rejected_close_is_not_reported(caplog):
+    with caplog.at_level(logging.INFO):
+        assert strategy(Broker(reject=True)).close_position() is None
+    assert not closes(caplog)
+
+def test_queued_close_is_reported_once_accepted(caplog):
+    for reject, expected in ((False, 1), (True, 0)):
+        caplog.clear()
+        api = Broker(reject)
+        with caplog.at_level(logging.INFO), OrderPipeline(api) as orders:
+            future = strategy(api, orders).close_position()
+        assert future.result().ok is not reject
+        assert len(closes(caplog)) == expected
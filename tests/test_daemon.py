@@ -0,0 +1,53 @@
+"""Stream bars are queued while a trading cycle runs, then processed together"""
+import asyncio
+import threading
+
+import pandas as pd
+
+import daemon
+from daemon import TradingDaemon
+
+TIMEFRAMES = {'1m': None, '5m': None, '15m': None, '1h': None, '1d': None}
+
+def bar(symbol, minute, close):
+    timestamp = pd.Timestamp('2024-03-05 14:30', tz='UTC') + pd.Timedelta(minutes=minute)
+    return {'T': 'b', 'S': symbol, 't': timestamp.isoformat(), 'o': close, 'h': close + 1,
+            'l': close - 1, 'c': close, 'v': 100, 'n': 10, 'vw': close}
+
+def test_bars_queue_behind_a_slow_cycle(monkeypatch):
+    monkeypatch.setattr(daemon, 'is_market_open', lambda: True)
+    trader = TradingDaemon(None, None, ['AAA', 'BBB'], TIMEFRAMES, None, 'ws://unused', 'key', 'secret')
+    started, release = threading.Event(), threading.Event()
+    evaluated = []
+
+    def evaluate(symbol):
+        evaluated.append((symbol, trader.store.closes(symbol, '1m')[-1]))
+        started.set()
+        release.wait(5)
+
+    trader._evaluate = evaluate
+
+    async def scenario():
+        consumer = asyncio.create_task(trader.process_bars())
+        await trader.on_bar(bar('AAA', 0, 10.0))
+        await asyncio.get_running_loop().run_in_executor(None, started.wait, 5)
+        # The handler returns at once while the first cycle is still running
+        for minute, close in ((1, 11.0), (2, 12.0)):
+            await trader.on_bar(bar('AAA', minute, close))
+        await trader.on_bar(bar('BBB', 2, 50.0))
+        await trader.on_bar(bar('CCC', 2, 1.0))
+        assert trader.bar_queue.qsize() == 3
+        release.set()
+        while trader.bar_queue.qsize() or len(evaluated) < 3:
+            await asyncio.sleep(0.01)
+        consumer.cancel()
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        release.set()
+        trader.executor.shutdown(wait=True)
+        trader.orders.close()
+    # The queued bars are all stored and each symbol runs once, on its latest bar
+    assert evaluated == [('AAA', 10.0), ('AAA', 12.0), ('BBB', 50.0)]
+    assert len(trader.store.closes('AAA', '1m')) == 3
@@ -0,0 +1,36 @@
+"""An entry that is still working blocks another one in the same symbol"""
+from types import SimpleNamespace
+
+from alpaca_trade_api.entity import Order
+
+from execution.order_book import OrderBook
+from strategies.snapshot import MarketSnapshot
+
+def snapshot(open_orders, positions=None):
+    return MarketSnapshot('AAA', {}, SimpleNamespace(equity='100000'), positions or {}, 10.0, None, open_orders)
+
+def test_open_entries_are_pending():
+    bracket = Order({'id': '1', 'symbol': 'AAA', 'order_class': 'bracket', 'status': 'accepted'})
+    simple = Order({'id': '2', 'symbol': 'AAA', 'order_class': '', 'status': 'new'})
+    oco = Order({'id': '3', 'symbol': 'AAA', 'order_class': 'oco', 'status': 'new'})
+    assert snapshot((bracket,)).pending_entry is bracket
+    assert snapshot((simple,)).pending_entry is simple
+    assert snapshot((oco,)).pending_entry is None
+    assert snapshot(None).pending_entry is None
+
+def test_acknowledged_orders_reach_the_book():
+    book = OrderBook()
+    book.apply_order(Order({'id': '1', 'symbol': 'AAA', 'side': 'buy', 'order_class': 'bracket',
+                            'status': 'accepted', 'filled_qty': '0'}))
+    assert [order.id for order in book.open_orders('AAA')] == ['1']
+
+def test_filled_acknowledgement_opens_the_position_once():
+    book = OrderBook()
+    book.apply_order(Order({'id': '1', 'symbol': 'AAA', 'side': 'sell', 'status': 'partially_filled',
+                            'filled_qty': '4', 'filled_avg_price': '10'}))
+    assert float(book.position('AAA').qty) == -4
+    # The stream then reports the whole fill, without the position's quantity
+    book.apply_trade_update({'event': 'fill', 'qty': '6', 'price': '10', 'order': {
+        'id': '1', 'symbol': 'AAA', 'side': 'sell', 'status': 'filled', 'filled_qty': '10'}})
+    assert float(book.position('AAA').qty) == -10
+    assert book.open_orders('AAA') == ()
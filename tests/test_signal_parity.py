@@ -0,0 +1,58 @@
+"""The research signal series agrees with the live strategies on the same data"""
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import pytest
+from alpaca_trade_api.rest import TimeFrame
+
+from backtesting.engine import indicator_frames
+from benchmarks.synthetic import random_walk_bars, session_timestamps
+from strategies.registry import get_strategy, strategy_names
+from strategies.snapshot import build_snapshot
+
+def session_bars(seed=0):
+    """Regular-session minute bars ending at a session close"""
+    index = session_timestamps(pd.Timestamp('2024-01-02', tz='UTC'), pd.Timestamp('2024-06-29', tz='UTC'),
+                               TimeFrame.Minute)
+    return random_walk_bars(index, seed)
+
+def live_strategy(strategy_class, frames):
+    account = SimpleNamespace(equity='100000')
+    return strategy_class(None, build_snapshot('TEST', frames, account, {}))
+
+@pytest.mark.parametrize('name', strategy_names())
+@pytest.mark.parametrize('seed', range(4))
+def test_last_bar_matches_generate_signals(name, seed):
+    strategy_class = get_strategy(name)
+    frames = indicator_frames(session_bars(seed), strategy_class.timeframes(), strategy_class.PARAMS)
+    series = strategy_class.frame_signals(frames)
+    strategy = live_strategy(strategy_class, frames)
+    signals = strategy.generate_signals()
+
+    research = strategy_class.frame_inputs(frames)
+    live = strategy.snapshot_inputs()
+    for input_name in strategy_class.INPUTS:
+        np.testing.assert_allclose(research[input_name][-1], live[input_name][-1], err_msg=input_name)
+
+    expected = 'long' if series.long[-1] else 'short' if series.short[-1] else None
+    assert signals['signal'] == expected
+    assert signals['strength'] == pytest.approx(float(series.strength[-1]))
+    side = signals['signal'] or 'long'
+    assert strategy.calculate_stop_loss(signals['price'], side) == pytest.approx(float(series.stop[-1]))
+    assert strategy.calculate_take_profit(signals['price'], side) == pytest.approx(float(series.target[-1]))
+
+def test_inputs_only_read_closed_bars():
+    strategy_class = get_strategy('mean_reversion')
+    frames = indicator_frames(session_bars(), strategy_class.timeframes(), strategy_class.PARAMS)
+    inputs = strategy_class.frame_inputs(frames)
+    signal_bars = frames['15m'].index.tz_convert('America/New_York')
+    hourly = frames['1h']['atr']
+
+    # The 10:15 bar closes at 10:30, with the 09:30 hour; the 10:30 bar
+    # closes before the 10:30 hour and still reads the 09:30 one
+    day = signal_bars[-1].normalize()
+    for wall, hour in (('10:15', '09:30'), ('10:30', '09:30'), ('11:15', '10:30')):
+        bar = signal_bars.get_loc(day + pd.Timedelta(wall + ':00'))
+        expected = hourly.loc[(day + pd.Timedelta(hour + ':00')).tz_convert('UTC')]
+        assert inputs['exit_atr'][bar] == pytest.approx(expected)
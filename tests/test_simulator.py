@@ -0,0 +1,22 @@
+"""Execution simulator fills"""
+import numpy as np
+import pandas as pd
+
+from backtesting.simulator import ExecutionSimulator
+
+def flat_bars(n, volume=100.0):
+    index = pd.date_range('2024-01-02 14:30', periods=n, freq='1min', tz='UTC', name='timestamp')
+    values = np.full(n, 50.0)
+    return pd.DataFrame({'open': values, 'high': values, 'low': values, 'close': values,
+                         'volume': np.full(n, volume)}, index=index)
+
+def test_participation_cap_is_shared_by_a_symbols_orders():
+    simulator = ExecutionSimulator(latency_ms=0, slippage_bps=0, participation=0.1)
+    simulator.add_symbol('AAA', flat_bars(10))
+    for _ in range(3):
+        simulator.submit({'symbol': 'AAA', 'side': 'buy', 'qty': 8, 'type': 'market'}, 0)
+    simulator.run()
+
+    per_bar = simulator.fills.groupby('time')['qty'].sum()
+    assert per_bar.max() <= 10
+    assert per_bar.sum() == 24
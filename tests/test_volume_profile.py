@@ -0,0 +1,44 @@
+"""The incremental volume profile matches the batch one, bar by bar or in batches"""
+import numpy as np
+import pytest
+
+from analysis.technical_indicators import VolumeProfile, calculate_volume_profile
+
+NUM_BINS = 50
+BIN_WIDTH = 0.5
+LOW, HIGH = 99.0, 99.0 + BIN_WIDTH * (NUM_BINS - 1)
+
+def bars(count=500, seed=0):
+    """Bars spanning exactly LOW-HIGH, so both profiles share one grid"""
+    rng = np.random.default_rng(seed)
+    mid = rng.uniform(LOW + 2, HIGH - 2, count)
+    half_range = rng.uniform(0.1, 2, count)
+    high, low = mid + half_range, mid - half_range
+    low[rng.integers(count)] = LOW
+    high[rng.integers(count)] = HIGH
+    close = low + (high - low) * rng.uniform(0.05, 0.95, count)
+    # A few bars without range take the close bin even when spreading
+    flat = rng.choice(count, 10, replace=False)
+    high[flat] = low[flat] = close[flat]
+    volume = rng.integers(100, 10000, count).astype(float)
+    return high, low, close, volume
+
+@pytest.mark.parametrize('spread_volume', [False, True])
+@pytest.mark.parametrize('batch', [1, 37, 500])
+def test_updates_match_the_batch_profile(spread_volume, batch):
+    high, low, close, volume = bars()
+    expected = calculate_volume_profile(high, low, close, volume, NUM_BINS, spread_volume)
+
+    profile = VolumeProfile(BIN_WIDTH, spread_volume)
+    for i in range(0, len(high), batch):
+        if batch == 1:
+            profile.update(float(high[i]), float(low[i]), float(close[i]), float(volume[i]))
+        else:
+            profile.update(high[i:i + batch], low[i:i + batch], close[i:i + batch], volume[i:i + batch])
+
+    assert profile.price_range[0] == LOW
+    # The open-ended grid has one more (empty) bin, starting at the highest high
+    np.testing.assert_allclose(profile.volume_profile[:NUM_BINS - 1], expected['volume_profile'])
+    np.testing.assert_allclose(profile.volume_profile[NUM_BINS - 1:], 0, atol=1e-6)
+    assert profile.poc_price == expected['poc_price']
+    assert np.isclose(profile.volume_profile.sum(), volume.sum())